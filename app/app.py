@@ -1,5 +1,6 @@
 import os
 import logging
+import click
 from logging.handlers import RotatingFileHandler
 from flask import Flask, render_template, redirect, url_for, request, flash
 from flask_login import LoginManager, current_user
@@ -8,6 +9,7 @@ from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 # Load environment variables from .env file
@@ -17,9 +19,33 @@ load_dotenv()
 try:
     from .models import db, User
     from .config import config
+    from .services import search_service, card_service, analytics_rollup, outbox, view_digest
+    from .services.view_counter import view_counter
+    from .services.analytics_queue import analytics_queue
+    from .services.page_cache import page_cache
+    from .services.mail_pool import mail_pool
+    from .services.geoip import geoip, GeoIPDatabase
+    from .services.upload_store import upload_store
+    from .services.image_variants import image_variants
+    from .services.upload_stream import UploadRequest
+    from .services.upload_server import upload_server
+    from .services.sqlite_profile import sqlite_profile
+    from .services.read_routing import read_routing
 except ImportError:
     from models import db, User
     from config import config
+    from services import search_service, card_service, analytics_rollup, outbox, view_digest
+    from services.view_counter import view_counter
+    from services.analytics_queue import analytics_queue
+    from services.page_cache import page_cache
+    from services.mail_pool import mail_pool
+    from services.geoip import geoip, GeoIPDatabase
+    from services.upload_store import upload_store
+    from services.image_variants import image_variants
+    from services.upload_stream import UploadRequest
+    from services.upload_server import upload_server
+    from services.sqlite_profile import sqlite_profile
+    from services.read_routing import read_routing
 
 login_manager = LoginManager()
 mail = Mail()
@@ -35,15 +61,31 @@ def create_app(config_name=None):
         config_name = os.environ.get('FLASK_ENV') or 'default'
     
     app = Flask(__name__, template_folder='../templates', static_folder='../static')
+    # Upload size caps and content checks run while the body is read
+    app.request_class = UploadRequest
     app.config.from_object(config[config_name])
     
     # Initialize extensions
+    sqlite_profile.init_app(app)
     db.init_app(app)
+    read_routing.init_app(app)
+    with app.app_context():
+        sqlite_profile.attach(db.engine)
+    if read_routing.engine is not None:
+        sqlite_profile.attach(read_routing.engine, 'read', read_only=True)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     mail.init_app(app)
     csrf.init_app(app)
     limiter.init_app(app)
+    view_counter.init_app(app)
+    analytics_queue.init_app(app)
+    page_cache.init_app(app)
+    mail_pool.init_app(app)
+    geoip.init_app(app)
+    upload_store.init_app(app)
+    image_variants.init_app(app)
+    upload_server.init_app(app)
     
     # Configure login manager
     login_manager.login_view = 'auth.login'
@@ -72,7 +114,8 @@ def create_app(config_name=None):
     
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        # The portfolio comes along in the same query (see services/current.py)
+        return db.session.get(User, int(user_id), options=[joinedload(User.portfolio)])
     
     # Global context processor for moment.js
     @app.context_processor
@@ -110,6 +153,10 @@ def create_app(config_name=None):
     # Exempt public routes from CSRF protection
     csrf.exempt(app.view_functions['portfolio.send_inquiry'])
     
+    # Uploaded files; every image on a page is a request, so keep them out of the rate limits
+    app.add_url_rule('/uploads/<path:path>', 'uploads', upload_server.serve)
+    limiter.exempt(app.view_functions['uploads'])
+    
     # Add missing route handlers
     @app.route('/faqs')
     def faqs():
@@ -140,6 +187,12 @@ def create_app(config_name=None):
                     flash('Please fill in all required fields.', 'error')
                     return render_template('contact.html')
                 
+                # Both emails quote the submission; build it once
+                details = f"""Subject: {subject}
+
+Message:
+{message}"""
+                
                 # Send email
                 msg = Message(
                     subject=f'Contact Form: {subject}',
@@ -149,18 +202,13 @@ New contact form submission from FreelanceHub:
 
 Name: {first_name} {last_name}
 Email: {email}
-Subject: {subject}
-
-Message:
-{message}
+{details}
 
 ---
 This message was sent from the FreelanceHub contact form.
                     """.strip()
                 )
                 
-                mail.send(msg)
-                
                 # Send confirmation email to user
                 confirmation_msg = Message(
                     subject='Thank you for contacting FreelanceHub',
@@ -171,8 +219,7 @@ Dear {first_name},
 Thank you for contacting FreelanceHub! We have received your message and will get back to you within 24-48 hours.
 
 Your message details:
-Subject: {subject}
-Message: {message}
+{details}
 
 If you have any urgent questions, please don't hesitate to reach out to us directly at {app.config['MAIL_DEFAULT_SENDER']}.
 
@@ -181,7 +228,10 @@ The FreelanceHub Team
                     """.strip()
                 )
                 
-                mail.send(confirmation_msg)
+                # Delivered by the sender pool after the response; delivery failures are
+                # logged and counted in mail_pool.stats() (see /health), not shown here
+                mail_pool.submit(msg)
+                mail_pool.submit(confirmation_msg)
                 
                 flash('Thank you for your message! We will get back to you within 24-48 hours.', 'success')
                 return redirect(url_for('contact'))
@@ -236,6 +286,81 @@ The FreelanceHub Team
         else:
             print('Admin user already exists!')
     
+    # CLI command to rebuild the full-text search index
+    @app.cli.command()
+    def rebuild_search_index():
+        """Rebuild the portfolio search index."""
+        indexed = search_service.rebuild_index()
+        print(f'Search index rebuilt with {indexed} portfolios!')
+    
+    # CLI command to rebuild the portfolio card read model
+    @app.cli.command()
+    def rebuild_portfolio_cards():
+        """Rebuild the portfolio card table."""
+        rebuilt = card_service.rebuild_cards()
+        print(f'Rebuilt {rebuilt} portfolio cards!')
+    
+    # CLI command to deliver queued emails from the outbox
+    @app.cli.command()
+    @click.option('--batch-size', default=50, show_default=True, help='Emails claimed per batch.')
+    @click.option('--interval', default=5.0, show_default=True, help='Seconds between polls when idle.')
+    @click.option('--once', is_flag=True, help='Exit once nothing is due instead of polling.')
+    def email_worker(batch_size, interval, once):
+        """Deliver queued emails from the outbox."""
+        sent, retried, failed = outbox.run_worker(batch_size=batch_size, interval=interval, once=once)
+        print(f'Sent {sent} emails ({retried} to retry, {failed} failed)')
+    
+    # CLI command to email owners a summary of their portfolio views
+    @app.cli.command()
+    @click.option('--window', type=click.Choice(sorted(view_digest.WINDOWS)), default=None,
+                  help='Summarise the last complete hour or day (default: VIEW_DIGEST_WINDOW).')
+    def send_view_digests(window):
+        """Send portfolio view digest emails for the last window."""
+        window = window or app.config['VIEW_DIGEST_WINDOW']
+        with app.test_request_context(base_url=app.config['SITE_URL']):
+            queued = view_digest.send_view_digests(window, limit=app.config['VIEW_DIGEST_TOP'])
+        print(f'Queued {queued} {window} view digests!')
+    
+    # CLI command to compile a GeoIP CSV into the binary table format
+    @app.cli.command()
+    @click.argument('source')
+    @click.argument('destination')
+    def geoip_compile(source, destination):
+        """Compile a start_ip,end_ip,country[,city] CSV for GEOIP_DATABASE."""
+        table = GeoIPDatabase.from_csv(source)
+        table.save(destination)
+        print(f'Wrote {len(table)} IP ranges to {destination}!')
+    
+    # CLI command to delete uploads nothing references any more
+    @app.cli.command()
+    @click.option('--recount', is_flag=True, help='Recount references from the tables first.')
+    def gc_uploads(recount):
+        """Delete unreferenced uploaded files."""
+        if recount:
+            counted = upload_store.rebuild_refcounts()
+            print(f'Recounted references to {counted} uploads')
+        removed = upload_store.collect_garbage()
+        print(f'Removed {removed} unreferenced uploads!')
+    
+    # CLI command to make resized/WebP copies of uploads that don't have them yet
+    @app.cli.command()
+    def build_image_variants():
+        """Make image variants for unprocessed uploads."""
+        if not image_variants.available:
+            print('Pillow is not installed; no image variants made.')
+            return
+        pending = image_variants.pending()
+        for path in pending:
+            image_variants.process(path)
+        print(f'Processed {len(pending)} uploads!')
+    
+    # CLI command to backfill the daily analytics rollup
+    @app.cli.command()
+    def rebuild_analytics_rollup():
+        """Rebuild the daily analytics rollup from raw events."""
+        buckets = analytics_rollup.rebuild_rollup()
+        print(f'Analytics rollup rebuilt with {buckets} daily buckets!')
+    
     return app
 
 if __name__ == '__main__':
@@ -5,6 +5,14 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///freelance_hub_dev.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pragmas and pool size for SQLite: 'default', 'development' or 'production'
+    # (see services/sqlite_profile.py); SQLITE_PRAGMAS overrides single pragmas
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'default')
+    SQLITE_PRAGMAS = {}
+    # Public GET routes read through a separate engine and pool (see services/read_routing.py):
+    # a replica at DATABASE_READ_URL, or else the SQLite file opened read-only
+    DATABASE_READ_URL = os.environ.get('DATABASE_READ_URL')
+    SQLITE_READ_ONLY_ENGINE = os.environ.get('SQLITE_READ_ONLY_ENGINE', 'true').lower() in ['true', 'on', '1']
     
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
@@ -14,6 +22,20 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
     
+    # Outgoing mail pool (see services/mail_pool.py)
+    MAIL_ASYNC = os.environ.get('MAIL_ASYNC', 'true').lower() in ['true', 'on', '1']
+    MAIL_POOL_WORKERS = int(os.environ.get('MAIL_POOL_WORKERS', 2))
+    MAIL_QUEUE_SIZE = int(os.environ.get('MAIL_QUEUE_SIZE', 500))
+    MAIL_ENQUEUE_TIMEOUT = float(os.environ.get('MAIL_ENQUEUE_TIMEOUT', 2))
+    MAIL_CONNECTION_IDLE_SECONDS = float(os.environ.get('MAIL_CONNECTION_IDLE_SECONDS', 30))
+    
+    # Durable outbox (see services/outbox.py); when on, run `flask email-worker` to deliver
+    MAIL_USE_OUTBOX = os.environ.get('MAIL_USE_OUTBOX', 'false').lower() in ['true', 'on', '1']
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+    EMAIL_OUTBOX_BACKOFF_SECONDS = float(os.environ.get('EMAIL_OUTBOX_BACKOFF_SECONDS', 30))
+    EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = float(os.environ.get('EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600))
+    EMAIL_OUTBOX_LEASE_SECONDS = int(os.environ.get('EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    
     # Admin settings
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL') or 'admin@freelancehub.com'
     
@@ -36,11 +58,50 @@ class Config:
     PORTFOLIOS_PER_PAGE = int(os.environ.get('PORTFOLIOS_PER_PAGE', 12))
     PROJECTS_PER_PAGE = int(os.environ.get('PROJECTS_PER_PAGE', 6))
     
+    # View counting (write-behind buffer, see services/view_counter.py)
+    VIEW_COUNT_FLUSH_INTERVAL = float(os.environ.get('VIEW_COUNT_FLUSH_INTERVAL', 5))
+    VIEW_COUNT_FLUSH_THRESHOLD = int(os.environ.get('VIEW_COUNT_FLUSH_THRESHOLD', 100))
+    
+    # Analytics ingestion (background batch writer, see services/analytics_queue.py)
+    ANALYTICS_ASYNC = os.environ.get('ANALYTICS_ASYNC', 'true').lower() in ['true', 'on', '1']
+    ANALYTICS_QUEUE_SIZE = int(os.environ.get('ANALYTICS_QUEUE_SIZE', 10000))
+    ANALYTICS_BATCH_SIZE = int(os.environ.get('ANALYTICS_BATCH_SIZE', 200))
+    ANALYTICS_FLUSH_INTERVAL = float(os.environ.get('ANALYTICS_FLUSH_INTERVAL', 1))
+    ANALYTICS_ENQUEUE_TIMEOUT = float(os.environ.get('ANALYTICS_ENQUEUE_TIMEOUT', 0))
+    
+    # Portfolio view digests, sent by `flask send-view-digests` (hourly or daily)
+    VIEW_DIGEST_WINDOW = os.environ.get('VIEW_DIGEST_WINDOW', 'daily')
+    VIEW_DIGEST_TOP = int(os.environ.get('VIEW_DIGEST_TOP', 3))
+    
+    # Offline GeoIP table (CSV or `flask geoip-compile` output, see services/geoip.py)
+    GEOIP_DATABASE = os.environ.get('GEOIP_DATABASE')
+    GEOIP_CACHE_SIZE = int(os.environ.get('GEOIP_CACHE_SIZE', 4096))
+    
+    # Rendered public portfolio pages (see services/page_cache.py); a TTL of 0 disables it
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 256))
+    PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', 60))
+    
     # File upload settings
     MAX_FILE_SIZE_MB = int(os.environ.get('MAX_FILE_SIZE_MB', 2))
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static', 'uploads')
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH_MB', 16)) * 1024 * 1024
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    # Unreferenced uploads are kept this long before `flask gc-uploads` deletes them (see services/upload_store.py)
+    UPLOAD_GC_GRACE_SECONDS = int(os.environ.get('UPLOAD_GC_GRACE_SECONDS', 86400))
+    # Caps per file input, enforced while the request body is read (see services/upload_stream.py);
+    # other file inputs get MAX_FILE_SIZE_MB
+    UPLOAD_FIELD_LIMITS_MB = {'profile_image': MAX_FILE_SIZE_MB, 'image': MAX_FILE_SIZE_MB, 'client_image': MAX_FILE_SIZE_MB}
+    
+    # Hand upload bodies to the front server: 'x-accel-redirect' (nginx, internal location
+    # UPLOAD_ACCEL_PREFIX aliased to UPLOAD_FOLDER) or 'x-sendfile'; see services/upload_server.py
+    UPLOAD_OFFLOAD = os.environ.get('UPLOAD_OFFLOAD')
+    UPLOAD_ACCEL_PREFIX = os.environ.get('UPLOAD_ACCEL_PREFIX', '/_uploads/')
+    
+    # Resized/WebP copies of uploaded images (see services/image_variants.py; needs Pillow)
+    IMAGE_VARIANTS_ASYNC = os.environ.get('IMAGE_VARIANTS_ASYNC', 'true').lower() in ['true', 'on', '1']
+    IMAGE_VARIANT_WIDTHS = tuple(int(w) for w in os.environ.get('IMAGE_VARIANT_WIDTHS', '64,128,256,512,1024').split(','))
+    IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', 1))
+    IMAGE_VARIANT_QUEUE_SIZE = int(os.environ.get('IMAGE_VARIANT_QUEUE_SIZE', 100))
     
     # Security settings
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'false').lower() == 'true'
@@ -51,6 +112,7 @@ class Config:
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///freelance_hub_dev.db'
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'development')
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -63,6 +125,7 @@ class ProductionConfig(Config):
     
     # Database settings - use default if not provided (for build time)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///freelance_hub.db'
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
     
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
@@ -82,6 +145,11 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///freelance_hub_test.db'
     WTF_CSRF_ENABLED = False
+    VIEW_COUNT_FLUSH_INTERVAL = 0
+    ANALYTICS_ASYNC = False
+    PAGE_CACHE_TTL = 0
+    MAIL_ASYNC = False
+    IMAGE_VARIANTS_ASYNC = False
 
 config = {
     'development': DevelopmentConfig,
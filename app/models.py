@@ -4,8 +4,12 @@ from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import URLSafeTimedSerializer
 from flask import current_app
+try:
+    from app.services.read_routing import RoutingSession
+except ImportError:
+    from services.read_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -51,7 +55,8 @@ class Portfolio(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     title = db.Column(db.String(200), nullable=False, index=True)
     bio = db.Column(db.Text)
-    profile_image = db.Column(db.String(200))
+    # active_history: services/upload_store.py counts the old value when it's replaced
+    profile_image = db.column_property(db.Column(db.String(200)), active_history=True)
     location = db.Column(db.String(100), index=True)
     website = db.Column(db.String(200))
     linkedin = db.Column(db.String(200))
@@ -68,6 +73,15 @@ class Portfolio(db.Model):
     skills = db.relationship('Skill', backref='portfolio', lazy='dynamic', cascade='all, delete-orphan')
     testimonials = db.relationship('Testimonial', backref='portfolio', lazy='dynamic', cascade='all, delete-orphan')
     
+    # Ordered read-only views of the children that, unlike the dynamic relationships above,
+    # can be eager loaded (see services/portfolio_loader.py)
+    ordered_projects = db.relationship('Project', viewonly=True,
+                                       order_by=lambda: (Project.order_index, Project.id))
+    ordered_skills = db.relationship('Skill', viewonly=True,
+                                     order_by=lambda: (Skill.order_index, Skill.id))
+    ordered_testimonials = db.relationship('Testimonial', viewonly=True,
+                                           order_by=lambda: (Testimonial.order_index, Testimonial.id))
+    
     def __repr__(self):
         return f'<Portfolio {self.title}>'
 
@@ -76,12 +90,13 @@ class Project(db.Model):
     portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    image_url = db.Column(db.String(200))
+    # active_history, as for Portfolio.profile_image
+    image_url = db.column_property(db.Column(db.String(200)), active_history=True)
     project_url = db.Column(db.String(200))
     github_url = db.Column(db.String(200))
     technologies = db.Column(db.String(500))  # Comma-separated list
     category = db.Column(db.String(100))
-    order_index = db.Column(db.Integer, default=0)
+    order_index = db.Column(db.Float, default=0)  # Fractional rank, see services/ordering.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
@@ -93,7 +108,7 @@ class Skill(db.Model):
     name = db.Column(db.String(100), nullable=False)
     level = db.Column(db.String(20))  # Beginner, Intermediate, Advanced, Expert
     category = db.Column(db.String(50))  # Frontend, Backend, Design, etc.
-    order_index = db.Column(db.Integer, default=0)
+    order_index = db.Column(db.Float, default=0)  # Fractional rank, see services/ordering.py
     
     def __repr__(self):
         return f'<Skill {self.name}>'
@@ -104,16 +119,19 @@ class Testimonial(db.Model):
     client_name = db.Column(db.String(100), nullable=False)
     client_company = db.Column(db.String(100))
     client_position = db.Column(db.String(100))
-    client_image = db.Column(db.String(200))
+    # active_history, as for Portfolio.profile_image
+    client_image = db.column_property(db.Column(db.String(200)), active_history=True)
     testimonial_text = db.Column(db.Text, nullable=False)
     rating = db.Column(db.Integer, default=5)
-    order_index = db.Column(db.Integer, default=0)
+    order_index = db.Column(db.Float, default=0)  # Fractional rank, see services/ordering.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
         return f'<Testimonial by {self.client_name}>'
 
 class Analytics(db.Model):
+    __table_args__ = (db.Index('ix_analytics_portfolio_event_time', 'portfolio_id', 'event_type', 'timestamp'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
@@ -121,12 +139,29 @@ class Analytics(db.Model):
     visitor_ip = db.Column(db.String(45))
     user_agent = db.Column(db.String(500))
     referrer = db.Column(db.String(200))
+    location = db.Column(db.String(100))  # Resolved from visitor_ip at ingest
+    device = db.Column(db.String(50))  # Classified from user_agent at ingest
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
         return f'<Analytics {self.event_type} for Portfolio {self.portfolio_id}>'
 
+class AnalyticsDaily(db.Model):
+    """Per-day event counts rolled up from Analytics (kept in sync by services/analytics_rollup.py)"""
+    __tablename__ = 'analytics_daily'
+    __table_args__ = (db.Index('ix_analytics_daily_event_day', 'event_type', 'day'),)
+
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id', ondelete='CASCADE'), primary_key=True)
+    event_type = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC, same clock as Analytics.timestamp
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<AnalyticsDaily {self.day} {self.event_type} for Portfolio {self.portfolio_id}>'
+
 class Inquiry(db.Model):
+    __table_args__ = (db.Index('ix_inquiry_portfolio_created', 'portfolio_id', 'created_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
     portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -141,3 +176,79 @@ class Inquiry(db.Model):
     
     def __repr__(self):
         return f'<Inquiry from {self.name}>'
+
+class EmailOutbox(db.Model):
+    """Rendered email waiting for delivery by the email-worker command (services/outbox.py)"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (db.Index('ix_email_outbox_due', 'status', 'next_attempt_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(100), unique=True, nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    sender = db.Column(db.String(120))
+    recipients = db.Column(db.Text, nullable=False)  # Comma-separated list
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32), index=True)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.idempotency_key} {self.status}>'
+
+class StoredUpload(db.Model):
+    """Content-addressed upload file and how many rows reference it (services/upload_store.py)"""
+    __tablename__ = 'stored_upload'
+    __table_args__ = (db.Index('ix_stored_upload_unreferenced', 'ref_count', 'stored_at'),)
+
+    path = db.Column(db.String(100), primary_key=True)  # e.g. 3f/3f8b...c2.png, relative to UPLOAD_FOLDER
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    stored_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Last time it was uploaded
+    # Filled in once services/image_variants.py has made the resized copies
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    variant_widths = db.Column(db.String(100))  # Comma-separated, ascending; '' if none
+
+    def __repr__(self):
+        return f'<StoredUpload {self.path} refs={self.ref_count}>'
+
+class PortfolioCard(db.Model):
+    """Denormalized listing card, one row per portfolio, kept current by services/card_service.py"""
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    owner_username = db.Column(db.String(80))
+    owner_first_name = db.Column(db.String(50))
+    owner_last_name = db.Column(db.String(50))
+    bio_excerpt = db.Column(db.String(200))
+    profile_image = db.Column(db.String(200))
+    location = db.Column(db.String(100))
+    top_skills = db.Column(db.String(500))  # Comma-separated list, first few by order
+    skill_count = db.Column(db.Integer, default=0)
+    project_count = db.Column(db.Integer, default=0)
+    testimonial_count = db.Column(db.Integer, default=0)
+    view_count = db.Column(db.Integer, default=0, index=True)
+    is_public = db.Column(db.Boolean, default=True)
+    is_approved = db.Column(db.Boolean, default=False)
+    is_featured = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, index=True)
+    updated_at = db.Column(db.DateTime, index=True)
+    
+    @property
+    def owner_name(self):
+        return f"{self.owner_first_name or ''} {self.owner_last_name or ''}".strip()
+    
+    @property
+    def initials(self):
+        return f"{(self.owner_first_name or ' ')[0]}{(self.owner_last_name or ' ')[0]}".strip()
+    
+    @property
+    def skills(self):
+        return [name for name in (self.top_skills or '').split(',') if name]
+    
+    def __repr__(self):
+        return f'<PortfolioCard {self.portfolio_id}>'
@@ -3,10 +3,12 @@ from flask_login import login_required, current_user
 from functools import wraps
 try:
     from app.models import User, Portfolio, Project, Skill, Testimonial, Inquiry, Analytics, db
+    from app.services.analytics_rollup import event_total, last_days
 except ImportError:
     from models import User, Portfolio, Project, Skill, Testimonial, Inquiry, Analytics, db
-from sqlalchemy import desc, func
-from datetime import datetime, timedelta
+    from services.analytics_rollup import event_total, last_days
+from sqlalchemy import desc
+from sqlalchemy.orm import joinedload
 
 admin = Blueprint('admin', __name__)
 
@@ -38,20 +40,14 @@ def dashboard():
     new_inquiries = Inquiry.query.filter_by(is_read=False).count()
     
     # Recent activity
-    recent_portfolios = Portfolio.query.order_by(desc(Portfolio.created_at)).limit(5).all()
+    recent_portfolios = Portfolio.query.options(joinedload(Portfolio.user)).order_by(desc(Portfolio.created_at)).limit(5).all()
     recent_users = User.query.order_by(desc(User.created_at)).limit(5).all()
     
-    # Analytics data
-    total_views = Analytics.query.filter_by(event_type='view').count()
+    # Analytics data (from the daily rollup)
+    total_views = event_total('view')
     
     # Views by date (last 7 days)
-    views_by_date = {}
-    for i in range(7):
-        date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-        views_by_date[date] = Analytics.query.filter(
-            Analytics.event_type == 'view',
-            func.date(Analytics.timestamp) == date
-        ).count()
+    views_by_date = last_days('view', 7)
     
     stats = {
         'total_users': total_users,
@@ -107,7 +103,7 @@ def portfolios():
     page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', 'all')
     
-    query = Portfolio.query
+    query = Portfolio.query.options(joinedload(Portfolio.user))
     
     if status_filter == 'pending':
         query = query.filter_by(is_approved=False)
@@ -270,17 +266,11 @@ def analytics():
     # Overall stats
     total_users = User.query.count()
     total_portfolios = Portfolio.query.count()
-    total_views = Analytics.query.filter_by(event_type='view').count()
+    total_views = event_total('view')
     total_inquiries = Inquiry.query.count()
     
     # Views by date (last 30 days)
-    views_by_date = {}
-    for i in range(30):
-        date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-        views_by_date[date] = Analytics.query.filter(
-            Analytics.event_type == 'view',
-            func.date(Analytics.timestamp) == date
-        ).count()
+    views_by_date = last_days('view', 30)
     
     # Top portfolios by views
     top_portfolios = Portfolio.query.order_by(desc(Portfolio.view_count)).limit(10).all()
@@ -1,10 +1,28 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 try:
-    from app.models import Portfolio, User, Project, Skill, Testimonial, Inquiry, Analytics, db
+    from app.models import Portfolio, PortfolioCard, User, Project, Skill, Testimonial, Inquiry, Analytics, db
+    from app.services.search_service import filter_portfolios, search_portfolios as search_portfolio_index
+    from app.services.pagination import KeysetPagination, SortKey
+    from app.services.analytics_rollup import event_total
+    from app.services.analytics_report import parse_range, event_series, inquiry_counts, recent_views, recent_inquiries
+    from app.services.conditional import make_etag, not_modified, with_validators
+    from app.services.portfolio_loader import load_portfolio
+    from app.services.ordering import move_item
+    from app.services.current import current_portfolio
+    from app.services.read_routing import read_only
 except ImportError:
-    from models import Portfolio, User, Project, Skill, Testimonial, Inquiry, Analytics, db
-from sqlalchemy import desc
+    from models import Portfolio, PortfolioCard, User, Project, Skill, Testimonial, Inquiry, Analytics, db
+    from services.search_service import filter_portfolios, search_portfolios as search_portfolio_index
+    from services.pagination import KeysetPagination, SortKey
+    from services.analytics_rollup import event_total
+    from services.analytics_report import parse_range, event_series, inquiry_counts, recent_views, recent_inquiries
+    from services.conditional import make_etag, not_modified, with_validators
+    from services.portfolio_loader import load_portfolio
+    from services.ordering import move_item
+    from services.current import current_portfolio
+    from services.read_routing import read_only
+from sqlalchemy import desc, func
 
 api = Blueprint('api', __name__)
 
@@ -13,7 +31,7 @@ api = Blueprint('api', __name__)
 @login_required
 def publish_portfolio():
     """Publish portfolio for public viewing"""
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         return jsonify({'success': False, 'message': 'Portfolio not found'})
     
@@ -27,7 +45,7 @@ def publish_portfolio():
 @login_required
 def unpublish_portfolio():
     """Unpublish portfolio"""
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         return jsonify({'success': False, 'message': 'Portfolio not found'})
     
@@ -42,7 +60,7 @@ def unpublish_portfolio():
 def delete_project(project_id):
     """Delete a project"""
     project = Project.query.get_or_404(project_id)
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     
     if project.portfolio_id != portfolio.id:
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -60,22 +78,16 @@ def reorder_projects():
     old_index = data.get('old_index')
     new_index = data.get('new_index')
     
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         return jsonify({'success': False, 'message': 'Portfolio not found'})
     
-    projects = portfolio.projects.order_by('order_index').all()
-    
-    if old_index >= len(projects) or new_index >= len(projects):
+    if not isinstance(old_index, int) or not isinstance(new_index, int):
         return jsonify({'success': False, 'message': 'Invalid index'})
     
-    # Reorder projects
-    moved_project = projects.pop(old_index)
-    projects.insert(new_index, moved_project)
-    
-    # Update order indices
-    for i, project in enumerate(projects):
-        project.order_index = i
+    # Only the moved project gets a new rank
+    if not move_item(Project, portfolio.id, old_index, new_index):
+        return jsonify({'success': False, 'message': 'Invalid index'})
     
     db.session.commit()
     
@@ -87,7 +99,7 @@ def reorder_projects():
 def delete_skill(skill_id):
     """Delete a skill"""
     skill = Skill.query.get_or_404(skill_id)
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     
     if skill.portfolio_id != portfolio.id:
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -105,22 +117,16 @@ def reorder_skills():
     old_index = data.get('old_index')
     new_index = data.get('new_index')
     
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         return jsonify({'success': False, 'message': 'Portfolio not found'})
     
-    skills = portfolio.skills.order_by('order_index').all()
-    
-    if old_index >= len(skills) or new_index >= len(skills):
+    if not isinstance(old_index, int) or not isinstance(new_index, int):
         return jsonify({'success': False, 'message': 'Invalid index'})
     
-    # Reorder skills
-    moved_skill = skills.pop(old_index)
-    skills.insert(new_index, moved_skill)
-    
-    # Update order indices
-    for i, skill in enumerate(skills):
-        skill.order_index = i
+    # Only the moved skill gets a new rank
+    if not move_item(Skill, portfolio.id, old_index, new_index):
+        return jsonify({'success': False, 'message': 'Invalid index'})
     
     db.session.commit()
     
@@ -132,7 +138,7 @@ def reorder_skills():
 def delete_testimonial(testimonial_id):
     """Delete a testimonial"""
     testimonial = Testimonial.query.get_or_404(testimonial_id)
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     
     if testimonial.portfolio_id != portfolio.id:
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -150,22 +156,16 @@ def reorder_testimonials():
     old_index = data.get('old_index')
     new_index = data.get('new_index')
     
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         return jsonify({'success': False, 'message': 'Portfolio not found'})
     
-    testimonials = portfolio.testimonials.order_by('order_index').all()
-    
-    if old_index >= len(testimonials) or new_index >= len(testimonials):
+    if not isinstance(old_index, int) or not isinstance(new_index, int):
         return jsonify({'success': False, 'message': 'Invalid index'})
     
-    # Reorder testimonials
-    moved_testimonial = testimonials.pop(old_index)
-    testimonials.insert(new_index, moved_testimonial)
-    
-    # Update order indices
-    for i, testimonial in enumerate(testimonials):
-        testimonial.order_index = i
+    # Only the moved testimonial gets a new rank
+    if not move_item(Testimonial, portfolio.id, old_index, new_index):
+        return jsonify({'success': False, 'message': 'Invalid index'})
     
     db.session.commit()
     
@@ -181,34 +181,31 @@ def get_portfolio_analytics(portfolio_id):
     if portfolio.user_id != current_user.id and not current_user.is_admin:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Get view analytics
-    views = Analytics.query.filter_by(portfolio_id=portfolio_id, event_type='view').all()
+    try:
+        start, end, bucket = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Get inquiries
-    inquiries = Inquiry.query.filter_by(portfolio_id=portfolio_id).all()
-    
-    # Calculate stats
-    total_views = len(views)
-    total_inquiries = len(inquiries)
-    unread_inquiries = len([i for i in inquiries if not i.is_read])
-    
-    # Group views by date
-    views_by_date = {}
-    for view in views:
-        date = view.timestamp.strftime('%Y-%m-%d')
-        views_by_date[date] = views_by_date.get(date, 0) + 1
+    # Totals and the series are aggregated in SQL; only the recent lists load rows
+    total_views = event_total('view', portfolio_id)
+    total_inquiries, unread_inquiries = inquiry_counts(portfolio_id)
+    views_by_bucket = event_series(portfolio_id, start, end, bucket)
     
     result = {
         'total_views': total_views,
         'total_inquiries': total_inquiries,
         'unread_inquiries': unread_inquiries,
-        'views_by_date': views_by_date,
+        'bucket': bucket,
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat(),
+        'range_views': sum(views_by_bucket.values()),
+        'views_by_bucket': views_by_bucket,
         'recent_views': [{
             'timestamp': view.timestamp.isoformat(),
             'visitor_ip': view.visitor_ip,
             'user_agent': view.user_agent,
             'referrer': view.referrer
-        } for view in views[-10:]],  # Last 10 views
+        } for view in recent_views(portfolio_id)],  # Last 10 views, newest first
         'recent_inquiries': [{
             'id': inquiry.id,
             'name': inquiry.name,
@@ -217,79 +214,138 @@ def get_portfolio_analytics(portfolio_id):
             'message': inquiry.message,
             'is_read': inquiry.is_read,
             'created_at': inquiry.created_at.isoformat()
-        } for inquiry in inquiries[-10:]]  # Last 10 inquiries
+        } for inquiry in recent_inquiries(portfolio_id)]  # Last 10 inquiries, newest first
     }
+    if bucket == 'day':
+        result['views_by_date'] = views_by_bucket
     
     return jsonify(result)
 
 # Public Portfolio APIs
+MAX_PER_PAGE = 100
+
+def serialize_portfolio_cards(cards):
+    """API objects for a page of cards. 'bio' stays the full text, which cards only
+    keep an excerpt of, so the page's bios are read in one query"""
+    bios = dict(db.session.query(Portfolio.id, Portfolio.bio)
+                .filter(Portfolio.id.in_([card.portfolio_id for card in cards])))
+    return [serialize_portfolio_card(card, bios.get(card.portfolio_id)) for card in cards]
+
+def serialize_portfolio_card(card, bio):
+    return {
+        'id': card.portfolio_id,
+        'title': card.title,
+        'bio': bio,
+        'location': card.location,
+        'view_count': card.view_count,
+        'created_at': card.created_at.isoformat(),
+        'skills': card.skills,
+        'user': {
+            'username': card.owner_username,
+            'first_name': card.owner_first_name,
+            'last_name': card.owner_last_name
+        }
+    }
+
 @api.route('/portfolios')
+@read_only
 def get_portfolios():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    """List public portfolios by popularity.
+
+    Pages are addressed with the opaque ``cursor`` returned as ``next_cursor``/``prev_cursor``;
+    ``include_total=true`` adds a COUNT. The legacy ``page`` parameter still selects offset paging.
+    """
+    per_page = min(request.args.get('per_page', 10, type=int), MAX_PER_PAGE)
     skill_filter = request.args.get('skill', '')
     location_filter = request.args.get('location', '')
     
-    query = Portfolio.query.filter_by(is_public=True, is_approved=True)
+    query = PortfolioCard.query.filter_by(is_public=True, is_approved=True)
+    
+    # Any listed card being added, removed, edited or viewed changes this version
+    version = db.session.query(
+        func.count(PortfolioCard.portfolio_id),
+        func.max(PortfolioCard.updated_at),
+        func.sum(PortfolioCard.view_count)
+    ).filter_by(is_public=True, is_approved=True).one()
+    etag = make_etag('portfolios', request.query_string.decode(), *version)
+    response = not_modified(etag)
+    if response:
+        return response
     
     if skill_filter:
-        query = query.join(Skill).filter(Skill.name.ilike(f'%{skill_filter}%'))
+        query = filter_portfolios(query, skill_filter, columns=('skills',), id_column=PortfolioCard.portfolio_id)
     
     if location_filter:
-        query = query.filter(Portfolio.location.ilike(f'%{location_filter}%'))
-    
-    portfolios = query.order_by(desc(Portfolio.view_count)).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
+        query = filter_portfolios(query, location_filter, columns=('location',), id_column=PortfolioCard.portfolio_id)
+    
+    if 'page' in request.args:
+        page = request.args.get('page', 1, type=int)
+        portfolios = query.order_by(desc(PortfolioCard.view_count), desc(PortfolioCard.portfolio_id)).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        
+        return with_validators(jsonify({
+            'portfolios': serialize_portfolio_cards(portfolios.items),
+            'total': portfolios.total,
+            'pages': portfolios.pages,
+            'current_page': portfolios.page,
+            'has_next': portfolios.has_next,
+            'has_prev': portfolios.has_prev
+        }), etag)
+    
+    keys = [SortKey(PortfolioCard.view_count, descending=True), SortKey(PortfolioCard.portfolio_id, descending=True)]
+    with_total = request.args.get('include_total', 'false').lower() in ['true', '1']
+    try:
+        portfolios = KeysetPagination(query, keys, cursor=request.args.get('cursor'),
+                                      per_page=per_page, with_total=with_total)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     result = {
-        'portfolios': [{
-            'id': p.id,
-            'title': p.title,
-            'bio': p.bio,
-            'location': p.location,
-            'view_count': p.view_count,
-            'created_at': p.created_at.isoformat(),
-            'skills': [skill.name for skill in p.skills.limit(5).all()],
-            'user': {
-                'username': p.user.username,
-                'first_name': p.user.first_name,
-                'last_name': p.user.last_name
-            }
-        } for p in portfolios.items],
-        'total': portfolios.total,
-        'pages': portfolios.pages,
-        'current_page': portfolios.page,
+        'portfolios': serialize_portfolio_cards(portfolios.items),
+        'next_cursor': portfolios.next_cursor,
+        'prev_cursor': portfolios.prev_cursor,
         'has_next': portfolios.has_next,
         'has_prev': portfolios.has_prev
     }
+    if with_total:
+        result['total'] = portfolios.total
     
-    return jsonify(result)
+    return with_validators(jsonify(result), etag)
 
 @api.route('/portfolio/<int:portfolio_id>')
+@read_only
 def get_portfolio(portfolio_id):
     portfolio = Portfolio.query.get_or_404(portfolio_id)
     
     if not portfolio.is_public or not portfolio.is_approved:
         return jsonify({'error': 'Portfolio not found'}), 404
     
+    # updated_at covers child rows too; view_count is in the body but not in updated_at,
+    # so only the ETag can validate it and no Last-Modified is sent
+    etag = make_etag('portfolio', portfolio.id, portfolio.updated_at, portfolio.view_count)
+    response = not_modified(etag)
+    if response:
+        return response
+    
+    snapshot = load_portfolio(portfolio.id)
     result = {
-        'id': portfolio.id,
-        'title': portfolio.title,
-        'bio': portfolio.bio,
-        'location': portfolio.location,
-        'website': portfolio.website,
-        'linkedin': portfolio.linkedin,
-        'github': portfolio.github,
-        'profile_image': portfolio.profile_image,
-        'view_count': portfolio.view_count,
-        'created_at': portfolio.created_at.isoformat(),
+        'id': snapshot.id,
+        'title': snapshot.title,
+        'bio': snapshot.bio,
+        'location': snapshot.location,
+        'website': snapshot.website,
+        'linkedin': snapshot.linkedin,
+        'github': snapshot.github,
+        'profile_image': snapshot.profile_image,
+        'view_count': snapshot.view_count,
+        'created_at': snapshot.created_at.isoformat(),
         'user': {
-            'username': portfolio.user.username,
-            'first_name': portfolio.user.first_name,
-            'last_name': portfolio.user.last_name
+            'username': snapshot.user.username,
+            'first_name': snapshot.user.first_name,
+            'last_name': snapshot.user.last_name
         },
         'projects': [{
             'id': project.id,
@@ -300,13 +356,13 @@ def get_portfolio(portfolio_id):
             'github_url': project.github_url,
             'technologies': project.technologies,
             'category': project.category
-        } for project in portfolio.projects.order_by('order_index').all()],
+        } for project in snapshot.projects],
         'skills': [{
             'id': skill.id,
             'name': skill.name,
             'level': skill.level,
             'category': skill.category
-        } for skill in portfolio.skills.order_by('order_index').all()],
+        } for skill in snapshot.skills],
         'testimonials': [{
             'id': testimonial.id,
             'client_name': testimonial.client_name,
@@ -315,10 +371,10 @@ def get_portfolio(portfolio_id):
             'client_image': testimonial.client_image,
             'testimonial_text': testimonial.testimonial_text,
             'rating': testimonial.rating
-        } for testimonial in portfolio.testimonials.order_by('order_index').all()]
+        } for testimonial in snapshot.testimonials]
     }
     
-    return jsonify(result)
+    return with_validators(jsonify(result), etag)
 
 @api.route('/search')
 def search_portfolios():
@@ -326,17 +382,7 @@ def search_portfolios():
     if not query:
         return jsonify({'error': 'Search query is required'}), 400
     
-    portfolios = Portfolio.query.filter(
-        Portfolio.is_public == True,
-        Portfolio.is_approved == True
-    ).join(User).filter(
-        db.or_(
-            Portfolio.title.ilike(f'%{query}%'),
-            Portfolio.bio.ilike(f'%{query}%'),
-            User.first_name.ilike(f'%{query}%'),
-            User.last_name.ilike(f'%{query}%')
-        )
-    ).all()
+    portfolios = search_portfolio_index(query)
     
     result = {
         'portfolios': [{
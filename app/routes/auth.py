@@ -11,13 +11,13 @@ try:
     from app.forms import (LoginForm, RegisterForm, PasswordResetRequestForm, 
                           PasswordResetForm, ChangePasswordForm, DeleteAccountForm, 
                           UpdateProfileForm)
-    from app.app import mail
+    from app.services.mail_pool import mail_pool
 except ImportError:
     from models import User, db, Portfolio
     from forms import (LoginForm, RegisterForm, PasswordResetRequestForm, 
                       PasswordResetForm, ChangePasswordForm, DeleteAccountForm, 
                       UpdateProfileForm)
-    from app import mail
+    from services.mail_pool import mail_pool
 
 auth = Blueprint('auth', __name__)
 
@@ -68,9 +68,9 @@ def register():
         user.set_password(form.password.data)
         
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         
-        # Send welcome email
+        # Send welcome email (committed with the user when the outbox is on)
         try:
             from app.services.email_service import send_welcome_email
             send_welcome_email(user)
@@ -78,6 +78,8 @@ def register():
             # Log error but don't break registration
             print(f"Error sending welcome email: {e}")
         
+        db.session.commit()
+        
         flash('Registration successful! Please log in.', 'success')
         return redirect(url_for('auth.login'))
     
@@ -183,7 +185,7 @@ def delete_account():
 
 def send_reset_email(user):
     """Send password reset email to user"""
-    token = user.get_reset_token()
+    reset_url = url_for('auth.reset_password', token=user.get_reset_token(), _external=True)
     msg = Message(
         'Password Reset Request - FreelanceHub',
         sender='noreply@freelancehub.com',
@@ -194,7 +196,7 @@ def send_reset_email(user):
 You have requested to reset your password for your FreelanceHub account.
 
 To reset your password, click the following link:
-{url_for('auth.reset_password', token=token, _external=True)}
+{reset_url}
 
 If you did not make this request, please ignore this email and no changes will be made to your account.
 
@@ -210,13 +212,13 @@ The FreelanceHub Team
         <p>You have requested to reset your password for your FreelanceHub account.</p>
         <p>To reset your password, click the button below:</p>
         <div style="text-align: center; margin: 30px 0;">
-            <a href="{url_for('auth.reset_password', token=token, _external=True)}" 
+            <a href="{reset_url}" 
                style="background-color: #007bff; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
                 Reset Password
             </a>
         </div>
         <p>If the button doesn't work, copy and paste this link into your browser:</p>
-        <p style="word-break: break-all; color: #666;">{url_for('auth.reset_password', token=token, _external=True)}</p>
+        <p style="word-break: break-all; color: #666;">{reset_url}</p>
         <p><strong>Important:</strong> This link will expire in 30 minutes for security reasons.</p>
         <p>If you did not make this request, please ignore this email and no changes will be made to your account.</p>
         <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
@@ -226,7 +228,8 @@ The FreelanceHub Team
         </p>
     </div>
     '''
-    mail.send(msg)
+    # Queued for the sender pool; failures are logged and counted, not raised
+    mail_pool.submit(msg)
 
 
 def send_account_deletion_email(email, name):
@@ -272,7 +275,8 @@ The FreelanceHub Team
         </p>
     </div>
     '''
-    mail.send(msg)
+    # Queued for the sender pool; failures are logged and counted, not raised
+    mail_pool.submit(msg)
 
 
 @auth.route('/reset_password_request', methods=['GET', 'POST'])
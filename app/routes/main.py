@@ -1,15 +1,38 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, make_response
+from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, make_response, session
 from flask_login import current_user
 from sqlalchemy import desc, func
 from datetime import datetime, timedelta
 try:
-    from ..models import db, Portfolio, User, Project, Skill, Testimonial, Analytics
+    from ..models import db, Portfolio, PortfolioCard, User, Project, Skill, Testimonial, Analytics
+    from ..services.search_service import filter_portfolios, search_portfolios
+    from ..services.pagination import KeysetPagination, SortKey
+    from ..services.view_counter import view_counter
+    from ..services.analytics_queue import analytics_queue
+    from ..services.page_cache import page_cache
+    from ..services.conditional import make_etag, not_modified, with_validators
+    from ..services.mail_pool import mail_pool
+    from ..services.geoip import geoip
+    from ..services.image_variants import image_variants
+    from ..services.sqlite_profile import sqlite_profile
+    from ..services.read_routing import read_only
 except ImportError:
-    from models import db, Portfolio, User, Project, Skill, Testimonial, Analytics
+    from models import db, Portfolio, PortfolioCard, User, Project, Skill, Testimonial, Analytics
+    from services.search_service import filter_portfolios, search_portfolios
+    from services.pagination import KeysetPagination, SortKey
+    from services.view_counter import view_counter
+    from services.analytics_queue import analytics_queue
+    from services.page_cache import page_cache
+    from services.conditional import make_etag, not_modified, with_validators
+    from services.mail_pool import mail_pool
+    from services.geoip import geoip
+    from services.image_variants import image_variants
+    from services.sqlite_profile import sqlite_profile
+    from services.read_routing import read_only
 
 main = Blueprint('main', __name__)
 
 @main.route('/sitemap.xml')
+@read_only
 def sitemap():
     """Generate sitemap.xml for SEO"""
     try:
@@ -58,6 +81,7 @@ def sitemap():
         return make_response('Error generating sitemap', 500)
 
 @main.route('/')
+@read_only
 def index():
     """Homepage with featured and recent portfolios."""
     # Redirect admin users to admin dashboard
@@ -66,23 +90,21 @@ def index():
     
     try:
         # Get featured portfolios (portfolios with most views)
-        featured_portfolios = Portfolio.query.filter(
-            Portfolio.is_public == True,
-            Portfolio.is_approved == True
-        ).order_by(
-            Portfolio.view_count.desc()
+        listed_cards = PortfolioCard.query.filter(
+            PortfolioCard.is_public == True,
+            PortfolioCard.is_approved == True
+        )
+        featured_portfolios = listed_cards.order_by(
+            PortfolioCard.view_count.desc()
         ).limit(3).all()
         
         # Get recent portfolios
-        recent_portfolios = Portfolio.query.filter(
-            Portfolio.is_public == True,
-            Portfolio.is_approved == True
-        ).order_by(
-            Portfolio.updated_at.desc()
+        recent_portfolios = listed_cards.order_by(
+            PortfolioCard.updated_at.desc()
         ).limit(8).all()
         
         # Get some basic stats
-        total_portfolios = Portfolio.query.filter_by(is_public=True, is_approved=True).count()
+        total_portfolios = listed_cards.count()
         total_users = User.query.count()
         
         return render_template('index.html', 
@@ -98,7 +120,17 @@ def index():
                              total_portfolios=0,
                              total_users=0)
 
+# Keyset orders for /browse, each ending in the primary key. A NULL first name would
+# match neither side of the seek predicate and end the listing early, so it sorts as ''
+BROWSE_SORT_KEYS = {
+    'views': [SortKey(PortfolioCard.view_count, descending=True), SortKey(PortfolioCard.portfolio_id, descending=True)],
+    'name': [SortKey(func.coalesce(PortfolioCard.owner_first_name, ''), value=lambda card: card.owner_first_name or ''),
+             SortKey(PortfolioCard.portfolio_id)],
+    'recent': [SortKey(PortfolioCard.updated_at, descending=True), SortKey(PortfolioCard.portfolio_id, descending=True)],
+}
+
 @main.route('/browse')
+@read_only
 def browse():
     """Browse all portfolios with search and filters."""
     # Block admin users from browsing portfolios
@@ -106,61 +138,52 @@ def browse():
         return redirect(url_for('admin.dashboard'))
     
     try:
-        page = request.args.get('page', 1, type=int)
+        cursor = request.args.get('cursor')
         search = request.args.get('search', '')
-        category = request.args.get('category', '')
+        skill_filter = request.args.get('skill', '')
+        industry_filter = request.args.get('industry', '')
+        location_filter = request.args.get('location', '')
         sort_by = request.args.get('sort', 'recent')
         
         # Base query
-        query = Portfolio.query.filter(Portfolio.is_public == True, Portfolio.is_approved == True)
+        query = PortfolioCard.query.filter(PortfolioCard.is_public == True, PortfolioCard.is_approved == True)
         
-        # Apply search filter
+        # Apply search filters through the full-text index
         if search:
-            query = query.filter(
-                db.or_(
-                    Portfolio.title.ilike(f'%{search}%'),
-                    Portfolio.bio.ilike(f'%{search}%'),
-                    User.first_name.ilike(f'%{search}%'),
-                    User.last_name.ilike(f'%{search}%')
-                )
-            ).join(User)
-        
-        # Apply category filter
-        if category:
-            query = query.filter(Portfolio.category == category)
+            query = filter_portfolios(query, search, id_column=PortfolioCard.portfolio_id)
+        if industry_filter:
+            query = filter_portfolios(query, industry_filter, columns=('title', 'bio'), id_column=PortfolioCard.portfolio_id)
+        if skill_filter:
+            query = filter_portfolios(query, skill_filter, columns=('skills',), id_column=PortfolioCard.portfolio_id)
+        if location_filter:
+            query = filter_portfolios(query, location_filter, columns=('location',), id_column=PortfolioCard.portfolio_id)
         
-        # Apply sorting
-        if sort_by == 'views':
-            query = query.order_by(Portfolio.view_count.desc())
-        elif sort_by == 'name':
-            query = query.join(User).order_by(User.first_name.asc())
-        else:  # recent
-            query = query.order_by(Portfolio.updated_at.desc())
+        # Apply sorting (keyset order, always ending in the primary key)
+        keys = BROWSE_SORT_KEYS.get(sort_by, BROWSE_SORT_KEYS['recent'])
         
-        # Paginate results
+        # Paginate results; only the first page pays for the total count
         per_page = current_app.config.get('PORTFOLIOS_PER_PAGE', 12)
-        portfolios = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        # Get categories for filter
-        categories = db.session.query(Portfolio.category).distinct().all()
-        categories = [cat[0] for cat in categories if cat[0]]
+        try:
+            portfolios = KeysetPagination(query, keys, cursor=cursor, per_page=per_page, with_total=not cursor)
+        except ValueError:
+            portfolios = KeysetPagination(query, keys, per_page=per_page, with_total=True)
         
         return render_template('browse.html',
                              portfolios=portfolios,
                              search=search,
-                             category=category,
-                             sort_by=sort_by,
-                             categories=categories)
+                             skill_filter=skill_filter,
+                             industry_filter=industry_filter,
+                             location_filter=location_filter,
+                             sort_by=sort_by)
     except Exception as e:
         current_app.logger.error(f"Error in browse route: {e}")
         return render_template('browse.html',
                              portfolios=None,
                              search='',
-                             category='',
-                             sort_by='recent',
-                             categories=[])
+                             skill_filter='',
+                             industry_filter='',
+                             location_filter='',
+                             sort_by='recent')
 
 @main.route('/portfolio/<int:portfolio_id>')
 def view_portfolio(portfolio_id):
@@ -176,28 +199,41 @@ def view_portfolio(portfolio_id):
         if not portfolio.is_public and (not current_user.is_authenticated or current_user.id != portfolio.user_id):
             return render_template('errors/404.html'), 404
         
-        # Increment view count
-        portfolio.view_count = (portfolio.view_count or 0) + 1
+        # Increment view count (buffered, written in batches)
+        view_counter.record(portfolio.id)
         
-        # Track analytics
+        # Track analytics (queued, written in batches off the request path)
         if current_user.is_authenticated:
-            analytics = Analytics(
-                user_id=current_user.id if current_user.id != portfolio.user_id else portfolio.user_id,
+            analytics_queue.track(
                 portfolio_id=portfolio.id,
+                user_id=current_user.id if current_user.id != portfolio.user_id else portfolio.user_id,
                 event_type='view',
                 visitor_ip=request.remote_addr,
                 user_agent=request.headers.get('User-Agent', '')
             )
-            db.session.add(analytics)
         
-        db.session.commit()
+        # Repeat visits revalidate against updated_at (bumped by child-row edits too) and
+        # the view count the page shows, which the counter moves without touching
+        # updated_at, so only the ETag can validate it and no Last-Modified is sent. The
+        # navbar differs per viewer, so the viewer is part of the ETag
+        if '_flashes' not in session:
+            viewer = current_user.id if current_user.is_authenticated else 'anonymous'
+            etag = make_etag('portfolio-page', portfolio.id, portfolio.updated_at, portfolio.view_count, viewer)
+            response = not_modified(etag)
+            if response:
+                return response
+            html = page_cache.render_portfolio(portfolio, 'portfolio/view.html')
+            return with_validators(html, etag, cache_control='private, no-cache')
         
-        return render_template('portfolio/view.html', portfolio=portfolio)
+        # Flash messages are pending, so the page renders uncached (render_portfolio skips
+        # the cache) and without validators; the view above is counted either way
+        return page_cache.render_portfolio(portfolio, 'portfolio/view.html')
     except Exception as e:
         current_app.logger.error(f"Error in view_portfolio route: {e}")
         return render_template('errors/404.html'), 404
 
 @main.route('/search')
+@read_only
 def search():
     """Search portfolios and return JSON results."""
     # Block admin users from searching portfolios
@@ -209,16 +245,7 @@ def search():
         if not query:
             return jsonify([])
         
-        portfolios = Portfolio.query.filter(
-            Portfolio.is_public == True,
-            Portfolio.is_approved == True,
-            db.or_(
-                Portfolio.title.ilike(f'%{query}%'),
-                Portfolio.bio.ilike(f'%{query}%'),
-                User.first_name.ilike(f'%{query}%'),
-                User.last_name.ilike(f'%{query}%')
-            )
-        ).join(User).limit(10).all()
+        portfolios = search_portfolios(query, limit=10)
         
         results = []
         for portfolio in portfolios:
@@ -240,7 +267,7 @@ def health_check():
     """Health check endpoint for monitoring"""
     try:
         # Check database connection
-        db.session.execute('SELECT 1')
+        db.session.execute(db.text('SELECT 1'))
         
         # Check basic functionality
         total_users = User.query.count()
@@ -251,7 +278,14 @@ def health_check():
             'timestamp': datetime.now().isoformat(),
             'database': 'connected',
             'total_users': total_users,
-            'total_portfolios': total_portfolios
+            'total_portfolios': total_portfolios,
+            'view_counter': view_counter.stats(),
+            'analytics_queue': analytics_queue.stats(),
+            'page_cache': page_cache.stats(),
+            'mail_pool': mail_pool.stats(),
+            'geoip': geoip.stats(),
+            'image_variants': image_variants.stats(),
+            'sqlite': sqlite_profile.stats()
         })
     except Exception as e:
         current_app.logger.error(f"Health check failed: {e}")
@@ -269,24 +303,27 @@ def api_stats():
         return jsonify({})
     
     try:
-        total_portfolios = Portfolio.query.filter_by(is_public=True, is_approved=True).count()
+        listed = db.and_(PortfolioCard.is_public == True, PortfolioCard.is_approved == True)
+        total_portfolios, total_projects, total_views = db.session.query(
+            func.count(PortfolioCard.portfolio_id).filter(listed),
+            func.coalesce(func.sum(PortfolioCard.project_count), 0),
+            func.coalesce(func.sum(PortfolioCard.view_count), 0)
+        ).one()
         total_users = User.query.count()
-        total_projects = Project.query.count()
-        total_views = db.session.query(func.sum(Portfolio.view_count)).scalar() or 0
         
         # Recent activity
-        recent_portfolios = Portfolio.query.filter_by(is_public=True, is_approved=True).order_by(
-            Portfolio.created_at.desc()
+        recent_portfolios = PortfolioCard.query.filter(listed).order_by(
+            PortfolioCard.created_at.desc()
         ).limit(5).all()
         
         recent_activity = []
-        for portfolio in recent_portfolios:
+        for card in recent_portfolios:
             recent_activity.append({
-                'id': portfolio.id,
-                'title': portfolio.title or f"{portfolio.user.first_name}'s Portfolio",
-                'user': f"{portfolio.user.first_name} {portfolio.user.last_name or ''}",
-                'created_at': portfolio.created_at.isoformat(),
-                'url': f'/portfolio/{portfolio.id}'
+                'id': card.portfolio_id,
+                'title': card.title or f"{card.owner_first_name}'s Portfolio",
+                'user': f"{card.owner_first_name} {card.owner_last_name or ''}",
+                'created_at': card.created_at.isoformat(),
+                'url': f'/portfolio/{card.portfolio_id}'
             })
         
         return jsonify({
@@ -2,42 +2,37 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import login_required, current_user
 try:
     from app.models import Portfolio, User, Project, Skill, Testimonial, Inquiry, Analytics, db
+    from app.services.analytics_rollup import event_total
+    from app.services.analytics_report import inquiry_counts, recent_views, recent_inquiries
+    from app.services.portfolio_loader import load_portfolio
+    from app.services.ordering import ORDERED_MODELS, next_rank, apply_order
+    from app.services.editor_batch import apply_operations
+    from app.services.current import current_portfolio
+    from app.services.upload_store import upload_store
 except ImportError:
     from models import Portfolio, User, Project, Skill, Testimonial, Inquiry, Analytics, db
-from werkzeug.utils import secure_filename
+    from services.analytics_rollup import event_total
+    from services.analytics_report import inquiry_counts, recent_views, recent_inquiries
+    from services.portfolio_loader import load_portfolio
+    from services.ordering import ORDERED_MODELS, next_rank, apply_order
+    from services.editor_batch import apply_operations
+    from services.current import current_portfolio
+    from services.upload_store import upload_store
 import os
 import json
-import mimetypes
+from sqlalchemy.exc import SQLAlchemyError
 
 portfolio = Blueprint('portfolio', __name__)
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
-
-def validate_file_upload(file, max_size_mb=2):
-    """Validate file upload for security and size"""
+def validate_file_upload(file):
+    """Validate file upload for security and size. The size cap and the content check
+    already ran while the request body was read (see services/upload_stream.py)."""
     if not file or not file.filename:
         return False, "No file selected"
     
-    # Check file extension
-    if not allowed_file(file.filename):
-        return False, "File type not allowed"
-    
-    # Check file size (max_size_mb in MB)
-    max_size_bytes = max_size_mb * 1024 * 1024
-    file.seek(0, os.SEEK_END)
-    file_size = file.tell()
-    file.seek(0)  # Reset file pointer
-    
-    if file_size > max_size_bytes:
-        return False, f"File size must be less than {max_size_mb}MB"
-    
-    # Check MIME type
-    mime_type, _ = mimetypes.guess_type(file.filename)
-    if mime_type and not mime_type.startswith('image/'):
-        return False, "Only image files are allowed"
+    error = getattr(file, 'error', None)
+    if error:
+        return False, error
     
     return True, "File is valid"
 
@@ -52,7 +47,7 @@ def editor():
     """Portfolio editor page with drag-and-drop functionality"""
     resp = block_admin()
     if resp: return resp
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         # Create a default portfolio if none exists
         portfolio = Portfolio(
@@ -73,7 +68,7 @@ def update_basic_info():
     """Update portfolio basic information"""
     resp = block_admin()
     if resp: return resp
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         flash('Portfolio not found', 'error')
         return redirect(url_for('portfolio.editor'))
@@ -93,15 +88,12 @@ def update_basic_info():
     if 'profile_image' in request.files:
         file = request.files['profile_image']
         if file and file.filename:
-            is_valid, error_message = validate_file_upload(file, max_size_mb=2)
+            is_valid, error_message = validate_file_upload(file)
             if not is_valid:
                 flash(f'Profile image error: {error_message}', 'error')
                 return redirect(url_for('portfolio.editor'))
             
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            portfolio.profile_image = f'/uploads/{filename}'
+            portfolio.profile_image = upload_store.save(file)
     
     db.session.commit()
     flash('Portfolio updated successfully!', 'success')
@@ -113,7 +105,7 @@ def add_project():
     """Add a new project to portfolio"""
     resp = block_admin()
     if resp: return resp
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         return jsonify({'success': False, 'message': 'Portfolio not found'})
     
@@ -129,21 +121,18 @@ def add_project():
         category=request.form.get('category'),
         project_url=request.form.get('project_url'),
         github_url=request.form.get('github_url'),
-        order_index=portfolio.projects.count()
+        order_index=next_rank(Project, portfolio.id)
     )
     
     # Handle project image upload
     if 'image' in request.files:
         file = request.files['image']
         if file and file.filename:
-            is_valid, error_message = validate_file_upload(file, max_size_mb=2)
+            is_valid, error_message = validate_file_upload(file)
             if not is_valid:
                 return jsonify({'success': False, 'message': f'Image error: {error_message}'})
             
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            project.image_url = f'/uploads/{filename}'
+            project.image_url = upload_store.save(file)
     
     db.session.add(project)
     db.session.commit()
@@ -156,7 +145,7 @@ def add_skill():
     """Add a new skill to portfolio"""
     resp = block_admin()
     if resp: return resp
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         return jsonify({'success': False, 'message': 'Portfolio not found'})
     
@@ -169,7 +158,7 @@ def add_skill():
         name=request.form.get('name'),
         level=request.form.get('level'),
         category=request.form.get('category'),
-        order_index=portfolio.skills.count()
+        order_index=next_rank(Skill, portfolio.id)
     )
     
     db.session.add(skill)
@@ -183,7 +172,7 @@ def add_testimonial():
     """Add a new testimonial to portfolio"""
     resp = block_admin()
     if resp: return resp
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         return jsonify({'success': False, 'message': 'Portfolio not found'})
     
@@ -198,21 +187,18 @@ def add_testimonial():
         client_position=request.form.get('client_position'),
         testimonial_text=request.form.get('testimonial_text'),
         rating=int(request.form.get('rating', 5)),
-        order_index=portfolio.testimonials.count()
+        order_index=next_rank(Testimonial, portfolio.id)
     )
     
     # Handle client image upload
     if 'client_image' in request.files:
         file = request.files['client_image']
         if file and file.filename:
-            is_valid, error_message = validate_file_upload(file, max_size_mb=2)
+            is_valid, error_message = validate_file_upload(file)
             if not is_valid:
                 return jsonify({'success': False, 'message': f'Client image error: {error_message}'})
             
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            testimonial.client_image = f'/uploads/{filename}'
+            testimonial.client_image = upload_store.save(file)
     
     db.session.add(testimonial)
     db.session.commit()
@@ -233,9 +219,9 @@ def send_inquiry(portfolio_id):
     )
     
     db.session.add(inquiry)
-    db.session.commit()
+    db.session.flush()
     
-    # Send email notification to portfolio owner
+    # Notify the portfolio owner; with the outbox on, the email commits with the inquiry
     try:
         from app.services.email_service import send_inquiry_notification
         send_inquiry_notification(inquiry)
@@ -243,6 +229,8 @@ def send_inquiry(portfolio_id):
         # Log error but don't break the form submission
         print(f"Error sending inquiry notification: {e}")
     
+    db.session.commit()
+    
     flash('Your message has been sent successfully!', 'success')
     return redirect(url_for('main.view_portfolio', portfolio_id=portfolio.id))
 
@@ -252,27 +240,22 @@ def analytics():
     """Portfolio analytics dashboard"""
     resp = block_admin()
     if resp: return resp
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         flash('Portfolio not found', 'error')
         return redirect(url_for('portfolio.editor'))
     
-    # Get analytics data
-    views = Analytics.query.filter_by(portfolio_id=portfolio.id, event_type='view').all()
-    inquiries = Inquiry.query.filter_by(portfolio_id=portfolio.id).all()
-    
-    # Calculate stats
-    total_views = len(views)
-    total_inquiries = len(inquiries)
-    unread_inquiries = len([i for i in inquiries if not i.is_read])
+    # Get analytics data (counts aggregated in SQL, only the latest rows loaded)
+    total_views = event_total('view', portfolio.id)
+    total_inquiries, unread_inquiries = inquiry_counts(portfolio.id)
     
     return render_template('portfolio/analytics.html', 
                          portfolio=portfolio,
                          total_views=total_views,
                          total_inquiries=total_inquiries,
                          unread_inquiries=unread_inquiries,
-                         views=views,
-                         inquiries=inquiries)
+                         views=recent_views(portfolio.id),
+                         inquiries=recent_inquiries(portfolio.id))
 
 @portfolio.route('/inquiries')
 @login_required
@@ -280,7 +263,7 @@ def my_inquiries():
     """View portfolio inquiries"""
     resp = block_admin()
     if resp: return resp
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         flash('Portfolio not found', 'error')
         return redirect(url_for('portfolio.editor'))
@@ -295,7 +278,7 @@ def mark_inquiry_read(inquiry_id):
     resp = block_admin()
     if resp: return resp
     inquiry = Inquiry.query.get_or_404(inquiry_id)
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     
     if inquiry.portfolio_id != portfolio.id:
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -327,7 +310,9 @@ def edit(portfolio_id):
 
 @portfolio.route('/view/<int:portfolio_id>')
 def view(portfolio_id):
-    portfolio = Portfolio.query.get_or_404(portfolio_id)
+    portfolio = load_portfolio(portfolio_id)
+    if portfolio is None:
+        abort(404)
     return render_template('portfolio/view.html', portfolio=portfolio)
 
 @portfolio.route('/delete-project/<int:project_id>', methods=['POST'])
@@ -337,7 +322,7 @@ def delete_project(project_id):
     resp = block_admin()
     if resp: return resp
     project = Project.query.get_or_404(project_id)
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     
     if not portfolio or project.portfolio_id != portfolio.id:
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -354,7 +339,7 @@ def delete_skill(skill_id):
     resp = block_admin()
     if resp: return resp
     skill = Skill.query.get_or_404(skill_id)
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     
     if not portfolio or skill.portfolio_id != portfolio.id:
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -371,7 +356,7 @@ def delete_testimonial(testimonial_id):
     resp = block_admin()
     if resp: return resp
     testimonial = Testimonial.query.get_or_404(testimonial_id)
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     
     if not portfolio or testimonial.portfolio_id != portfolio.id:
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -387,7 +372,7 @@ def update_order():
     """Update the order of portfolio items"""
     resp = block_admin()
     if resp: return resp
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         return jsonify({'success': False, 'message': 'Portfolio not found'})
     
@@ -395,25 +380,42 @@ def update_order():
     item_type = data.get('type')
     item_ids = data.get('item_ids', [])
     
-    if item_type == 'projects':
-        for index, project_id in enumerate(item_ids):
-            project = Project.query.get(project_id)
-            if project and project.portfolio_id == portfolio.id:
-                project.order_index = index
-    elif item_type == 'skills':
-        for index, skill_id in enumerate(item_ids):
-            skill = Skill.query.get(skill_id)
-            if skill and skill.portfolio_id == portfolio.id:
-                skill.order_index = index
-    elif item_type == 'testimonials':
-        for index, testimonial_id in enumerate(item_ids):
-            testimonial = Testimonial.query.get(testimonial_id)
-            if testimonial and testimonial.portfolio_id == portfolio.id:
-                testimonial.order_index = index
+    model = ORDERED_MODELS.get(item_type)
+    if model is None or not isinstance(item_ids, list):
+        return jsonify({'success': False, 'message': 'Invalid order'})
+    
+    # The whole list in one UPDATE ... CASE statement
+    apply_order(model, portfolio.id, item_ids)
     
     db.session.commit()
     return jsonify({'success': True, 'message': 'Order updated successfully!'})
 
+@portfolio.route('/batch', methods=['POST'])
+@login_required
+def batch():
+    """Apply a list of editor operations in one transaction"""
+    resp = block_admin()
+    if resp: return resp
+    portfolio = current_portfolio()
+    if not portfolio:
+        return jsonify({'success': False, 'message': 'Portfolio not found'})
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        results = apply_operations(portfolio, data.get('operations'))
+        db.session.commit()
+    except ValueError as e:
+        # All or nothing: one bad operation discards the whole batch
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    except SQLAlchemyError as e:
+        # Whatever validation missed, the database refused; the batch is still discarded
+        db.session.rollback()
+        current_app.logger.error(f'Editor batch failed: {e}')
+        return jsonify({'success': False, 'message': 'Could not save changes'})
+    
+    return jsonify({'success': True, 'message': 'Portfolio updated successfully!', 'results': results})
+
 @portfolio.route('/publish', methods=['POST'])
 @login_required
 def publish():
@@ -422,7 +424,7 @@ def publish():
     if resp: return resp
     print(f"Publish route called by user: {current_user.id}")
     
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         print("Portfolio not found")
         return jsonify({'success': False, 'message': 'Portfolio not found'})
@@ -455,7 +457,7 @@ def unpublish():
     if resp: return resp
     print(f"Unpublish route called by user: {current_user.id}")
     
-    portfolio = Portfolio.query.filter_by(user_id=current_user.id).first()
+    portfolio = current_portfolio()
     if not portfolio:
         print("Portfolio not found")
         return jsonify({'success': False, 'message': 'Portfolio not found'})
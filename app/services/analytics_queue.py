@@ -0,0 +1,167 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert
+try:
+    from app.models import db, Analytics
+    from app.services.analytics_rollup import record_events
+    from app.services.email_service import get_device_info
+    from app.services.geoip import geoip
+except ImportError:
+    from models import db, Analytics
+    from services.analytics_rollup import record_events
+    from services.email_service import get_device_info
+    from services.geoip import geoip
+
+analytics_table = Analytics.__table__
+
+class AnalyticsQueue:
+    """Takes Analytics inserts off the request path.
+
+    Handlers call ``track()``, which only puts a row on a bounded in-memory queue. A
+    background worker drains it in batches of up to ANALYTICS_BATCH_SIZE rows, resolves
+    each visitor's location and device, and writes each batch with a single executemany
+    INSERT, folding it into the daily rollup in the same transaction. When the queue is
+    full, track() waits up to ANALYTICS_ENQUEUE_TIMEOUT seconds (0 = don't wait) and then
+    drops the event and counts the drop. With ANALYTICS_ASYNC off, events are written inline.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.batch_size = 200
+        self.flush_interval = 1.0
+        self.enqueue_timeout = 0
+        self._queue = queue.Queue(maxsize=10000)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_batch_seconds = 0.0
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('ANALYTICS_ASYNC', True)
+        self.batch_size = app.config.get('ANALYTICS_BATCH_SIZE', 200)
+        self.flush_interval = app.config.get('ANALYTICS_FLUSH_INTERVAL', 1.0)
+        self.enqueue_timeout = app.config.get('ANALYTICS_ENQUEUE_TIMEOUT', 0)
+        self._queue = queue.Queue(maxsize=app.config.get('ANALYTICS_QUEUE_SIZE', 10000))
+        app.extensions['analytics_queue'] = self
+        # Once per process, however many apps the factory builds (tests, CLI)
+        if not self._atexit_registered:
+            atexit.register(self.drain)
+            self._atexit_registered = True
+
+    def track(self, portfolio_id, user_id, event_type, visitor_ip=None, user_agent=None, referrer=None):
+        """Queue an Analytics row; returns False if it had to be dropped"""
+        event = {
+            'portfolio_id': portfolio_id,
+            'user_id': user_id,
+            'event_type': event_type,
+            'visitor_ip': visitor_ip,
+            'user_agent': (user_agent or '')[:500],
+            'referrer': (referrer or '')[:200] or None,
+            'timestamp': datetime.utcnow(),
+        }
+        if not self.enabled:
+            self._write([event])
+            return True
+
+        self._ensure_worker()
+        try:
+            if self.enqueue_timeout:
+                self._queue.put(event, timeout=self.enqueue_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def drain(self):
+        """Write everything currently queued, batch by batch"""
+        written = 0
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'written': self.written,
+                'failed': self.failed,
+                'batches': self.batches,
+                'last_batch_seconds': round(self.last_batch_seconds, 4),
+            }
+
+    def _take(self, block=True):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch):
+        if self.app is None:
+            return 0
+        started = time.monotonic()
+        try:
+            with self.app.app_context():
+                # Resolved here, off the request path, so digests can GROUP BY them
+                for event in batch:
+                    event['location'] = geoip.lookup(event['visitor_ip'])
+                    event['device'] = get_device_info(event['user_agent'])
+                with db.engine.begin() as connection:
+                    connection.execute(insert(analytics_table), batch)
+                    record_events(connection, batch)
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            self.app.logger.error(f'Error writing {len(batch)} analytics events: {e}')
+            return 0
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.last_batch_seconds = time.monotonic() - started
+        return len(batch)
+
+    def _ensure_worker(self):
+        # One writer per process; a forked worker (gunicorn --preload) starts its own
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='analytics-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch:
+                self._write(batch)
+
+analytics_queue = AnalyticsQueue()
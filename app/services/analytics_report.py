@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, case
+try:
+    from app.models import db, Analytics, AnalyticsDaily, Inquiry
+except ImportError:
+    from models import db, Analytics, AnalyticsDaily, Inquiry
+
+BUCKETS = ('hour', 'day', 'week')
+MAX_HOURLY_RANGE = timedelta(days=31)
+RECENT_LIMIT = 10
+
+def _parse_time(value, end=False):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and len(value) == 10:
+        # A bare end date includes that whole day
+        parsed += timedelta(days=1)
+    return parsed
+
+def parse_range(args):
+    """Read start/end/bucket from request args; raises ValueError on bad input.
+
+    start is inclusive and end exclusive (UTC). Without a start, day and week series cover
+    all time and hourly series the last 24 hours; hourly ranges are capped at 31 days.
+    """
+    bucket = args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+    end = _parse_time(args.get('end'), end=True) or datetime.utcnow()
+    start = _parse_time(args.get('start'))
+    if start is None and bucket == 'hour':
+        start = end - timedelta(days=1)
+    if start is not None and start >= end:
+        raise ValueError('start must be before end')
+    if bucket == 'hour' and end - start > MAX_HOURLY_RANGE:
+        raise ValueError(f'Hourly ranges are limited to {MAX_HOURLY_RANGE.days} days')
+    return start, end, bucket
+
+def _hour_label(column, dialect):
+    if dialect == 'postgresql':
+        return func.to_char(func.date_trunc('hour', column), 'YYYY-MM-DD HH24:00')
+    if dialect in ('mysql', 'mariadb'):
+        return func.date_format(column, '%Y-%m-%d %H:00')
+    return func.strftime('%Y-%m-%d %H:00', column)
+
+def _week_label(column, dialect):
+    # Weeks start on Monday and are labelled with that date
+    if dialect == 'postgresql':
+        return func.to_char(func.date_trunc('week', column), 'YYYY-MM-DD')
+    if dialect in ('mysql', 'mariadb'):
+        return func.date_format(func.subdate(column, func.weekday(column)), '%Y-%m-%d')
+    return func.date(column, 'weekday 0', '-6 days')
+
+def event_series(portfolio_id, start, end, bucket, event_type='view'):
+    """{bucket label: count} for buckets with events, oldest first.
+
+    Hourly buckets are grouped from raw Analytics rows; day and week buckets from the
+    daily rollup, so they stay cheap over long ranges.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if bucket == 'hour':
+        label = _hour_label(Analytics.timestamp, dialect)
+        query = db.session.query(label, func.count(Analytics.id)).filter(
+            Analytics.portfolio_id == portfolio_id,
+            Analytics.event_type == event_type,
+            Analytics.timestamp >= start,
+            Analytics.timestamp < end
+        )
+    else:
+        label = AnalyticsDaily.day if bucket == 'day' else _week_label(AnalyticsDaily.day, dialect)
+        query = db.session.query(label, func.sum(AnalyticsDaily.count)).filter(
+            AnalyticsDaily.portfolio_id == portfolio_id,
+            AnalyticsDaily.event_type == event_type,
+            AnalyticsDaily.day <= (end - timedelta(microseconds=1)).date()
+        )
+        if start is not None:
+            query = query.filter(AnalyticsDaily.day >= start.date())
+    rows = query.group_by(label).order_by(label).all()
+    return {key if isinstance(key, str) else key.strftime('%Y-%m-%d'): count for key, count in rows}
+
+def inquiry_counts(portfolio_id):
+    """(total, unread) inquiries for a portfolio in one query"""
+    total, unread = db.session.query(
+        func.count(Inquiry.id),
+        func.coalesce(func.sum(case((Inquiry.is_read == False, 1), else_=0)), 0)
+    ).filter(Inquiry.portfolio_id == portfolio_id).one()
+    return total, unread
+
+def recent_views(portfolio_id, limit=RECENT_LIMIT):
+    """Latest view events, newest first"""
+    return Analytics.query.filter_by(portfolio_id=portfolio_id, event_type='view').order_by(
+        Analytics.timestamp.desc(), Analytics.id.desc()
+    ).limit(limit).all()
+
+def recent_inquiries(portfolio_id, limit=RECENT_LIMIT):
+    """Latest inquiries, newest first"""
+    return Inquiry.query.filter_by(portfolio_id=portfolio_id).order_by(
+        Inquiry.created_at.desc(), Inquiry.id.desc()
+    ).limit(limit).all()
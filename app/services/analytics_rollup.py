@@ -0,0 +1,116 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, insert, update, delete, func, and_
+try:
+    from app.models import db, Analytics, AnalyticsDaily, Portfolio
+except ImportError:
+    from models import db, Analytics, AnalyticsDaily, Portfolio
+
+rollup_table = AnalyticsDaily.__table__
+
+def _upsert(connection, rows):
+    """Add rows' counts onto existing (portfolio, event, day) buckets, creating missing ones"""
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(rollup_table)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['portfolio_id', 'event_type', 'day'],
+            set_={'count': rollup_table.c.count + stmt.excluded['count']}
+        ), rows)
+        return
+
+    for row in rows:
+        result = connection.execute(
+            update(rollup_table)
+            .where(and_(rollup_table.c.portfolio_id == row['portfolio_id'],
+                        rollup_table.c.event_type == row['event_type'],
+                        rollup_table.c.day == row['day']))
+            .values(count=rollup_table.c.count + row['count'])
+        )
+        if not result.rowcount:
+            connection.execute(insert(rollup_table), row)
+
+def record_events(connection, events, sign=1):
+    """Fold Analytics rows (dicts or objects) into the daily rollup on connection"""
+    buckets = Counter()
+    for e in events:
+        if isinstance(e, dict):
+            key = (e['portfolio_id'], e['event_type'], e.get('timestamp'))
+        else:
+            key = (e.portfolio_id, e.event_type, e.timestamp)
+        buckets[(key[0], key[1], (key[2] or datetime.utcnow()).date())] += sign
+    if not buckets:
+        return
+
+    _upsert(connection, [
+        {'portfolio_id': pid, 'event_type': event_type, 'day': day, 'count': count}
+        for (pid, event_type, day), count in sorted(buckets.items())
+    ])
+    if sign < 0:
+        connection.execute(delete(rollup_table).where(and_(
+            rollup_table.c.portfolio_id.in_({pid for pid, _, _ in buckets}),
+            rollup_table.c.count <= 0
+        )))
+
+@event.listens_for(db.session, 'after_flush')
+def _sync_rollup(session, flush_context):
+    """Keep the rollup in step with Analytics rows written through the ORM"""
+    added = [obj for obj in session.new if isinstance(obj, Analytics)]
+    removed = [obj for obj in session.deleted if isinstance(obj, Analytics)]
+    portfolio_removed = any(isinstance(obj, Portfolio) for obj in session.deleted)
+    if not (added or removed or portfolio_removed):
+        return
+
+    connection = session.connection()
+    record_events(connection, added)
+    record_events(connection, removed, sign=-1)
+    if portfolio_removed:
+        connection.execute(
+            delete(rollup_table).where(rollup_table.c.portfolio_id.not_in(select(Portfolio.id)))
+        )
+
+def rebuild_rollup():
+    """Recompute the whole rollup from Analytics; returns the number of buckets written"""
+    connection = db.session.connection()
+    connection.execute(delete(rollup_table))
+    day = func.date(Analytics.timestamp)
+    connection.execute(insert(rollup_table).from_select(
+        ['portfolio_id', 'event_type', 'day', 'count'],
+        select(Analytics.portfolio_id, Analytics.event_type, day, func.count(Analytics.id))
+        .where(Analytics.timestamp.is_not(None))
+        .group_by(Analytics.portfolio_id, Analytics.event_type, day)
+    ))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(rollup_table).scalar()
+
+def event_total(event_type, portfolio_id=None):
+    """All-time count of event_type, site-wide or for one portfolio"""
+    query = db.session.query(func.coalesce(func.sum(AnalyticsDaily.count), 0)).filter(
+        AnalyticsDaily.event_type == event_type
+    )
+    if portfolio_id is not None:
+        query = query.filter(AnalyticsDaily.portfolio_id == portfolio_id)
+    return query.scalar()
+
+def daily_counts(event_type, portfolio_id=None, start=None):
+    """{'YYYY-MM-DD': count} for days with events, oldest first"""
+    query = db.session.query(AnalyticsDaily.day, func.sum(AnalyticsDaily.count)).filter(
+        AnalyticsDaily.event_type == event_type
+    )
+    if portfolio_id is not None:
+        query = query.filter(AnalyticsDaily.portfolio_id == portfolio_id)
+    if start is not None:
+        query = query.filter(AnalyticsDaily.day >= start)
+    rows = query.group_by(AnalyticsDaily.day).order_by(AnalyticsDaily.day).all()
+    return {day.strftime('%Y-%m-%d'): count for day, count in rows}
+
+def last_days(event_type, days, portfolio_id=None):
+    """Counts for the last `days` UTC days, newest first, with empty days as 0"""
+    today = datetime.utcnow().date()
+    counts = daily_counts(event_type, portfolio_id, start=today - timedelta(days=days - 1))
+    dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+    return {date: counts.get(date, 0) for date in dates}
@@ -0,0 +1,147 @@
+from collections import defaultdict
+from sqlalchemy import event, inspect, select, insert, update, delete, bindparam, func
+try:
+    from app.models import db, Portfolio, PortfolioCard, User, Project, Skill, Testimonial
+except ImportError:
+    from models import db, Portfolio, PortfolioCard, User, Project, Skill, Testimonial
+
+CARD_SKILLS = 5
+BIO_EXCERPT_LENGTH = 200
+REBUILD_BATCH_SIZE = 500
+
+card_table = PortfolioCard.__table__
+
+# Attributes that change what a card shows; a view_count-only change takes the cheap path
+_CARD_ATTRS = {
+    Portfolio: ('title', 'bio', 'profile_image', 'location', 'user_id',
+                'is_public', 'is_approved', 'is_featured'),
+    User: ('username', 'first_name', 'last_name'),
+    Skill: ('name', 'order_index', 'portfolio_id'),
+    Project: ('portfolio_id',),
+    Testimonial: ('portfolio_id',),
+}
+
+def _changed(obj, attrs):
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+def _count(model):
+    return select(func.count(model.id)).where(model.portfolio_id == Portfolio.id).scalar_subquery()
+
+def refresh_cards(connection, portfolio_ids):
+    """Rewrite the cards for portfolio_ids from the source tables; cards of deleted portfolios are dropped"""
+    ids = list(portfolio_ids)
+    if not ids:
+        return
+
+    rows = connection.execute(
+        select(
+            Portfolio.id, Portfolio.user_id, Portfolio.title, Portfolio.bio,
+            Portfolio.profile_image, Portfolio.location, Portfolio.view_count,
+            Portfolio.is_public, Portfolio.is_approved, Portfolio.is_featured,
+            Portfolio.created_at, Portfolio.updated_at,
+            User.username, User.first_name, User.last_name,
+            _count(Skill).label('skill_count'),
+            _count(Project).label('project_count'),
+            _count(Testimonial).label('testimonial_count')
+        ).join(User, User.id == Portfolio.user_id).where(Portfolio.id.in_(ids))
+    ).all()
+
+    top_skills = defaultdict(list)
+    for portfolio_id, name in connection.execute(
+        select(Skill.portfolio_id, Skill.name)
+        .where(Skill.portfolio_id.in_(ids))
+        .order_by(Skill.portfolio_id, Skill.order_index, Skill.id)
+    ):
+        if len(top_skills[portfolio_id]) < CARD_SKILLS:
+            top_skills[portfolio_id].append(name)
+
+    connection.execute(delete(card_table).where(card_table.c.portfolio_id.in_(ids)))
+    if rows:
+        connection.execute(insert(card_table), [{
+            'portfolio_id': row.id,
+            'user_id': row.user_id,
+            'title': row.title,
+            'owner_username': row.username,
+            'owner_first_name': row.first_name,
+            'owner_last_name': row.last_name,
+            'bio_excerpt': (row.bio or '')[:BIO_EXCERPT_LENGTH],
+            'profile_image': row.profile_image,
+            'location': row.location,
+            'top_skills': ','.join(top_skills[row.id]),
+            'skill_count': row.skill_count,
+            'project_count': row.project_count,
+            'testimonial_count': row.testimonial_count,
+            'view_count': row.view_count or 0,
+            'is_public': row.is_public,
+            'is_approved': row.is_approved,
+            'is_featured': row.is_featured,
+            'created_at': row.created_at,
+            'updated_at': row.updated_at,
+        } for row in rows])
+
+@event.listens_for(db.session, 'after_flush')
+def _sync_cards(session, flush_context):
+    """Refresh affected cards in the same transaction as the write that changed them"""
+    portfolio_ids, user_ids, view_counts = set(), set(), {}
+    removed = False
+
+    for obj in session.new:
+        if isinstance(obj, Portfolio):
+            portfolio_ids.add(obj.id)
+        elif isinstance(obj, (Skill, Project, Testimonial)):
+            portfolio_ids.add(obj.portfolio_id)
+    for obj in session.dirty:
+        attrs = _CARD_ATTRS.get(type(obj))
+        if attrs is None:
+            continue
+        if isinstance(obj, Portfolio):
+            if _changed(obj, attrs):
+                portfolio_ids.add(obj.id)
+            elif _changed(obj, ('view_count',)):
+                view_counts[obj.id] = obj
+        elif isinstance(obj, User):
+            if _changed(obj, attrs):
+                user_ids.add(obj.id)
+        elif _changed(obj, attrs):
+            portfolio_ids.add(obj.portfolio_id)
+            portfolio_ids.update(inspect(obj).attrs.portfolio_id.history.deleted or ())
+    for obj in session.deleted:
+        if isinstance(obj, (Portfolio, User)):
+            removed = True
+        elif isinstance(obj, (Skill, Project, Testimonial)):
+            portfolio_ids.add(obj.portfolio_id)
+
+    if not (portfolio_ids or user_ids or view_counts or removed):
+        return
+
+    connection = session.connection()
+    if user_ids:
+        portfolio_ids.update(connection.execute(
+            select(Portfolio.id).where(Portfolio.user_id.in_(user_ids))
+        ).scalars())
+    portfolio_ids.discard(None)
+    refresh_cards(connection, portfolio_ids)
+
+    pending_views = [obj for pid, obj in view_counts.items() if pid not in portfolio_ids]
+    if pending_views:
+        connection.execute(
+            update(card_table)
+            .where(card_table.c.portfolio_id == bindparam('pid'))
+            .values(view_count=bindparam('views'), updated_at=bindparam('updated')),
+            [{'pid': obj.id, 'views': obj.view_count or 0, 'updated': obj.updated_at} for obj in pending_views]
+        )
+    if removed:
+        connection.execute(
+            delete(card_table).where(card_table.c.portfolio_id.not_in(select(Portfolio.id)))
+        )
+
+def rebuild_cards():
+    """Rebuild every card from scratch; returns the number of cards written"""
+    connection = db.session.connection()
+    connection.execute(delete(card_table))
+    ids = connection.execute(select(Portfolio.id).order_by(Portfolio.id)).scalars().all()
+    for start in range(0, len(ids), REBUILD_BATCH_SIZE):
+        refresh_cards(connection, ids[start:start + REBUILD_BATCH_SIZE])
+    db.session.commit()
+    return len(ids)
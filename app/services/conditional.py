@@ -0,0 +1,71 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import request, make_response
+from sqlalchemy import event, inspect
+try:
+    from app.models import db, Portfolio, User, Project, Skill, Testimonial
+except ImportError:
+    from models import db, Portfolio, User, Project, Skill, Testimonial
+
+# Owner fields shown on portfolio pages and in the API
+_OWNER_ATTRS = ('username', 'first_name', 'last_name')
+
+@event.listens_for(db.session, 'before_flush')
+def _touch_portfolios(session, flush_context, instances):
+    """Bump Portfolio.updated_at when its projects, skills, testimonials or owner change,
+    so updated_at alone versions everything a portfolio page shows"""
+    touched = set()
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, (Project, Skill, Testimonial)):
+                if obj in session.dirty and not session.is_modified(obj):
+                    continue
+                portfolio = obj.portfolio or (
+                    session.get(Portfolio, obj.portfolio_id) if obj.portfolio_id else None
+                )
+            elif isinstance(obj, User) and obj in session.dirty:
+                state = inspect(obj)
+                if not any(state.attrs[attr].history.has_changes() for attr in _OWNER_ATTRS):
+                    continue
+                portfolio = obj.portfolio
+            else:
+                continue
+            if portfolio is not None and portfolio not in session.deleted:
+                touched.add(portfolio)
+    now = datetime.utcnow()
+    for portfolio in touched:
+        portfolio.updated_at = now
+
+def make_etag(*parts):
+    """Opaque validator built from the values a response depends on"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+
+def _as_http_date(value):
+    # updated_at is naive UTC; HTTP dates have whole-second precision
+    return value.replace(tzinfo=timezone.utc, microsecond=0) if value else None
+
+def not_modified(etag, last_modified=None):
+    """A 304 for the current request if its validators still match, else None.
+
+    Call it before loading anything the response body needs. If-None-Match wins over
+    If-Modified-Since, as in RFC 9110.
+    """
+    last_modified = _as_http_date(last_modified)
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return with_validators(make_response('', 304), etag, last_modified)
+
+def with_validators(response, etag, last_modified=None, cache_control='no-cache'):
+    """Attach ETag/Last-Modified so the client can revalidate next time"""
+    response = make_response(response)
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = _as_http_date(last_modified)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,12 @@
+from flask import g
+from flask_login import current_user
+
+def current_portfolio():
+    """The signed-in user's portfolio, or None, looked up at most once per request.
+
+    The app's user_loader joins the portfolio onto the user it loads, so this normally
+    costs no query at all; the result is kept on ``g`` for the rest of the request.
+    """
+    if 'current_portfolio' not in g:
+        g.current_portfolio = current_user.portfolio if current_user.is_authenticated else None
+    return g.current_portfolio
@@ -0,0 +1,146 @@
+try:
+    from app.models import db
+    from app.services.ordering import ORDERED_MODELS, next_rank, move_item, apply_order
+except ImportError:
+    from models import db
+    from services.ordering import ORDERED_MODELS, next_rank, move_item, apply_order
+
+MAX_OPERATIONS = 100
+
+# Fields each item type accepts from the editor, and which of them add requires
+FIELDS = {
+    'projects': ('title', 'description', 'technologies', 'category', 'project_url', 'github_url'),
+    'skills': ('name', 'level', 'category'),
+    'testimonials': ('client_name', 'client_company', 'client_position', 'testimonial_text', 'rating'),
+    'basic_info': ('title', 'bio', 'location', 'website', 'linkedin', 'github'),
+}
+# Fields that can't be missing or blank, on add and on update alike (NOT NULL columns,
+# plus what the editor forms require)
+REQUIRED = {
+    'projects': ('title', 'description', 'technologies', 'category'),
+    'skills': ('name', 'level', 'category'),
+    'testimonials': ('client_name', 'testimonial_text', 'rating'),
+    'basic_info': ('title',),
+}
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def _fields(item_type, fields, adding=False):
+    if not isinstance(fields, dict):
+        raise ValueError('fields must be an object')
+    values = {name: fields[name] for name in FIELDS[item_type] if name in fields}
+    required = REQUIRED.get(item_type, ())
+    if adding and any(_blank(values.get(name)) for name in required):
+        raise ValueError('Please fill in all required fields')
+    for name, value in values.items():
+        if name in required and _blank(value):
+            raise ValueError(f'{name} cannot be empty')
+        if name == 'rating':
+            try:
+                values['rating'] = min(max(int(value), 1), 5)
+            except (TypeError, ValueError):
+                raise ValueError('rating must be a number')
+        elif value is not None and not isinstance(value, str):
+            # Lists, objects and numbers would reach a String column as-is
+            raise ValueError(f'{name} must be a string')
+    return values
+
+def _owned_items(portfolio, operations):
+    """Every item the batch updates or deletes, fetched with one query per item type;
+    items of other portfolios are simply not found"""
+    wanted = {}
+    for operation in operations:
+        if operation.get('op') in ('update', 'delete') and operation.get('type') in ORDERED_MODELS:
+            try:
+                wanted.setdefault(operation['type'], set()).add(int(operation.get('id')))
+            except (TypeError, ValueError):
+                continue
+    items = {}
+    for item_type, ids in wanted.items():
+        model = ORDERED_MODELS[item_type]
+        for item in model.query.filter(model.portfolio_id == portfolio.id, model.id.in_(ids)):
+            items[item_type, item.id] = item
+    return items
+
+def apply_operations(portfolio, operations):
+    """Apply a list of editor operations to portfolio in the current transaction.
+
+    Each operation is a dict with ``op`` (add, update, delete or reorder) and ``type``
+    (projects, skills, testimonials, or basic_info for update). add and update take
+    ``fields``; update and delete take ``id``; reorder takes either ``item_ids`` (the
+    full order) or ``old_index``/``new_index`` (one move). Operations run in order.
+    Returns one result per operation (the new id for add, else None). Raises ValueError
+    naming the first bad operation; the caller rolls back and commits nothing.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise ValueError(f'At most {MAX_OPERATIONS} operations per batch')
+    if not all(isinstance(operation, dict) for operation in operations):
+        raise ValueError('Each operation must be an object')
+
+    items = _owned_items(portfolio, operations)
+    ranks = {}
+    results = []
+    for i, operation in enumerate(operations):
+        try:
+            results.append(_apply(portfolio, operation, items, ranks))
+        except ValueError as e:
+            raise ValueError(f'Operation {i + 1}: {e}')
+    # One flush for the whole batch, so the read-model hooks run once rather than per add
+    db.session.flush()
+    return [result.id if result is not None else None for result in results]
+
+def _apply(portfolio, operation, items, ranks):
+    op, item_type = operation.get('op'), operation.get('type')
+
+    if item_type == 'basic_info':
+        if op != 'update':
+            raise ValueError('basic_info only supports update')
+        for name, value in _fields(item_type, operation.get('fields')).items():
+            setattr(portfolio, name, value or '')
+        return None
+
+    model = ORDERED_MODELS.get(item_type)
+    if model is None:
+        raise ValueError(f'Unknown type: {item_type}')
+
+    if op == 'add':
+        # New items go after everything else, including earlier adds in this batch
+        if item_type not in ranks:
+            ranks[item_type] = next_rank(model, portfolio.id)
+        item = model(portfolio_id=portfolio.id, order_index=ranks[item_type],
+                     **_fields(item_type, operation.get('fields'), adding=True))
+        ranks[item_type] += 1
+        db.session.add(item)
+        return item
+
+    if op in ('update', 'delete'):
+        try:
+            key = (item_type, int(operation.get('id')))
+        except (TypeError, ValueError):
+            key = None
+        item = items.get(key)
+        if item is None:
+            raise ValueError(f'{model.__name__} not found')
+        if op == 'delete':
+            db.session.delete(items.pop(key))
+        else:
+            for name, value in _fields(item_type, operation.get('fields')).items():
+                setattr(item, name, value)
+        return None
+
+    if op == 'reorder':
+        if isinstance(operation.get('item_ids'), list):
+            apply_order(model, portfolio.id, operation['item_ids'])
+        else:
+            old_index, new_index = operation.get('old_index'), operation.get('new_index')
+            if not isinstance(old_index, int) or not isinstance(new_index, int) \
+                    or not move_item(model, portfolio.id, old_index, new_index):
+                raise ValueError('Invalid index')
+        # Later adds must land after the reordered items
+        ranks.pop(item_type, None)
+        return None
+
+    raise ValueError(f'Unknown op: {op}')
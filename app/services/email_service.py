@@ -1,35 +1,29 @@
 from flask import render_template, url_for, current_app
 from flask_mail import Message
-from threading import Thread
-import requests
 from datetime import datetime
+try:
+    from app.services.mail_pool import mail_pool
+    from app.services.outbox import queue_email
+    from app.services.geoip import geoip
+except ImportError:
+    from services.mail_pool import mail_pool
+    from services.outbox import queue_email
+    from services.geoip import geoip
 
-def send_async_email(app, msg):
-    """Send email asynchronously"""
-    with app.app_context():
-        from app.app import mail
-        mail.send(msg)
-
-def send_email_async(subject, recipients, template, **kwargs):
-    """Send email asynchronously using threading"""
-    app = current_app._get_current_object()
+def send_email_async(subject, recipients, template, idempotency_key=None, **kwargs):
+    """Render an email and hand it to the sender pool, or with MAIL_USE_OUTBOX to the
+    outbox, where it is only delivered once the caller's transaction commits"""
+    if current_app.config.get('MAIL_USE_OUTBOX'):
+        return queue_email(subject, recipients, template, idempotency_key=idempotency_key, **kwargs)
+    
     msg = Message(subject, recipients=recipients)
     msg.html = render_template(f'emails/{template}.html', **kwargs)
     
-    Thread(target=send_async_email, args=(app, msg)).start()
+    return mail_pool.submit(msg)
 
 def get_location_from_ip(ip_address):
-    """Get location information from IP address"""
-    try:
-        if ip_address and ip_address != '127.0.0.1':
-            response = requests.get(f'http://ip-api.com/json/{ip_address}', timeout=3)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 'success':
-                    return f"{data.get('city', 'Unknown')}, {data.get('country', 'Unknown')}"
-        return "Unknown Location"
-    except:
-        return "Unknown Location"
+    """Get location information from IP address (local GeoIP table, no network)"""
+    return geoip.lookup(ip_address) or "Unknown Location"
 
 def get_device_info(user_agent):
     """Extract device information from user agent"""
@@ -70,8 +64,7 @@ def send_portfolio_view_notification(portfolio, analytics_record):
         'viewer_location': location,
         'viewer_device': device,
         'total_views': total_views,
-        'portfolio_url': url_for('main.view_portfolio', portfolio_id=portfolio.id, _external=True),
-        'unsubscribe_url': url_for('portfolio.unsubscribe_views', _external=True)
+        'portfolio_url': url_for('main.view_portfolio', portfolio_id=portfolio.id, _external=True)
     }
     
     # Send email
@@ -82,6 +75,31 @@ def send_portfolio_view_notification(portfolio, analytics_record):
         **email_data
     )
 
+def send_view_digest(portfolio, digest, window, start, end):
+    """Send one summary of a window's views instead of an email per view"""
+    if not portfolio.user.email:
+        return None
+    
+    period = 'hour' if window == 'hourly' else 'day'
+    email_data = {
+        'portfolio': portfolio,
+        'digest': digest,
+        'period': period,
+        'period_start': start.strftime('%Y-%m-%d %H:%M'),
+        'period_end': end.strftime('%Y-%m-%d %H:%M'),
+        'total_views': portfolio.view_count,
+        'portfolio_url': url_for('main.view_portfolio', portfolio_id=portfolio.id, _external=True),
+        'analytics_url': url_for('portfolio.analytics', _external=True)
+    }
+    
+    return send_email_async(
+        subject=f"📈 {digest.views} new views of '{portfolio.title}' in the last {period}",
+        recipients=[portfolio.user.email],
+        template='view_digest',
+        idempotency_key=f"view-digest-{portfolio.id}-{window}-{start.strftime('%Y%m%d%H')}",
+        **email_data
+    )
+
 def send_inquiry_notification(inquiry):
     """Send email notification for new inquiry"""
     portfolio = inquiry.portfolio
@@ -92,8 +110,7 @@ def send_inquiry_notification(inquiry):
     email_data = {
         'portfolio': portfolio,
         'inquiry': inquiry,
-        'inquiry_url': url_for('portfolio.inquiries', _external=True),
-        'unsubscribe_url': url_for('portfolio.unsubscribe_inquiries', _external=True)
+        'inquiry_url': url_for('portfolio.my_inquiries', _external=True)
     }
     
     # Send email
@@ -101,6 +118,7 @@ def send_inquiry_notification(inquiry):
         subject=f"💼 New inquiry for your portfolio '{portfolio.title}'",
         recipients=[portfolio.user.email],
         template='inquiry_notification',
+        idempotency_key=f'inquiry-{inquiry.id}',
         **email_data
     )
 
@@ -116,6 +134,7 @@ def send_welcome_email(user):
         subject="Welcome to Freelance Portfolio! 🎉",
         recipients=[user.email],
         template='welcome',
+        idempotency_key=f'welcome-{user.id}',
         **email_data
     )
 
@@ -0,0 +1,196 @@
+import csv
+import ipaddress
+import json
+import logging
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+
+MAGIC = b'FHGEOIP1'
+_UINT32 = 'I' if array('I').itemsize == 4 else 'L'
+
+def _parse_ip(value):
+    value = value.strip()
+    return ipaddress.ip_address(int(value) if value.isdigit() else value)
+
+def _location(country, city):
+    country, city = (country or '').strip(), (city or '').strip()
+    if city and country:
+        return f'{city}, {country}'
+    return city or country or None
+
+class GeoIPDatabase:
+    """Sorted IP range table searched with bisect.
+
+    IPv4 ranges live in flat uint32 arrays (start, end, location index), about 12 bytes
+    per range; IPv6 ranges in plain int lists. Location strings are stored once and shared
+    by every range that maps to them.
+    """
+
+    def __init__(self, ranges=()):
+        self.locations = []
+        index = {}
+        v4, v6 = [], []
+        for start, end, location in ranges:
+            if location not in index:
+                index[location] = len(self.locations)
+                self.locations.append(location)
+            (v4 if start.version == 4 else v6).append((int(start), int(end), index[location]))
+        v4.sort()
+        v6.sort()
+        self._v4_starts = array(_UINT32, (r[0] for r in v4))
+        self._v4_ends = array(_UINT32, (r[1] for r in v4))
+        self._v4_locations = array(_UINT32, (r[2] for r in v4))
+        self._v6_starts = [r[0] for r in v6]
+        self._v6_ends = [r[1] for r in v6]
+        self._v6_locations = array(_UINT32, (r[2] for r in v6))
+
+    def __len__(self):
+        return len(self._v4_starts) + len(self._v6_starts)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Read ``start_ip,end_ip,country[,city]`` rows; addresses may be dotted, IPv6 or
+        integers, and a header row or malformed lines are skipped"""
+        def rows():
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.reader(f):
+                    if len(row) < 3:
+                        continue
+                    try:
+                        start, end = _parse_ip(row[0]), _parse_ip(row[1])
+                    except ValueError:
+                        continue
+                    location = _location(row[2], row[3] if len(row) > 3 else None)
+                    if location and start.version == end.version and start <= end:
+                        yield start, end, location
+        return cls(rows())
+
+    @classmethod
+    def load(cls, path):
+        """Load a table written by save(), or a CSV when path ends in .csv"""
+        if path.lower().endswith('.csv'):
+            return cls.from_csv(path)
+        db = cls()
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a GeoIP table')
+            n4, n6, size = struct.unpack('<III', f.read(12))
+            for name in ('_v4_starts', '_v4_ends', '_v4_locations'):
+                values = array(_UINT32)
+                values.fromfile(f, n4)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                setattr(db, name, values)
+            db._v6_starts = [int.from_bytes(f.read(16), 'big') for _ in range(n6)]
+            db._v6_ends = [int.from_bytes(f.read(16), 'big') for _ in range(n6)]
+            db._v6_locations = array(_UINT32)
+            db._v6_locations.fromfile(f, n6)
+            if sys.byteorder == 'big':
+                db._v6_locations.byteswap()
+            db.locations = json.loads(f.read(size).decode('utf-8'))
+        return db
+
+    def save(self, path):
+        """Write the compact binary form that load() reads back without parsing"""
+        locations = json.dumps(self.locations).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<III', len(self._v4_starts), len(self._v6_starts), len(locations)))
+            for values in (self._v4_starts, self._v4_ends, self._v4_locations):
+                values = array(_UINT32, values)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                values.tofile(f)
+            for values in (self._v6_starts, self._v6_ends):
+                f.write(b''.join(value.to_bytes(16, 'big') for value in values))
+            values = array(_UINT32, self._v6_locations)
+            if sys.byteorder == 'big':
+                values.byteswap()
+            values.tofile(f)
+            f.write(locations)
+
+    def lookup(self, ip):
+        """Location string for ip, or None when it is unknown, private or not an address"""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            return None
+        if address.version == 4:
+            starts, ends, locations = self._v4_starts, self._v4_ends, self._v4_locations
+        else:
+            starts, ends, locations = self._v6_starts, self._v6_ends, self._v6_locations
+        value = int(address)
+        i = bisect_right(starts, value) - 1
+        if i >= 0 and value <= ends[i]:
+            return self.locations[locations[i]]
+        return None
+
+class GeoIP:
+    """Process-wide GeoIP lookups with an LRU cache in front of the range table.
+
+    The table named by GEOIP_DATABASE (CSV or the binary form from ``flask geoip-compile``)
+    is loaded on first use; without one every address resolves to unknown. No lookup ever
+    touches the network.
+    """
+
+    def __init__(self, app=None):
+        self.path = None
+        self.cache_size = 4096
+        self._db = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._cached_lookup = None
+        self._logger = logging.getLogger(__name__)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.path = app.config.get('GEOIP_DATABASE')
+        self.cache_size = app.config.get('GEOIP_CACHE_SIZE', 4096)
+        self._db = None
+        self._loaded = False
+        self._cached_lookup = None
+        self._logger = app.logger
+        app.extensions['geoip'] = self
+
+    def _database(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    if self.path:
+                        try:
+                            self._db = GeoIPDatabase.load(self.path)
+                        except (OSError, ValueError) as e:
+                            self._logger.error(f'Could not load GeoIP table {self.path}: {e}')
+                    self._cached_lookup = lru_cache(maxsize=self.cache_size)(self._lookup)
+                    self._loaded = True
+        return self._db
+
+    def _lookup(self, ip):
+        return self._db.lookup(ip) if self._db is not None else None
+
+    def lookup(self, ip):
+        """Location string for ip, or None"""
+        if not ip:
+            return None
+        self._database()
+        return self._cached_lookup(ip)
+
+    def stats(self):
+        info = self._cached_lookup.cache_info() if self._cached_lookup else None
+        return {
+            'ranges': len(self._db) if self._db is not None else 0,
+            'cache_hits': info.hits if info else 0,
+            'cache_misses': info.misses if info else 0,
+            'cache_size': info.currsize if info else 0,
+        }
+
+geoip = GeoIP()
@@ -0,0 +1,247 @@
+import os
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+from markupsafe import Markup, escape
+from sqlalchemy import event, select, update
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it uploads are served as stored
+    Image = ImageOps = None
+try:
+    from app.models import db, StoredUpload
+    from app.services.upload_store import upload_store, stored_path, variant_path, URL_PREFIX
+except ImportError:
+    from models import db, StoredUpload
+    from services.upload_store import upload_store, stored_path, variant_path, URL_PREFIX
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+# Formats the resized copies are also written in, next to the WebP ones
+_FORMATS = {'jpg': 'JPEG', 'png': 'PNG'}
+
+upload_table = StoredUpload.__table__
+
+class ImageVariants:
+    """Resized and WebP copies of uploaded images, made once in a background pool.
+
+    After an upload commits, each new file is queued; a worker writes a WebP copy at every
+    IMAGE_VARIANT_WIDTHS width narrower than the original (plus one at full width) and a
+    resized copy in the original format (JPEG/PNG), then records the original's size and
+    the widths made on its stored_upload row. Templates call ``image_attrs(url, width)`` to
+    get src/srcset/sizes/width/height for an <img>, so a 64px avatar ships a 64-128px
+    file. With IMAGE_VARIANTS_ASYNC off, images are processed inline; without Pillow,
+    nothing is processed and image_attrs() returns the plain src.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.widths = (64, 128, 256, 512, 1024)
+        self.workers = 1
+        self.info_cache_size = 1024
+        self._queue = queue.Queue(maxsize=100)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._info = OrderedDict()
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('IMAGE_VARIANTS_ASYNC', True)
+        self.widths = tuple(sorted(app.config.get('IMAGE_VARIANT_WIDTHS', self.widths)))
+        self.workers = app.config.get('IMAGE_VARIANT_WORKERS', 1)
+        self._queue = queue.Queue(maxsize=app.config.get('IMAGE_VARIANT_QUEUE_SIZE', 100))
+        self._info = OrderedDict()
+        app.extensions['image_variants'] = self
+        app.add_template_global(self.image_attrs, 'image_attrs')
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def submit(self, path):
+        """Queue a stored file for processing; returns False if it was dropped"""
+        if not self.available:
+            return False
+        if not self.enabled:
+            self.process(path)
+            return True
+
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(path)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            # `flask build-image-variants` picks it up later
+            self.app.logger.error(f'Image variant queue full, skipped {path}')
+            return False
+        return True
+
+    def process(self, path):
+        """Write the copies of one stored file and record them; returns the widths made"""
+        width = height = None
+        made = []
+        try:
+            with Image.open(os.path.join(upload_store.root, path)) as original:
+                animated = getattr(original, 'is_animated', False)
+                image = ImageOps.exif_transpose(original)
+                width, height = image.size
+                if not animated:
+                    if image.mode not in ('RGB', 'RGBA'):
+                        image = image.convert('RGBA' if image.mode in ('LA', 'P', 'PA') else 'RGB')
+                    made = self._write_variants(path, image)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            # Not an image we can read; recorded with no variants so it isn't retried
+            with self._lock:
+                self.failed += 1
+            self.app.logger.error(f'Could not make image variants of {path}: {e}')
+
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(upload_table).where(upload_table.c.path == path)
+                .values(width=width, height=height, variant_widths=','.join(map(str, made)))
+            )
+        with self._lock:
+            self.processed += 1
+        return made
+
+    def _write_variants(self, path, image):
+        width, height = image.size
+        extension = path.rsplit('.', 1)[1]
+        made = []
+        for target in sorted({w for w in self.widths if w < width} | {width}):
+            resized = image if target == width else image.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS
+            )
+            self._save(resized, variant_path(path, target, 'webp'), 'WEBP', quality=WEBP_QUALITY)
+            if target < width and extension in _FORMATS:
+                if _FORMATS[extension] == 'JPEG':
+                    self._save(resized.convert('RGB'), variant_path(path, target, extension), 'JPEG',
+                               quality=JPEG_QUALITY, optimize=True, progressive=True)
+                else:
+                    self._save(resized, variant_path(path, target, extension), 'PNG', optimize=True)
+            made.append(target)
+        return made
+
+    def _save(self, image, path, image_format, **options):
+        # Same temp-file-and-rename as the originals, so a half-written copy is never served
+        target = os.path.join(upload_store.root, path)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                image.save(out, image_format, **options)
+            os.replace(tmp_path, target)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def info(self, path):
+        """(width, height, variant widths) of a processed stored file, or None"""
+        with self._lock:
+            if path in self._info:
+                self._info.move_to_end(path)
+                return self._info[path]
+        row = db.session.execute(
+            select(upload_table.c.width, upload_table.c.height, upload_table.c.variant_widths)
+            .where(upload_table.c.path == path)
+        ).first()
+        if row is None or row.variant_widths is None:
+            # Not processed yet; ask again next time
+            return None
+        info = (row.width, row.height, tuple(int(w) for w in row.variant_widths.split(',') if w))
+        # Stored files never change, so once processed the answer is final
+        with self._lock:
+            self._info[path] = info
+            while len(self._info) > self.info_cache_size:
+                self._info.popitem(last=False)
+        return info
+
+    def image_attrs(self, url, width, sizes=None):
+        """Attributes for an <img> showing url at width CSS pixels: src, plus srcset, sizes,
+        width and height once the upload's variants exist"""
+        path = stored_path(url)
+        info = self.info(path) if path else None
+        if not info or not info[2]:
+            return Markup(f'src="{escape(url)}"')
+
+        original_width, original_height, widths = info
+        extension = path.rsplit('.', 1)[1]
+        # For the rare browser without srcset: the smallest copy sharp on a 2x screen
+        src = url
+        if extension in _FORMATS:
+            src = next((URL_PREFIX + variant_path(path, w, extension)
+                        for w in widths if 2 * width <= w < original_width), url)
+        srcset = ', '.join(f'{URL_PREFIX}{variant_path(path, w, "webp")} {w}w' for w in widths)
+        height = max(1, round(width * original_height / original_width))
+        return Markup(
+            f'src="{escape(src)}" srcset="{escape(srcset)}" sizes="{escape(sizes or f"{width}px")}" '
+            f'width="{width}" height="{height}"'
+        )
+
+    def pending(self):
+        """Paths of stored files not processed yet"""
+        return db.session.execute(
+            select(upload_table.c.path).where(upload_table.c.variant_widths.is_(None))
+        ).scalars().all()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'available': self.available,
+                'queued': self._queue.qsize(),
+                'workers': sum(thread.is_alive() for thread in self._threads),
+                'processed': self.processed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'cached': len(self._info),
+            }
+
+    def _ensure_workers(self):
+        # One pool per process; a forked worker (gunicorn --preload) starts its own
+        if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._threads = []
+            self._pid = os.getpid()
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f'image-variants-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                path = self._queue.get()
+                try:
+                    self.process(path)
+                except Exception as e:
+                    with self._lock:
+                        self.failed += 1
+                    self.app.logger.error(f'Image variant worker failed on {path}: {e}')
+                finally:
+                    db.session.remove()
+
+image_variants = ImageVariants()
+
+@event.listens_for(db.session, 'after_commit')
+def _queue_new_uploads(session):
+    # Only once committed: the worker updates the file's stored_upload row
+    for path in session.info.pop('stored_uploads', ()):
+        image_variants.submit(path)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _forget_new_uploads(session, previous_transaction):
+    session.info.pop('stored_uploads', None)
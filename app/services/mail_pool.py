@@ -0,0 +1,202 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+class MailPool:
+    """Fixed set of sender threads sharing a bounded message queue.
+
+    Each worker keeps one SMTP connection open (``mail.connect()``) and sends every message
+    it takes over it, so a burst of notifications costs MAIL_POOL_WORKERS handshakes rather
+    than one per message. A connection idle for MAIL_CONNECTION_IDLE_SECONDS is closed
+    before the server drops it; a send that fails on a reused connection is retried once
+    on a fresh one. When the queue is full, submit() waits up to MAIL_ENQUEUE_TIMEOUT
+    seconds and then drops the message and counts the drop. With MAIL_ASYNC off, messages
+    are sent inline.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.workers = 2
+        self.idle_timeout = 30
+        self.enqueue_timeout = 2
+        self._queue = queue.Queue(maxsize=500)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+        self.last_send_seconds = 0.0
+        self.total_send_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('MAIL_ASYNC', True)
+        self.workers = app.config.get('MAIL_POOL_WORKERS', 2)
+        self.idle_timeout = app.config.get('MAIL_CONNECTION_IDLE_SECONDS', 30)
+        self.enqueue_timeout = app.config.get('MAIL_ENQUEUE_TIMEOUT', 2)
+        self._queue = queue.Queue(maxsize=app.config.get('MAIL_QUEUE_SIZE', 500))
+        app.extensions['mail_pool'] = self
+        # Once per process, however many apps the factory builds (tests, CLI)
+        if not self._atexit_registered:
+            atexit.register(self.drain)
+            self._atexit_registered = True
+
+    @property
+    def mail(self):
+        return self.app.extensions['mail']
+
+    def submit(self, msg):
+        """Queue a flask_mail Message; returns False if it was dropped or failed inline"""
+        if not self.enabled:
+            try:
+                with self.app.app_context():
+                    with self.mail.connect() as connection:
+                        return self._send(connection, msg)
+            except Exception as e:
+                self._failed(msg, e)
+                return False
+
+        self._ensure_workers()
+        item = (time.monotonic(), msg)
+        try:
+            if self.enqueue_timeout:
+                self._queue.put(item, timeout=self.enqueue_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            self.app.logger.error(f'Mail queue full, dropped message: {msg.subject}')
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def drain(self):
+        """Send whatever is still queued over one connection (used at exit)"""
+        if self.app is None or self._queue.empty():
+            return 0
+        sent = 0
+        with self.app.app_context():
+            with self.mail.connect() as connection:
+                while True:
+                    try:
+                        _, msg = self._queue.get_nowait()
+                    except queue.Empty:
+                        return sent
+                    sent += self._send(connection, msg)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'workers': sum(thread.is_alive() for thread in self._threads),
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'sent': self.sent,
+                'failed': self.failed,
+                'connections': self.connections,
+                'last_send_seconds': round(self.last_send_seconds, 4),
+                'avg_send_seconds': round(self.total_send_seconds / self.sent, 4) if self.sent else 0.0,
+                'max_wait_seconds': round(self.max_wait_seconds, 4),
+            }
+
+    def _send(self, connection, msg):
+        started = time.monotonic()
+        try:
+            connection.send(msg)
+        except Exception as e:
+            self._failed(msg, e)
+            return False
+        self._sent(started)
+        return True
+
+    def _sent(self, started):
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.sent += 1
+            self.last_send_seconds = elapsed
+            self.total_send_seconds += elapsed
+
+    def _failed(self, msg, error):
+        with self._lock:
+            self.failed += 1
+        self.app.logger.error(f'Error sending email "{msg.subject}": {error}')
+
+    def _ensure_workers(self):
+        # One pool per process; a forked worker (gunicorn --preload) starts its own
+        if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._threads = []
+            self._pid = os.getpid()
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f'mail-sender-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _open(self):
+        connection = self.mail.connect()
+        connection.__enter__()
+        with self._lock:
+            self.connections += 1
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass
+
+    def _run(self):
+        with self.app.app_context():
+            connection = None
+            while True:
+                try:
+                    queued_at, msg = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    if connection is not None:
+                        self._close(connection)
+                        connection = None
+                    continue
+
+                wait = time.monotonic() - queued_at
+                with self._lock:
+                    self.max_wait_seconds = max(self.max_wait_seconds, wait)
+                started = time.monotonic()
+                try:
+                    reused = connection is not None
+                    if connection is None:
+                        connection = self._open()
+                    try:
+                        connection.send(msg)
+                    except Exception:
+                        # The server may have dropped a long-lived connection; retry once
+                        self._close(connection)
+                        connection = None
+                        if not reused:
+                            raise
+                        connection = self._open()
+                        connection.send(msg)
+                except Exception as e:
+                    if connection is not None:
+                        self._close(connection)
+                        connection = None
+                    self._failed(msg, e)
+                    continue
+                self._sent(started)
+
+mail_pool = MailPool()
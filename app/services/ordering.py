@@ -0,0 +1,93 @@
+from datetime import datetime
+from sqlalchemy import select, update, case, func
+try:
+    from app.models import db, Portfolio, Project, Skill, Testimonial
+    from app.services.card_service import refresh_cards
+except ImportError:
+    from models import db, Portfolio, Project, Skill, Testimonial
+    from services.card_service import refresh_cards
+
+ORDERED_MODELS = {'projects': Project, 'skills': Skill, 'testimonials': Testimonial}
+
+def _ordered(model, portfolio_id):
+    return db.session.execute(
+        select(model.id, model.order_index)
+        .where(model.portfolio_id == portfolio_id)
+        .order_by(model.order_index, model.id)
+    ).all()
+
+def next_rank(model, portfolio_id):
+    """order_index that puts a new item after every existing one"""
+    last = db.session.execute(
+        select(func.max(model.order_index)).where(model.portfolio_id == portfolio_id)
+    ).scalar()
+    return 0.0 if last is None else float(last) + 1
+
+def _between(before, after):
+    """A rank strictly between two neighbours (either may be None), or None when there
+    is no room left (equal neighbours or float precision exhausted)"""
+    if before is None and after is None:
+        return 0.0
+    if before is None:
+        return float(after) - 1
+    if after is None:
+        return float(before) + 1
+    rank = (before + after) / 2
+    return rank if before < rank < after else None
+
+def move_item(model, portfolio_id, old_index, new_index):
+    """Move the item at old_index to new_index by giving it a rank between its new
+    neighbours. Only the moved row is written, unless its neighbours have no room
+    between them, in which case the whole list is renumbered with apply_order().
+    Returns False if either index is out of range."""
+    items = _ordered(model, portfolio_id)
+    if not (0 <= old_index < len(items) and 0 <= new_index < len(items)):
+        return False
+    if old_index == new_index:
+        return True
+
+    moved = items.pop(old_index)
+    items.insert(new_index, moved)
+    before = items[new_index - 1].order_index if new_index > 0 else None
+    after = items[new_index + 1].order_index if new_index + 1 < len(items) else None
+    rank = _between(before, after)
+    if rank is None:
+        apply_order(model, portfolio_id, [item.id for item in items])
+    else:
+        # Through the ORM, so the flush hooks see the change like any other edit
+        db.session.get(model, moved.id).order_index = rank
+    return True
+
+def apply_order(model, portfolio_id, item_ids):
+    """Renumber the portfolio's items 0, 1, 2, ... with a single
+    UPDATE ... SET order_index = CASE id ... END. The given items come first in list
+    order and any left out follow in their current order, so a partial or stale list
+    never leaves two items on one rank; ids of other portfolios are ignored"""
+    current = [item.id for item in _ordered(model, portfolio_id)]
+    owned = set(current)
+    ranks = {}
+    for item_id in item_ids:
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            continue
+        if item_id in owned:
+            ranks.setdefault(item_id, float(len(ranks)))
+    if not ranks:
+        return 0
+    for item_id in current:
+        ranks.setdefault(item_id, float(len(ranks)))
+
+    result = db.session.execute(
+        update(model)
+        .where(model.portfolio_id == portfolio_id, model.id.in_(ranks))
+        .values(order_index=case(ranks, value=model.id))
+        .execution_options(synchronize_session=False)
+    )
+    # A bulk UPDATE bypasses the flush hooks, so do what they would: bump updated_at
+    # (ETags, page cache) and refresh the card, whose top skills follow skill order
+    db.session.get(Portfolio, portfolio_id).updated_at = datetime.utcnow()
+    if model is Skill:
+        db.session.flush()
+        refresh_cards(db.session.connection(), [portfolio_id])
+    return result.rowcount
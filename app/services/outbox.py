@@ -0,0 +1,144 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app, render_template
+from flask_mail import Message
+from sqlalchemy import select, insert, update
+try:
+    from app.models import db, EmailOutbox
+except ImportError:
+    from models import db, EmailOutbox
+
+outbox_table = EmailOutbox.__table__
+
+def queue_email(subject, recipients, template, idempotency_key=None, **kwargs):
+    """Render an email into the outbox as part of the current transaction.
+
+    Nothing is sent until the caller commits and ``flask email-worker`` picks the row up,
+    so the email exists exactly when the write that triggered it does. Queuing the same
+    idempotency_key twice is a no-op, even from two transactions at once: the insert
+    skips a conflicting key instead of failing the caller's commit. Returns the new
+    row's id, or None for a duplicate.
+    """
+    values = {
+        'idempotency_key': idempotency_key or uuid.uuid4().hex,
+        'subject': subject,
+        'sender': current_app.config.get('MAIL_DEFAULT_SENDER'),
+        'recipients': ','.join(recipients),
+        'html': render_template(f'emails/{template}.html', **kwargs),
+        'status': 'pending',
+        'attempts': 0,
+        'next_attempt_at': datetime.utcnow(),
+        'created_at': datetime.utcnow(),
+    }
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        result = connection.execute(
+            dialect_insert(outbox_table).values(**values)
+            .on_conflict_do_nothing(index_elements=['idempotency_key'])
+            .returning(outbox_table.c.id)
+        )
+        return result.scalar()
+
+    if connection.execute(
+        select(outbox_table.c.id).where(outbox_table.c.idempotency_key == values['idempotency_key'])
+    ).first():
+        return None
+    return connection.execute(insert(outbox_table).values(**values)).inserted_primary_key[0]
+
+def claim_batch(limit, lease_seconds):
+    """Lease up to limit due rows to this worker; rows whose lease ran out are due again"""
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = (EmailOutbox.status.in_(('pending', 'sending')), EmailOutbox.next_attempt_at <= now)
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(
+            select(EmailOutbox.id).where(*due)
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit)
+        ), *due)
+        .values(status='sending', claim_token=token,
+                next_attempt_at=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claim_token=token).order_by(EmailOutbox.id).all()
+
+def backoff(attempts, base_seconds, max_seconds):
+    """Exponential retry delay after the given number of failed attempts"""
+    return min(base_seconds * 2 ** (attempts - 1), max_seconds)
+
+def _message(entry):
+    msg = Message(entry.subject, recipients=entry.recipients.split(','), html=entry.html,
+                  sender=entry.sender or current_app.config.get('MAIL_DEFAULT_SENDER'))
+    # A stable Message-ID lets receiving servers drop the duplicate if a crash between
+    # sending and marking the row sent makes us deliver it twice
+    domain = (msg.sender or 'localhost').rpartition('@')[2].strip('>') or 'localhost'
+    msg.msgId = f'<outbox-{entry.idempotency_key}@{domain}>'
+    return msg
+
+def _failed_attempt(entry, error):
+    """Schedule a retry with backoff, or give up after EMAIL_OUTBOX_MAX_ATTEMPTS; returns True if retrying"""
+    config = current_app.config
+    entry.attempts += 1
+    entry.last_error = str(error)[:1000]
+    if entry.attempts >= config['EMAIL_OUTBOX_MAX_ATTEMPTS']:
+        entry.status = 'failed'
+        current_app.logger.error(f'Giving up on email {entry.idempotency_key} after {entry.attempts} attempts: {error}')
+        return False
+    entry.status = 'pending'
+    entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff(
+        entry.attempts, config['EMAIL_OUTBOX_BACKOFF_SECONDS'], config['EMAIL_OUTBOX_MAX_BACKOFF_SECONDS']
+    ))
+    return True
+
+def deliver_batch(connection, entries):
+    """Send claimed rows over connection; returns (sent, retried, failed)"""
+    sent = retried = failed = 0
+    for entry in entries:
+        try:
+            connection.send(_message(entry))
+        except Exception as e:
+            if _failed_attempt(entry, e):
+                retried += 1
+            else:
+                failed += 1
+        else:
+            entry.status = 'sent'
+            entry.sent_at = datetime.utcnow()
+            entry.claim_token = None
+            sent += 1
+        # Commit per message so a crash mid-batch never resends what already went out
+        db.session.commit()
+    return sent, retried, failed
+
+def run_worker(batch_size=50, interval=5.0, once=False):
+    """Drain the outbox until it is empty (once) or forever, polling every interval seconds;
+    returns (sent, retried, failed) totals"""
+    config = current_app.config
+    mail = current_app.extensions['mail']
+    totals = [0, 0, 0]
+    while True:
+        entries = claim_batch(batch_size, config['EMAIL_OUTBOX_LEASE_SECONDS'])
+        if not entries:
+            if once:
+                return tuple(totals)
+            time.sleep(interval)
+            continue
+        try:
+            with mail.connect() as connection:
+                counts = deliver_batch(connection, entries)
+        except Exception as e:
+            # Could not reach the mail server at all: the whole batch backs off
+            current_app.logger.error(f'Email worker could not connect: {e}')
+            db.session.rollback()
+            retrying = [_failed_attempt(entry, e) for entry in entries if entry.status == 'sending']
+            db.session.commit()
+            counts = (0, retrying.count(True), retrying.count(False))
+        for i, count in enumerate(counts):
+            totals[i] += count
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import render_template, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy import event
+try:
+    from app.models import db, Portfolio, User, Project, Skill, Testimonial
+    from app.services.portfolio_loader import load_portfolio
+except ImportError:
+    from models import db, Portfolio, User, Project, Skill, Testimonial
+    from services.portfolio_loader import load_portfolio
+
+# Rendered into cached pages in place of the visitor's CSRF token, swapped back per request
+CSRF_PLACEHOLDER = '__page_cache_csrf_token__'
+
+class PageCache:
+    """LRU + TTL cache of rendered public portfolio pages.
+
+    Entries are keyed on (portfolio id, updated_at, view_count, URL) and only used for
+    anonymous visitors with no pending flash messages, so the navbar and flashes never
+    leak between visitors. Commits that touch a portfolio, its projects, skills,
+    testimonials or owner evict that portfolio's pages in this process. Those commits also
+    bump updated_at (see services/conditional.py), so other workers miss on the new key.
+    The view counter's UPDATE bumps neither, so the count it writes is part of the key:
+    a page never shows an older count than the database has. A TTL of 0 turns the cache off.
+    """
+
+    def __init__(self, app=None):
+        self.max_entries = 256
+        self.ttl = 60
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('PAGE_CACHE_SIZE', 256)
+        self.ttl = app.config.get('PAGE_CACHE_TTL', 60)
+        app.extensions['page_cache'] = self
+
+    @property
+    def enabled(self):
+        return bool(self.ttl and self.max_entries)
+
+    def render_portfolio(self, portfolio, template, **context):
+        """Render template with a snapshot of portfolio, from the cache when this request
+        allows it; the snapshot is only loaded on a miss"""
+        if not self.enabled or current_user.is_authenticated or '_flashes' in session:
+            return render_template(template, portfolio=load_portfolio(portfolio.id), **context)
+
+        key = (portfolio.id, portfolio.updated_at, portfolio.view_count, request.url)
+        html = self.get(key)
+        if html is None:
+            html = render_template(template, portfolio=load_portfolio(portfolio.id),
+                                   csrf_token=lambda: CSRF_PLACEHOLDER, **context)
+            self.set(key, html, portfolio.user_id)
+        return html.replace(CSRF_PLACEHOLDER, generate_csrf())
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, html, user_id):
+        with self._lock:
+            self._entries[key] = (html, time.monotonic() + self.ttl, user_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, portfolio_ids=(), user_ids=()):
+        """Drop every cached page of the given portfolios and owners"""
+        if not (portfolio_ids or user_ids):
+            return
+        with self._lock:
+            stale = [key for key, (_, _, user_id) in self._entries.items()
+                     if key[0] in portfolio_ids or user_id in user_ids]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+page_cache = PageCache()
+
+def _pending(session):
+    return session.info.setdefault('page_cache_stale', (set(), set()))
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_stale_pages(session, flush_context):
+    """Note which portfolios a flush touched; they are evicted once the commit lands"""
+    portfolio_ids, user_ids = _pending(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Portfolio):
+            portfolio_ids.add(obj.id)
+        elif isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, (Project, Skill, Testimonial)):
+            portfolio_ids.add(obj.portfolio_id)
+
+@event.listens_for(db.session, 'after_commit')
+def _evict_stale_pages(session):
+    portfolio_ids, user_ids = session.info.pop('page_cache_stale', (set(), set()))
+    page_cache.invalidate(portfolio_ids, user_ids)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _forget_stale_pages(session, previous_transaction):
+    session.info.pop('page_cache_stale', None)
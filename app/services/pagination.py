@@ -0,0 +1,71 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from operator import attrgetter
+from sqlalchemy import and_, or_
+
+class SortKey(namedtuple('SortKey', ['column', 'descending', 'value'])):
+    """A column in a keyset ordering; value reads the key back off a result row"""
+    def __new__(cls, column, descending=False, value=None):
+        return super().__new__(cls, column, descending, value or attrgetter(column.key))
+
+def encode_cursor(values, direction='next'):
+    """Pack key values into an opaque, URL-safe cursor token"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps({'k': payload, 'd': direction}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token, keys):
+    """Unpack a cursor token, raising ValueError if it is malformed"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        values, direction = data['k'], data['d']
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError('Invalid cursor') from e
+    if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError('Invalid cursor')
+
+    decoded = []
+    for key, value in zip(keys, values):
+        if value is not None and getattr(key.column.type, 'python_type', None) is datetime:
+            value = datetime.fromisoformat(value)
+        decoded.append(value)
+    return decoded, direction
+
+def _after(keys, values, reverse=False):
+    """Rows strictly after values in the keyset order (or before, when reverse)"""
+    clauses = []
+    for i, key in enumerate(keys):
+        descending = key.descending != reverse
+        column, value = key.column, values[i]
+        step = column < value if descending else column > value
+        clauses.append(and_(*[k.column == v for k, v in zip(keys[:i], values[:i])], step))
+    return or_(*clauses)
+
+class KeysetPagination:
+    """Cursor-based page of results; mirrors the bits of Flask-SQLAlchemy's Pagination templates use"""
+
+    def __init__(self, query, keys, cursor=None, per_page=20, with_total=False):
+        self.per_page = per_page
+        self.total = query.order_by(None).count() if with_total else None
+
+        direction = 'next'
+        if cursor:
+            values, direction = decode_cursor(cursor, keys)
+            query = query.filter(_after(keys, values, reverse=direction == 'prev'))
+
+        reverse = direction == 'prev'
+        order = [k.column.asc() if k.descending == reverse else k.column.desc() for k in keys]
+        rows = query.order_by(*order).limit(per_page + 1).all()
+
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if reverse:
+            rows.reverse()
+        self.items = rows
+
+        self.has_next = more if not reverse else True
+        self.has_prev = bool(cursor) if not reverse else more
+        self.next_cursor = encode_cursor([k.value(rows[-1]) for k in keys]) if rows and self.has_next else None
+        self.prev_cursor = encode_cursor([k.value(rows[0]) for k in keys], 'prev') if rows and self.has_prev else None
@@ -0,0 +1,40 @@
+from collections import namedtuple
+from sqlalchemy.orm import joinedload, selectinload
+try:
+    from app.models import Portfolio, Project, Skill, Testimonial
+except ImportError:
+    from models import Portfolio, Project, Skill, Testimonial
+
+def _columns(model):
+    return model.__table__.columns.keys()
+
+OwnerSnapshot = namedtuple('OwnerSnapshot', ['id', 'username', 'first_name', 'last_name'])
+ProjectSnapshot = namedtuple('ProjectSnapshot', _columns(Project))
+SkillSnapshot = namedtuple('SkillSnapshot', _columns(Skill))
+TestimonialSnapshot = namedtuple('TestimonialSnapshot', _columns(Testimonial))
+PortfolioSnapshot = namedtuple('PortfolioSnapshot', _columns(Portfolio) + ['user', 'projects', 'skills', 'testimonials'])
+
+def _copy(snapshot_type, obj):
+    return snapshot_type(**{name: getattr(obj, name) for name in snapshot_type._fields})
+
+def snapshot(portfolio):
+    """Freeze a loaded portfolio and its children into plain tuples (children in display order)"""
+    return PortfolioSnapshot(
+        **{name: getattr(portfolio, name) for name in _columns(Portfolio)},
+        user=_copy(OwnerSnapshot, portfolio.user),
+        projects=tuple(_copy(ProjectSnapshot, project) for project in portfolio.ordered_projects),
+        skills=tuple(_copy(SkillSnapshot, skill) for skill in portfolio.ordered_skills),
+        testimonials=tuple(_copy(TestimonialSnapshot, t) for t in portfolio.ordered_testimonials)
+    )
+
+def load_portfolio(portfolio_id):
+    """Load a portfolio with its owner and ordered children in four queries, whatever
+    their size: the portfolio joined to its owner, then one SELECT ... IN per child table.
+    Returns a PortfolioSnapshot, or None if there is no such portfolio."""
+    portfolio = Portfolio.query.options(
+        joinedload(Portfolio.user),
+        selectinload(Portfolio.ordered_projects),
+        selectinload(Portfolio.ordered_skills),
+        selectinload(Portfolio.ordered_testimonials)
+    ).populate_existing().filter(Portfolio.id == portfolio_id).first()
+    return snapshot(portfolio) if portfolio is not None else None
@@ -0,0 +1,67 @@
+import functools
+from urllib.parse import quote
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.sql import Select
+
+def read_only(view):
+    """Mark a view as read-only: on GET and HEAD its SELECTs go to the read engine"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+class RoutingSession(Session):
+    """db.session class that sends the SELECTs of read_only views to the read engine.
+
+    Everything else uses the primary as before: writes, flushes (and the flush hooks'
+    own statements), raw SQL, background threads, and any request when no read engine
+    is configured.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and isinstance(clause, Select) and not self._flushing \
+                and has_request_context() and g.get('read_only'):
+            routing = current_app.extensions.get('read_routing')
+            if routing is not None and routing.engine is not None:
+                return routing.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def sqlite_read_only_url(url):
+    """The same SQLite file opened with mode=ro, so the read pool can never write"""
+    return URL.create('sqlite', database=f'file:{quote(url.database)}', query={'mode': 'ro', 'uri': 'true'})
+
+class ReadRouting:
+    """Read-only engine, with its own pool, for public GET traffic.
+
+    DATABASE_READ_URL names a replica. Without one, a SQLite primary file is opened a
+    second time read-only (SQLITE_READ_ONLY_ENGINE), which with WAL lets page views read
+    without waiting on editor writes for a pool connection or a lock. Anything else
+    leaves every query on the primary. Must run after db.init_app().
+    """
+
+    def __init__(self, app=None):
+        self.engine = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.engine = None
+        app.extensions['read_routing'] = self
+        with app.app_context():
+            primary = app.extensions['sqlalchemy'].engine
+        url = app.config.get('DATABASE_READ_URL')
+        if url:
+            url = make_url(url)
+        elif primary.url.get_backend_name() == 'sqlite' and app.config.get('SQLITE_READ_ONLY_ENGINE') \
+                and primary.url.database not in (None, '', ':memory:'):
+            url = sqlite_read_only_url(primary.url)
+        else:
+            return
+        self.engine = create_engine(url, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+
+read_routing = ReadRouting()
@@ -0,0 +1,44 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+try:
+    from app.models import db
+except ImportError:
+    from models import db
+
+def upgrade_schema():
+    """Add the columns and indexes the models declare but an existing database lacks.
+
+    db.create_all() only creates missing tables, so a database it built before a model
+    gained a column keeps the old table and every query naming the column fails. New
+    columns must be nullable or have a server default; anything else needs a migration.
+    Databases managed with 'flask db upgrade' are left to Alembic. Returns what was added.
+    """
+    connection = db.session.connection()
+    inspector = inspect(connection)
+    if inspector.has_table('alembic_version'):
+        return []
+
+    preparer = connection.dialect.identifier_preparer
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f'{table.name}.{column.name} is NOT NULL without a server default; '
+                                   f"add it with 'flask db upgrade'")
+            ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}'))
+            added.append(f'{table.name}.{column.name}')
+
+        indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(connection)
+                added.append(index.name)
+
+    db.session.commit()
+    return added
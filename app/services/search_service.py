@@ -0,0 +1,201 @@
+import re
+import weakref
+from flask import current_app
+from sqlalchemy import event, text, inspect, bindparam, Integer, Float, column
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+try:
+    from app.models import db, Portfolio, User, Skill
+except ImportError:
+    from models import db, Portfolio, User, Skill
+
+SEARCH_TABLE = 'portfolio_search'
+
+# Columns matched by the free-text search box (skills and location have their own filters)
+TEXT_COLUMNS = ('title', 'bio', 'first_name', 'last_name')
+
+CREATE_SEARCH_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    title, bio, first_name, last_name, skills, location,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+INDEX_PORTFOLIOS = f"""
+INSERT INTO {SEARCH_TABLE} (rowid, title, bio, first_name, last_name, skills, location)
+SELECT p.id, p.title, coalesce(p.bio, ''), u.first_name, u.last_name,
+       coalesce((SELECT group_concat(s.name, ' ') FROM skill s WHERE s.portfolio_id = p.id), ''),
+       coalesce(p.location, '')
+FROM portfolio p JOIN "user" u ON u.id = p.user_id
+"""
+
+# Portfolio/User/Skill attributes that feed the index; anything else (e.g. view_count) is ignored
+_INDEXED_ATTRS = {
+    Portfolio: ('title', 'bio', 'location', 'user_id'),
+    User: ('first_name', 'last_name'),
+    Skill: ('name', 'portfolio_id'),
+}
+
+_index_ready = weakref.WeakKeyDictionary()
+
+def index_available(connection):
+    """Check (once per engine) whether the FTS5 search table exists"""
+    engine = connection.engine
+    if engine not in _index_ready:
+        ready = False
+        if connection.dialect.name == 'sqlite':
+            ready = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': SEARCH_TABLE}
+            ).first() is not None
+        _index_ready[engine] = ready
+    return _index_ready[engine]
+
+@event.listens_for(Portfolio.__table__, 'after_create')
+def _create_search_table(target, connection, **kw):
+    """Create the search table alongside the portfolio table on db.create_all()"""
+    if connection.dialect.name != 'sqlite':
+        return
+    try:
+        connection.execute(text(CREATE_SEARCH_TABLE))
+    except OperationalError as e:
+        current_app.logger.warning(f'Full-text search disabled, could not create index: {e}')
+    _index_ready.pop(connection.engine, None)
+
+@event.listens_for(Portfolio.__table__, 'before_drop')
+def _drop_search_table(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f'DROP TABLE IF EXISTS {SEARCH_TABLE}'))
+    _index_ready.pop(connection.engine, None)
+
+def _changed(obj):
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in _INDEXED_ATTRS[type(obj)])
+
+def _reindex(connection, where, ids):
+    ids_param = bindparam('ids', expanding=True)
+    connection.execute(
+        text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT p.id FROM portfolio p WHERE {where})').bindparams(ids_param),
+        {'ids': list(ids)}
+    )
+    connection.execute(text(f'{INDEX_PORTFOLIOS} WHERE {where}').bindparams(ids_param), {'ids': list(ids)})
+
+@event.listens_for(db.session, 'after_flush')
+def _sync_search_index(session, flush_context):
+    """Keep the search index in step with portfolio, user and skill writes in the same transaction"""
+    portfolio_ids, user_ids = set(), set()
+    removed = False
+
+    for obj in session.new:
+        if isinstance(obj, Portfolio):
+            portfolio_ids.add(obj.id)
+        elif isinstance(obj, Skill):
+            portfolio_ids.add(obj.portfolio_id)
+    for obj in session.dirty:
+        if type(obj) not in _INDEXED_ATTRS or not _changed(obj):
+            continue
+        if isinstance(obj, Portfolio):
+            portfolio_ids.add(obj.id)
+        elif isinstance(obj, User):
+            user_ids.add(obj.id)
+        else:
+            portfolio_ids.add(obj.portfolio_id)
+            portfolio_ids.update(inspect(obj).attrs.portfolio_id.history.deleted or ())
+    for obj in session.deleted:
+        if isinstance(obj, (Portfolio, User)):
+            removed = True
+        elif isinstance(obj, Skill):
+            portfolio_ids.add(obj.portfolio_id)
+
+    portfolio_ids.discard(None)
+    if not (portfolio_ids or user_ids or removed):
+        return
+
+    connection = session.connection()
+    if not index_available(connection):
+        return
+
+    if portfolio_ids:
+        _reindex(connection, 'p.id IN :ids', portfolio_ids)
+    if user_ids:
+        _reindex(connection, 'p.user_id IN :ids', user_ids)
+    if removed:
+        connection.execute(text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid NOT IN (SELECT id FROM portfolio)'))
+
+def rebuild_index():
+    """Drop and repopulate the search index from the portfolio tables"""
+    connection = db.session.connection()
+    connection.execute(text(f'DROP TABLE IF EXISTS {SEARCH_TABLE}'))
+    connection.execute(text(CREATE_SEARCH_TABLE))
+    connection.execute(text(INDEX_PORTFOLIOS))
+    db.session.commit()
+    _index_ready.pop(db.engine, None)
+    return db.session.execute(text(f'SELECT count(*) FROM {SEARCH_TABLE}')).scalar()
+
+def build_match(term, columns=TEXT_COLUMNS):
+    """Turn user input into an FTS5 prefix query, e.g. 'web dev' -> {title bio}: ("web"* "dev"*)"""
+    tokens = re.findall(r'\w+', term or '')
+    if not tokens:
+        return None
+    phrases = ' '.join(f'"{token}"*' for token in tokens)
+    return f"{{{' '.join(columns)}}} : ({phrases})"
+
+def _hits(match):
+    """Subquery of (portfolio_id, rank) for an FTS5 match expression"""
+    return text(
+        f'SELECT rowid AS portfolio_id, rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match'
+    ).bindparams(bindparam('match', match, unique=True)).columns(
+        column('portfolio_id', Integer), column('rank', Float)
+    ).subquery('search_hits')
+
+def _ilike_conditions(term, columns):
+    """Fallback for databases without the FTS5 index"""
+    pattern = f'%{term}%'
+    conditions = []
+    if 'title' in columns:
+        conditions.append(Portfolio.title.ilike(pattern))
+    if 'bio' in columns:
+        conditions.append(Portfolio.bio.ilike(pattern))
+    if 'location' in columns:
+        conditions.append(Portfolio.location.ilike(pattern))
+    if 'first_name' in columns or 'last_name' in columns:
+        conditions.append(Portfolio.user.has(db.or_(User.first_name.ilike(pattern), User.last_name.ilike(pattern))))
+    if 'skills' in columns:
+        conditions.append(Portfolio.skills.any(Skill.name.ilike(pattern)))
+    return db.or_(*conditions)
+
+def filter_portfolios(query, term, columns=TEXT_COLUMNS, id_column=Portfolio.id):
+    """Restrict a query to portfolios matching term, leaving its ordering alone.
+
+    id_column is the portfolio id in the queried table, so read models keyed on
+    portfolio id (e.g. PortfolioCard) can be filtered the same way.
+    """
+    if not index_available(db.session.connection()):
+        return query.filter(id_column.in_(db.select(Portfolio.id).where(_ilike_conditions(term, columns))))
+
+    match = build_match(term, columns)
+    if match is None:
+        return query
+    hits = _hits(match)
+    return query.filter(id_column.in_(db.select(hits.c.portfolio_id)))
+
+def search_portfolios(term, limit=None, columns=TEXT_COLUMNS):
+    """Public, approved portfolios matching term, best match first"""
+    query = Portfolio.query.options(joinedload(Portfolio.user)).filter(
+        Portfolio.is_public == True,
+        Portfolio.is_approved == True
+    )
+
+    if index_available(db.session.connection()):
+        match = build_match(term, columns)
+        if match is None:
+            return []
+        hits = _hits(match)
+        query = query.join(hits, hits.c.portfolio_id == Portfolio.id).order_by(hits.c.rank)
+    else:
+        query = query.filter(_ilike_conditions(term, columns))
+
+    if limit:
+        query = query.limit(limit)
+    return query.all()
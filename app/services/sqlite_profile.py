@@ -0,0 +1,94 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+MB = 1024 * 1024
+
+# Pragmas run on every new SQLite connection, by SQLITE_PROFILE
+PROFILES = {
+    # SQLite's own defaults: rollback journal, fsync on every commit, fail at once when locked
+    'default': {},
+    'development': {
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,
+    },
+    'production': {
+        # Readers work from a snapshot while one writer appends to the WAL, so page views
+        # no longer wait on editor saves or the background writers, nor they on them
+        'journal_mode': 'WAL',
+        # With WAL a commit survives an app crash; only power loss can undo the last few
+        'synchronous': 'NORMAL',
+        # Wait up to 5s for the write lock instead of raising "database is locked"
+        'busy_timeout': 5000,
+        'mmap_size': 256 * MB,
+        # Negative means KiB: 64MB of page cache per connection
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Pool sizes by profile. A gunicorn worker needs a connection per request thread plus one
+# each for the view counter, analytics queue, mail pool and image variant workers.
+POOL_OPTIONS = {
+    'production': {'pool_size': 10, 'max_overflow': 10, 'pool_timeout': 10},
+}
+
+def _is_sqlite_file(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+class SQLiteProfile:
+    """Connection tuning for SQLite databases, chosen with SQLITE_PROFILE.
+
+    init_app() must run before db.init_app(), so the profile's pool options reach the
+    engine; attach(engine) then installs a connect hook that runs the profile's pragmas
+    (plus any SQLITE_PRAGMAS overrides) on each new connection. Other databases are
+    left alone.
+    """
+
+    def __init__(self, app=None):
+        self.name = 'default'
+        self.pragmas = {}
+        self.engines = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.name = app.config.get('SQLITE_PROFILE') or 'default'
+        if self.name not in PROFILES:
+            raise ValueError(f'Unknown SQLITE_PROFILE {self.name!r}; choose from {", ".join(PROFILES)}')
+        self.pragmas = dict(PROFILES[self.name], **app.config.get('SQLITE_PRAGMAS', {}))
+        self.engines = {}
+        app.extensions['sqlite_profile'] = self
+
+        # In-memory databases keep Flask-SQLAlchemy's single shared connection
+        if not _is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+            return
+        options = dict(POOL_OPTIONS.get(self.name, {}))
+        options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    def attach(self, engine, name='primary', read_only=False):
+        self.engines[name] = engine
+        if engine.dialect.name != 'sqlite' or not self.pragmas:
+            return
+        # The journal mode is a property of the file, set through the primary; a read-only
+        # connection can't change it
+        pragmas = [(pragma, value) for pragma, value in self.pragmas.items()
+                   if not (read_only and pragma == 'journal_mode')]
+
+        @event.listens_for(engine, 'connect')
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas:
+                    cursor.execute(f'PRAGMA {name} = {value}')
+            finally:
+                cursor.close()
+
+    def stats(self):
+        return {
+            'profile': self.name,
+            'pools': {name: engine.pool.status() for name, engine in self.engines.items()},
+        }
+
+sqlite_profile = SQLiteProfile()
@@ -0,0 +1,147 @@
+import mimetypes
+import os
+from datetime import datetime, timezone
+from flask import request
+from werkzeug.http import http_date, is_resource_modified, parse_range_header, parse_if_range_header
+from werkzeug.security import safe_join
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+try:
+    from app.services.upload_store import upload_store, is_content_addressed, URL_PREFIX, TMP_DIR
+except ImportError:
+    from services.upload_store import upload_store, is_content_addressed, URL_PREFIX, TMP_DIR
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+BLOCK_SIZE = 64 * 1024
+OFFLOADS = ('x-accel-redirect', 'x-sendfile')
+
+class _FileSlice:
+    """The part of an open file a Range response sends. Servers with a sendfile
+    wsgi.file_wrapper (gunicorn) send Content-Length bytes from fileno() at tell() with
+    no copy; any other server reads it, and read() stops at the end of the range."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+class UploadServer:
+    """Serves /uploads/ as WSGI middleware, ahead of Flask.
+
+    A request for an upload never reaches the Flask app: no session, login, rate limit
+    or database work, just a stat() and the file. Content-addressed files (see
+    upload_store.py) get ``immutable`` caching and their hash as a strong ETag; the rest
+    revalidate. GET and HEAD honour If-None-Match, If-Modified-Since, Range and If-Range.
+    The body goes out through wsgi.file_wrapper, which gunicorn turns into sendfile(),
+    or with UPLOAD_OFFLOAD set, is left to the front server entirely:
+
+    * ``x-accel-redirect``: nginx serves UPLOAD_ACCEL_PREFIX + path from an
+      ``internal`` location aliased to UPLOAD_FOLDER
+    * ``x-sendfile``: Apache (mod_xsendfile) or lighttpd serves the absolute path
+    """
+
+    def __init__(self, app=None):
+        self.offload = None
+        self.accel_prefix = '/_uploads/'
+        self.wsgi_app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.offload = (app.config.get('UPLOAD_OFFLOAD') or '').lower() or None
+        if self.offload and self.offload not in OFFLOADS:
+            raise ValueError(f'UPLOAD_OFFLOAD must be one of {", ".join(OFFLOADS)}')
+        self.accel_prefix = app.config.get('UPLOAD_ACCEL_PREFIX', self.accel_prefix)
+        self.wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+        app.extensions['upload_server'] = self
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(URL_PREFIX):
+            return self.wsgi_app(environ, start_response)
+        return self.response(path[len(URL_PREFIX):], environ)(environ, start_response)
+
+    def serve(self, path):
+        """Flask view for the same files, for when the middleware is bypassed"""
+        return self.response(path, request.environ)
+
+    def response(self, path, environ):
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return Response(status=405, headers={'Allow': 'GET, HEAD'})
+        full = None
+        if path and not path.startswith('.') and '/.' not in path and not path.startswith(TMP_DIR + '/'):
+            full = safe_join(upload_store.root, path)
+        try:
+            stat = os.stat(full) if full else None
+        except OSError:
+            stat = None
+        if stat is None or not os.path.isfile(full):
+            return Response('Not Found', status=404, mimetype='text/plain')
+
+        immutable = is_content_addressed(path)
+        size = stat.st_size
+        last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+        # A content-addressed name is already a hash of the bytes
+        etag = os.path.basename(path) if immutable else f'{int(stat.st_mtime)}-{size}'
+        headers = {
+            'Cache-Control': f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable else 'no-cache',
+            'ETag': f'"{etag}"',
+            'Last-Modified': http_date(last_modified),
+            'Accept-Ranges': 'bytes',
+            'X-Content-Type-Options': 'nosniff',
+        }
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+        if not is_resource_modified(environ, etag, last_modified=last_modified):
+            return Response(status=304, headers=headers)
+
+        if self.offload == 'x-accel-redirect':
+            # nginx sends the body and handles Range itself
+            headers['X-Accel-Redirect'] = self.accel_prefix + path
+            return Response(status=200, headers=headers, mimetype=mimetype)
+        if self.offload == 'x-sendfile':
+            headers['X-Sendfile'] = full
+            return Response(status=200, headers=headers, mimetype=mimetype)
+
+        start, length, status = 0, size, 200
+        ranges = parse_range_header(environ.get('HTTP_RANGE'))
+        # If-Range: a stale validator means the client gets the whole (new) file
+        if_range = parse_if_range_header(environ.get('HTTP_IF_RANGE'))
+        current = if_range.etag == etag if if_range.etag else \
+            if_range.date == last_modified if if_range.date else True
+        if ranges is not None and current:
+            bounds = ranges.range_for_length(size)
+            if bounds is None:
+                if len(ranges.ranges) == 1:
+                    headers['Content-Range'] = f'bytes */{size}'
+                    return Response(status=416, headers=headers)
+                # Several ranges would need multipart/byteranges; send it all instead
+            else:
+                start, length, status = bounds[0], bounds[1] - bounds[0], 206
+                headers['Content-Range'] = ranges.to_content_range_header(size)
+        headers['Content-Length'] = str(length)
+
+        response = Response(status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
+        if environ['REQUEST_METHOD'] == 'GET':
+            file = open(full, 'rb')
+            body = file if status == 200 else _FileSlice(file, start, length)
+            response.response = wrap_file(environ, body, BLOCK_SIZE)
+        return response
+
+upload_server = UploadServer()
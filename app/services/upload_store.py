@@ -0,0 +1,281 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect, select, insert, update, delete, bindparam, func
+from werkzeug.utils import secure_filename
+try:
+    from app.models import db, StoredUpload, Portfolio, Project, Testimonial
+except ImportError:
+    from models import db, StoredUpload, Portfolio, Project, Testimonial
+
+URL_PREFIX = '/uploads/'
+CHUNK_SIZE = 64 * 1024
+TMP_DIR = '.tmp'
+
+# Columns that hold upload URLs; their values are what the refcounts count
+REFERENCES = {Portfolio: 'profile_image', Project: 'image_url', Testimonial: 'client_image'}
+
+_STORED_PATH = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]{1,5}$')
+# Resized copies made from a stored file: <hash>.<width>w.<ext> next to the original
+_VARIANT_PATH = re.compile(r'^([0-9a-f]{2}/[0-9a-f]{64})\.\d+w\.[a-z0-9]{1,5}$')
+_EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+upload_table = StoredUpload.__table__
+
+def stored_path(url):
+    """Path under UPLOAD_FOLDER of a content-addressed upload URL, or None for anything
+    else (files saved under their client name before the store existed, external links)"""
+    if url and url.startswith(URL_PREFIX):
+        path = url[len(URL_PREFIX):]
+        if _STORED_PATH.match(path):
+            return path
+    return None
+
+def is_content_addressed(path):
+    """Whether path names a stored file or one of its variants, whose bytes never change"""
+    return bool(_STORED_PATH.match(path) or _VARIANT_PATH.match(path))
+
+def variant_path(path, width, extension):
+    """Where the width-pixel-wide copy of a stored file is kept, as ``extension``"""
+    return f'{path.rsplit(".", 1)[0]}.{width}w.{extension}'
+
+def _extension(filename):
+    name = secure_filename(filename or '')
+    extension = name.rsplit('.', 1)[1].lower() if '.' in name else 'bin'
+    return _EXTENSION_ALIASES.get(extension, extension)[:5]
+
+def _register(path, size):
+    """Create the StoredUpload row for path, or mark it freshly stored, in the current
+    transaction; concurrent uploads of the same content don't collide"""
+    values = {'path': path, 'size': size, 'ref_count': 0, 'stored_at': datetime.utcnow()}
+    # Picked up after commit by services/image_variants.py
+    db.session.info.setdefault('stored_uploads', set()).add(path)
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(upload_table).values(**values)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['path'], set_={'stored_at': stmt.excluded.stored_at}
+        ))
+        return
+
+    result = connection.execute(
+        update(upload_table).where(upload_table.c.path == path).values(stored_at=values['stored_at'])
+    )
+    if not result.rowcount:
+        connection.execute(insert(upload_table).values(**values))
+
+class UploadStore:
+    """Content-addressed storage for user uploads under UPLOAD_FOLDER.
+
+    save() streams a file into a temp file while hashing it, then renames it into place
+    as ``<sha256[:2]>/<sha256>.<ext>``, so identical images are stored once, two users'
+    ``logo.png`` never collide and a URL always names the same bytes (and can be cached
+    forever). The ``stored_upload`` table counts how many rows reference each file; the
+    counts move with the rows in the same transaction. ``flask gc-uploads`` deletes files
+    nobody has referenced for UPLOAD_GC_GRACE_SECONDS. Files are served by
+    services/upload_server.py.
+    """
+
+    def __init__(self, app=None):
+        self.root = None
+        self.gc_grace = timedelta(days=1)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = os.path.abspath(app.config['UPLOAD_FOLDER'])
+        self.gc_grace = timedelta(seconds=app.config.get('UPLOAD_GC_GRACE_SECONDS', 86400))
+        app.extensions['upload_store'] = self
+
+    def begin(self):
+        """Start writing a file into the store; see PendingUpload"""
+        tmp_dir = os.path.join(self.root, TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        return PendingUpload(self, tmp_dir)
+
+    def save(self, file):
+        """Store a werkzeug FileStorage (or binary file object) from its current position
+        and return its URL. The file's StoredUpload row joins the current transaction;
+        its ref_count rises once a row referencing the URL is flushed."""
+        stream = getattr(file, 'stream', file)
+        if isinstance(getattr(stream, 'pending', None), PendingUpload):
+            # Already written to disk while the request was parsed (services/upload_stream.py)
+            return stream.pending.finish(stream.extension)
+
+        pending = self.begin()
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                pending.write(chunk)
+        except BaseException:
+            pending.discard()
+            raise
+        return pending.finish(_extension(getattr(file, 'filename', None)))
+
+    def collect_garbage(self, now=None):
+        """Delete unreferenced files last stored before the grace period, plus stray files
+        with no row (from uploads whose transaction rolled back); returns files removed"""
+        now = now or datetime.utcnow()
+        cutoff = now - self.gc_grace
+        unreferenced = (upload_table.c.ref_count <= 0, upload_table.c.stored_at < cutoff)
+        paths = db.session.execute(select(upload_table.c.path).where(*unreferenced)).scalars().all()
+        # The DELETE re-checks, so a file referenced or re-uploaded since the SELECT stays
+        doomed = [path for path in paths if db.session.execute(
+            delete(upload_table).where(upload_table.c.path == path, *unreferenced)
+        ).rowcount]
+        db.session.commit()
+
+        removed = 0
+        for path in doomed:
+            removed += self._unlink(os.path.join(self.root, path))
+            base = os.path.basename(path).rsplit('.', 1)[0] + '.'
+            directory = os.path.join(self.root, os.path.dirname(path))
+            for filename in os.listdir(directory) if os.path.isdir(directory) else ():
+                if filename.startswith(base):
+                    removed += self._unlink(os.path.join(directory, filename))
+
+        known = set(db.session.execute(select(upload_table.c.path)).scalars())
+        known_bases = {path.rsplit('.', 1)[0] for path in known}
+        oldest = time.time() - self.gc_grace.total_seconds()
+        for directory, _, files in os.walk(self.root):
+            relative = os.path.relpath(directory, self.root)
+            for filename in files:
+                path = filename if relative == '.' else f'{relative}/{filename}'
+                variant = _VARIANT_PATH.match(path)
+                stray = relative == TMP_DIR or (_STORED_PATH.match(path) and path not in known) \
+                    or (variant and variant.group(1) not in known_bases)
+                full = os.path.join(directory, filename)
+                if stray and os.path.getmtime(full) < oldest:
+                    removed += self._unlink(full)
+        return removed
+
+    def rebuild_refcounts(self):
+        """Recount references from the tables that hold upload URLs; returns files counted"""
+        counts = Counter()
+        for model, attr in REFERENCES.items():
+            column = getattr(model, attr)
+            for url, references in db.session.execute(
+                select(column, func.count()).where(column.like(URL_PREFIX + '%')).group_by(column)
+            ):
+                path = stored_path(url)
+                if path:
+                    counts[path] += references
+
+        known = set(db.session.execute(select(upload_table.c.path)).scalars())
+        for path in counts.keys() - known:
+            full = os.path.join(self.root, path)
+            if os.path.exists(full):
+                _register(path, os.path.getsize(full))
+        db.session.execute(update(upload_table).values(ref_count=0))
+        if counts:
+            db.session.execute(
+                update(upload_table)
+                .where(upload_table.c.path == bindparam('stored'))
+                .values(ref_count=bindparam('references')),
+                [{'stored': path, 'references': n} for path, n in counts.items()]
+            )
+        db.session.commit()
+        return len(counts)
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return 0
+        return 1
+
+class PendingUpload:
+    """A file being written into the store: bytes go to a temp file and are hashed as
+    they arrive, and finish() renames it to its content address. discard() (or a
+    finish() that never comes, until gc-uploads sweeps the temp dir) leaves no trace."""
+
+    def __init__(self, store, tmp_dir):
+        self.store = store
+        self.size = 0
+        self._digest = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        self._out = os.fdopen(fd, 'wb')
+
+    @property
+    def done(self):
+        return self._tmp_path is None
+
+    def write(self, chunk):
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        self._out.write(chunk)
+
+    def finish(self, extension):
+        """Move the file into place as <hash>.<extension> and return its URL"""
+        try:
+            self._out.flush()
+            os.fsync(self._out.fileno())
+            self._out.close()
+            name = self._digest.hexdigest()
+            path = f'{name[:2]}/{name}.{extension}'
+            target = os.path.join(self.store.root, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Atomic on the same filesystem: readers see no file or the whole file, never
+            # a partial one. Replacing an existing copy is harmless, the bytes are equal.
+            os.replace(self._tmp_path, target)
+        except BaseException:
+            self.discard()
+            raise
+        self._tmp_path = None
+        _register(path, self.size)
+        return URL_PREFIX + path
+
+    def discard(self):
+        if self.done:
+            return
+        self._out.close()
+        self.store._unlink(self._tmp_path)
+        self._tmp_path = None
+
+upload_store = UploadStore()
+
+def _reference_deltas(session):
+    deltas = Counter()
+    for obj in session.new:
+        attr = REFERENCES.get(type(obj))
+        if attr:
+            deltas[stored_path(getattr(obj, attr))] += 1
+    for obj in session.dirty:
+        attr = REFERENCES.get(type(obj))
+        if attr:
+            history = inspect(obj).attrs[attr].history
+            for url in history.added:
+                deltas[stored_path(url)] += 1
+            for url in history.deleted:
+                deltas[stored_path(url)] -= 1
+    for obj in session.deleted:
+        attr = REFERENCES.get(type(obj))
+        if attr:
+            history = inspect(obj).attrs[attr].history
+            for url in history.unchanged or history.deleted:
+                deltas[stored_path(url)] -= 1
+    deltas.pop(None, None)
+    return {path: delta for path, delta in deltas.items() if delta}
+
+@event.listens_for(db.session, 'after_flush')
+def _count_references(session, flush_context):
+    """Keep stored_upload.ref_count in step with the rows that reference each file"""
+    deltas = _reference_deltas(session)
+    if deltas:
+        session.connection().execute(
+            update(upload_table)
+            .where(upload_table.c.path == bindparam('stored'))
+            .values(ref_count=upload_table.c.ref_count + bindparam('delta')),
+            [{'stored': path, 'delta': delta} for path, delta in deltas.items()]
+        )
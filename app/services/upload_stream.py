@@ -0,0 +1,179 @@
+from flask import current_app
+from flask.wrappers import Request
+from werkzeug.datastructures import FileStorage
+from werkzeug.formparser import FormDataParser, MultiPartParser
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData, State
+try:
+    from app.services.upload_store import upload_store
+except ImportError:
+    from services.upload_store import upload_store
+
+# Enough of a file to tell the image formats below apart
+SNIFF_BYTES = 12
+
+def sniff_image(head):
+    """Extension of the image format head (a file's first bytes) starts with, or None"""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+class UploadRejected(Exception):
+    pass
+
+class UploadSink:
+    """Receives one uploaded file while the request body is parsed.
+
+    The first SNIFF_BYTES are held back and checked against the image signatures; once
+    they pass, everything goes straight into the upload store (hashed on the way), so
+    save() afterwards is just a rename. Going over the field's cap or failing the
+    sniff raises UploadRejected at that chunk.
+    """
+
+    def __init__(self, limit, allowed):
+        self.limit = limit
+        self.allowed = allowed
+        self.extension = None
+        self.pending = None
+        self.size = 0
+        self._head = b''
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            self._too_large()
+        if self.pending is not None:
+            self.pending.write(data)
+            return
+        self._head += data
+        if len(self._head) >= SNIFF_BYTES:
+            self._start()
+
+    def held(self, head, length):
+        """Check length bytes of this file that the decoder has received but not handed
+        over yet (head is the first of them). Werkzeug 2.3 keeps everything after the last
+        line break until another line break or the boundary arrives, which for binary
+        data can be the rest of the file, so the cap and the sniff must see them too."""
+        if self.size + length > self.limit:
+            self._too_large()
+        if self.pending is None and len(self._head) + length >= SNIFF_BYTES:
+            if sniff_image((self._head + head)[:SNIFF_BYTES]) not in self.allowed:
+                raise UploadRejected('Only image files are allowed')
+
+    def _too_large(self):
+        raise UploadRejected(f'File size must be less than {self.limit // (1024 * 1024)}MB')
+
+    def finish(self):
+        # Files shorter than SNIFF_BYTES; an empty part is a file input left blank
+        if self.size and self.pending is None:
+            self._start()
+
+    def _start(self):
+        self.extension = sniff_image(self._head)
+        if self.extension not in self.allowed:
+            raise UploadRejected('Only image files are allowed')
+        self.pending = upload_store.begin()
+        self.pending.write(self._head)
+        self._head = b''
+
+    def close(self):
+        # Request teardown closes every file; ones the view never saved are dropped
+        if self.pending is not None:
+            self.pending.discard()
+
+class RejectedUpload(FileStorage):
+    """Stands in for a file that failed its checks, carrying the reason in ``error``"""
+
+    def __init__(self, filename, name, error):
+        super().__init__(filename=filename, name=name)
+        self.error = error
+
+class UploadParser(MultiPartParser):
+    """multipart/form-data parser that streams files through UploadSink.
+
+    When a file is rejected, parsing stops right there: the rest of the body is never
+    read, so a 15MB upload over a 2MB cap costs about 2MB of reading and no disk beyond
+    it, and a renamed .exe costs one chunk. Bytes the decoder is still holding back
+    count against the cap and the sniff too, so a file that never breaks a line can't
+    pile up in memory past its cap; MAX_CONTENT_LENGTH still bounds the whole body.
+    The form then holds the fields sent before the file plus a RejectedUpload in its
+    place; put file inputs after the fields a view needs to report the error (the CSRF
+    token is always first).
+    """
+
+    def __init__(self, limits, default_limit, allowed, **kwargs):
+        super().__init__(**kwargs)
+        self.limits = limits
+        self.default_limit = default_limit
+        self.allowed = allowed
+
+    def parse(self, stream, boundary, content_length):
+        decoder = MultipartDecoder(boundary, max_form_memory_size=self.max_form_memory_size,
+                                   max_parts=self.max_form_parts)
+        # The end of the buffer may be the start of "\r\n--boundary"; what comes before it is data
+        boundary_length = len(boundary) + 4
+        fields, files = [], []
+        part = container = None
+        try:
+            while True:
+                data = stream.read(self.buffer_size)
+                decoder.receive_data(data or None)
+                event = decoder.next_event()
+                while not isinstance(event, (Epilogue, NeedData)):
+                    if isinstance(event, Field):
+                        part, container = event, []
+                    elif isinstance(event, File):
+                        part = event
+                        container = UploadSink(self.limits.get(event.name, self.default_limit), self.allowed)
+                    elif isinstance(event, Data):
+                        if isinstance(part, Field):
+                            container.append(event.data)
+                            if not event.more_data:
+                                fields.append((part.name, b''.join(container).decode(
+                                    self.get_part_charset(part.headers), 'replace')))
+                        else:
+                            container.write(event.data)
+                            if not event.more_data:
+                                container.finish()
+                                files.append((part.name, FileStorage(container, part.filename, part.name,
+                                                                     headers=part.headers)))
+                                container = None
+                    event = decoder.next_event()
+                if isinstance(container, UploadSink) and decoder.state == State.DATA:
+                    held = len(decoder.buffer) - boundary_length
+                    if held > 0:
+                        container.held(bytes(decoder.buffer[:min(held, SNIFF_BYTES)]), held)
+                if not data or isinstance(event, Epilogue):
+                    break
+        except UploadRejected as e:
+            container.close()
+            files.append((part.name, RejectedUpload(part.filename, part.name, str(e))))
+        return self.cls(fields), self.cls(files)
+
+class UploadFormDataParser(FormDataParser):
+    def _parse_multipart(self, stream, mimetype, content_length, options):
+        boundary = options.get('boundary', '').encode('ascii')
+        if not boundary:
+            raise ValueError('Missing boundary')
+        config = current_app.config
+        megabyte = 1024 * 1024
+        parser = UploadParser(
+            limits={name: mb * megabyte for name, mb in config.get('UPLOAD_FIELD_LIMITS_MB', {}).items()},
+            default_limit=config.get('MAX_FILE_SIZE_MB', 2) * megabyte,
+            allowed={'jpg' if ext == 'jpeg' else ext for ext in config['ALLOWED_EXTENSIONS']},
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.cls,
+        )
+        form, files = parser.parse(stream, boundary, content_length)
+        return stream, form, files
+
+class UploadRequest(Request):
+    """Flask request whose multipart bodies are parsed by UploadParser, so size caps
+    and content checks apply before anything (CSRF included) reads request.form"""
+    form_data_parser_class = UploadFormDataParser
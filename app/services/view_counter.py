@@ -0,0 +1,145 @@
+import atexit
+import os
+import threading
+import time
+from sqlalchemy import text
+try:
+    from app.models import db
+except ImportError:
+    from models import db
+
+INCREMENT_PORTFOLIO = text(
+    'UPDATE portfolio SET view_count = coalesce(view_count, 0) + :views WHERE id = :portfolio_id'
+)
+INCREMENT_CARD = text(
+    'UPDATE portfolio_card SET view_count = coalesce(view_count, 0) + :views WHERE portfolio_id = :portfolio_id'
+)
+
+class ViewCounter:
+    """Write-behind buffer for Portfolio.view_count.
+
+    Requests only bump an in-process counter; a background thread folds the buffered
+    increments into one atomic ``view_count = view_count + n`` UPDATE per portfolio every
+    VIEW_COUNT_FLUSH_INTERVAL seconds, or sooner once VIEW_COUNT_FLUSH_THRESHOLD views are
+    waiting. Whatever is left is flushed when the worker exits. An interval of 0 writes
+    through on every view.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 5
+        self.threshold = 100
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = {}
+        self._pending_total = 0
+        self._oldest_pending = None
+        self._thread = None
+        self._pid = None
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flushed_views = 0
+        self.last_flush_at = None
+        self.last_flush_seconds = 0.0
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('VIEW_COUNT_FLUSH_INTERVAL', 5)
+        self.threshold = app.config.get('VIEW_COUNT_FLUSH_THRESHOLD', 100)
+        app.extensions['view_counter'] = self
+        # Once per process, however many apps the factory builds (tests, CLI)
+        if not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+
+    def record(self, portfolio_id, views=1):
+        """Count a view; returns immediately unless running write-through"""
+        with self._lock:
+            self._pending[portfolio_id] = self._pending.get(portfolio_id, 0) + views
+            self._pending_total += views
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+            full = self._pending_total >= self.threshold
+
+        if not self.interval:
+            self.flush()
+            return
+        self._ensure_worker()
+        if full:
+            self._wake.set()
+
+    def pending(self, portfolio_id):
+        """Views recorded for a portfolio but not yet written"""
+        with self._lock:
+            return self._pending.get(portfolio_id, 0)
+
+    def flush(self):
+        """Write buffered increments; on failure they go back into the buffer"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            oldest, self._oldest_pending = self._oldest_pending, None
+            self._pending_total = 0
+        if not batch or self.app is None:
+            return 0
+
+        started = time.monotonic()
+        params = [{'portfolio_id': pid, 'views': views} for pid, views in sorted(batch.items())]
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(INCREMENT_PORTFOLIO, params)
+                    connection.execute(INCREMENT_CARD, params)
+        except Exception as e:
+            with self._lock:
+                for pid, views in batch.items():
+                    self._pending[pid] = self._pending.get(pid, 0) + views
+                    self._pending_total += views
+                if self._oldest_pending is None or (oldest is not None and oldest < self._oldest_pending):
+                    self._oldest_pending = oldest
+                self.failed_flushes += 1
+            self.app.logger.error(f'Error flushing view counts: {e}')
+            return 0
+
+        flushed = sum(batch.values())
+        self.flushes += 1
+        self.flushed_views += flushed
+        self.last_flush_at = time.time()
+        self.last_flush_seconds = time.monotonic() - started
+        return flushed
+
+    def stats(self):
+        """Buffer depth and flush lag, for the health check"""
+        with self._lock:
+            lag = time.monotonic() - self._oldest_pending if self._oldest_pending is not None else 0.0
+            return {
+                'pending_views': self._pending_total,
+                'pending_portfolios': len(self._pending),
+                'flush_lag_seconds': round(lag, 3),
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'flushed_views': self.flushed_views,
+                'last_flush_seconds': round(self.last_flush_seconds, 4),
+                'last_flush_at': self.last_flush_at,
+            }
+
+    def _ensure_worker(self):
+        # One flusher per process; a forked worker (gunicorn --preload) starts its own
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+view_counter = ViewCounter()
@@ -0,0 +1,89 @@
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload
+try:
+    from app.models import db, Analytics, Portfolio
+    from app.services.email_service import send_view_digest
+except ImportError:
+    from models import db, Analytics, Portfolio
+    from services.email_service import send_view_digest
+
+WINDOWS = {'hourly': timedelta(hours=1), 'daily': timedelta(days=1)}
+
+ViewDigest = namedtuple('ViewDigest', ['portfolio_id', 'views', 'visitors', 'top_locations', 'top_devices'])
+
+def last_window(window, now=None):
+    """The latest complete [start, end) window, aligned to the UTC hour or day"""
+    now = now or datetime.utcnow()
+    if window == 'hourly':
+        end = now.replace(minute=0, second=0, microsecond=0)
+    else:
+        end = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return end - WINDOWS[window], end
+
+def _in_window(start, end):
+    # Owners looking at their own portfolio don't count
+    return (
+        Analytics.event_type == 'view',
+        Analytics.timestamp >= start,
+        Analytics.timestamp < end,
+        Analytics.user_id != Portfolio.user_id
+    )
+
+def _top(column, start, end, limit):
+    """{portfolio_id: [(value, views), ...]} with each portfolio's `limit` most common values"""
+    value = func.coalesce(column, 'Unknown')
+    views = func.count(Analytics.id)
+    ranked = select(
+        Analytics.portfolio_id,
+        value.label('value'),
+        views.label('views'),
+        func.row_number().over(partition_by=Analytics.portfolio_id, order_by=(views.desc(), value)).label('rank')
+    ).join(Portfolio, Portfolio.id == Analytics.portfolio_id).where(
+        *_in_window(start, end)
+    ).group_by(Analytics.portfolio_id, value).subquery()
+
+    top = defaultdict(list)
+    for portfolio_id, name, count in db.session.execute(
+        select(ranked.c.portfolio_id, ranked.c.value, ranked.c.views)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.portfolio_id, ranked.c.rank)
+    ):
+        top[portfolio_id].append((name, count))
+    return top
+
+def collect_digests(start, end, limit=3):
+    """One ViewDigest per portfolio viewed in [start, end), aggregated in three queries"""
+    totals = db.session.execute(
+        select(Analytics.portfolio_id, func.count(Analytics.id), func.count(func.distinct(Analytics.user_id)))
+        .join(Portfolio, Portfolio.id == Analytics.portfolio_id)
+        .where(*_in_window(start, end))
+        .group_by(Analytics.portfolio_id)
+        .order_by(Analytics.portfolio_id)
+    ).all()
+    if not totals:
+        return []
+    locations = _top(Analytics.location, start, end, limit)
+    devices = _top(Analytics.device, start, end, limit)
+    return [
+        ViewDigest(portfolio_id, views, visitors, tuple(locations[portfolio_id]), tuple(devices[portfolio_id]))
+        for portfolio_id, views, visitors in totals
+    ]
+
+def send_view_digests(window, now=None, limit=3):
+    """Email each owner a summary of the last complete window; returns the number queued"""
+    start, end = last_window(window, now)
+    digests = collect_digests(start, end, limit)
+    if not digests:
+        return 0
+    portfolios = {p.id: p for p in Portfolio.query.options(joinedload(Portfolio.user)).filter(
+        Portfolio.id.in_([digest.portfolio_id for digest in digests])
+    )}
+    queued = 0
+    for digest in digests:
+        if send_view_digest(portfolios[digest.portfolio_id], digest, window, start, end):
+            queued += 1
+    # Outbox rows (MAIL_USE_OUTBOX) are only delivered once committed
+    db.session.commit()
+    return queued
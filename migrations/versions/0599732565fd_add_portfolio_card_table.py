@@ -0,0 +1,77 @@
+"""Add portfolio_card read model
+
+Revision ID: 0599732565fd
+Revises: bd9b5ffa9ff4
+Create Date: 2026-10-18 10:02:47.551930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0599732565fd'
+down_revision = 'bd9b5ffa9ff4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('portfolio_card',
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('owner_username', sa.String(length=80), nullable=True),
+    sa.Column('owner_first_name', sa.String(length=50), nullable=True),
+    sa.Column('owner_last_name', sa.String(length=50), nullable=True),
+    sa.Column('bio_excerpt', sa.String(length=200), nullable=True),
+    sa.Column('profile_image', sa.String(length=200), nullable=True),
+    sa.Column('location', sa.String(length=100), nullable=True),
+    sa.Column('top_skills', sa.String(length=500), nullable=True),
+    sa.Column('skill_count', sa.Integer(), nullable=True),
+    sa.Column('project_count', sa.Integer(), nullable=True),
+    sa.Column('testimonial_count', sa.Integer(), nullable=True),
+    sa.Column('view_count', sa.Integer(), nullable=True),
+    sa.Column('is_public', sa.Boolean(), nullable=True),
+    sa.Column('is_approved', sa.Boolean(), nullable=True),
+    sa.Column('is_featured', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolio.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('portfolio_id')
+    )
+    with op.batch_alter_table('portfolio_card', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_portfolio_card_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_portfolio_card_updated_at'), ['updated_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_portfolio_card_view_count'), ['view_count'], unique=False)
+
+    # Backfill; afterwards the table is maintained on write (see services/card_service.py)
+    op.execute("""
+        INSERT INTO portfolio_card (
+            portfolio_id, user_id, title, owner_username, owner_first_name, owner_last_name,
+            bio_excerpt, profile_image, location, top_skills,
+            skill_count, project_count, testimonial_count, view_count,
+            is_public, is_approved, is_featured, created_at, updated_at
+        )
+        SELECT p.id, p.user_id, p.title, u.username, u.first_name, u.last_name,
+               substr(coalesce(p.bio, ''), 1, 200), p.profile_image, p.location,
+               coalesce((SELECT group_concat(name, ',') FROM (
+                   SELECT s.name FROM skill s WHERE s.portfolio_id = p.id
+                   ORDER BY s.order_index, s.id LIMIT 5
+               )), ''),
+               (SELECT count(*) FROM skill s WHERE s.portfolio_id = p.id),
+               (SELECT count(*) FROM project pr WHERE pr.portfolio_id = p.id),
+               (SELECT count(*) FROM testimonial t WHERE t.portfolio_id = p.id),
+               coalesce(p.view_count, 0),
+               p.is_public, p.is_approved, p.is_featured, p.created_at, p.updated_at
+        FROM portfolio p JOIN "user" u ON u.id = p.user_id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('portfolio_card', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_portfolio_card_view_count'))
+        batch_op.drop_index(batch_op.f('ix_portfolio_card_updated_at'))
+        batch_op.drop_index(batch_op.f('ix_portfolio_card_created_at'))
+
+    op.drop_table('portfolio_card')
@@ -0,0 +1,39 @@
+"""Store order_index as a fractional rank
+
+Revision ID: 5b2d8e61f4c3
+Revises: a7e4d92b1c08
+Create Date: 2026-10-18 14:32:51.402377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2d8e61f4c3'
+down_revision = 'a7e4d92b1c08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('project', 'skill', 'testimonial'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('order_index', existing_type=sa.Integer(), type_=sa.Float(),
+                                  existing_nullable=True)
+
+
+def downgrade():
+    # Fractional ranks don't survive the cast back; renumber by position first
+    for table in ('project', 'skill', 'testimonial'):
+        op.execute(f"""
+            UPDATE {table} SET order_index = (
+                SELECT COUNT(*) FROM {table} AS prior
+                WHERE prior.portfolio_id = {table}.portfolio_id
+                  AND (prior.order_index < {table}.order_index
+                       OR (prior.order_index = {table}.order_index AND prior.id < {table}.id))
+            )
+        """)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('order_index', existing_type=sa.Float(), type_=sa.Integer(),
+                                  existing_nullable=True)
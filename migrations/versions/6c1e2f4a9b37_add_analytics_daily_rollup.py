@@ -0,0 +1,45 @@
+"""Add analytics_daily rollup
+
+Revision ID: 6c1e2f4a9b37
+Revises: 0599732565fd
+Create Date: 2026-10-18 11:40:12.308114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c1e2f4a9b37'
+down_revision = '0599732565fd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analytics_daily',
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('event_type', sa.String(length=50), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolio.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('portfolio_id', 'event_type', 'day')
+    )
+    with op.batch_alter_table('analytics_daily', schema=None) as batch_op:
+        batch_op.create_index('ix_analytics_daily_event_day', ['event_type', 'day'], unique=False)
+
+    # Backfill; afterwards the rollup is maintained on write (see services/analytics_rollup.py)
+    op.execute("""
+        INSERT INTO analytics_daily (portfolio_id, event_type, day, count)
+        SELECT portfolio_id, event_type, date(timestamp), count(id)
+        FROM analytics
+        WHERE timestamp IS NOT NULL
+        GROUP BY portfolio_id, event_type, date(timestamp)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('analytics_daily', schema=None) as batch_op:
+        batch_op.drop_index('ix_analytics_daily_event_day')
+
+    op.drop_table('analytics_daily')
@@ -0,0 +1,32 @@
+"""Index analytics and inquiry by portfolio and time
+
+Revision ID: 9d3a71c0e5f2
+Revises: 6c1e2f4a9b37
+Create Date: 2026-10-18 12:15:40.772301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3a71c0e5f2'
+down_revision = '6c1e2f4a9b37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.create_index('ix_analytics_portfolio_event_time', ['portfolio_id', 'event_type', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('inquiry', schema=None) as batch_op:
+        batch_op.create_index('ix_inquiry_portfolio_created', ['portfolio_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('inquiry', schema=None) as batch_op:
+        batch_op.drop_index('ix_inquiry_portfolio_created')
+
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.drop_index('ix_analytics_portfolio_event_time')
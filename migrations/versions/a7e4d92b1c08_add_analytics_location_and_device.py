@@ -0,0 +1,28 @@
+"""Add location and device to analytics
+
+Revision ID: a7e4d92b1c08
+Revises: 3f8b0c6d2a91
+Create Date: 2026-10-18 13:48:09.115637
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e4d92b1c08'
+down_revision = '3f8b0c6d2a91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('location', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('device', sa.String(length=50), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.drop_column('device')
+        batch_op.drop_column('location')
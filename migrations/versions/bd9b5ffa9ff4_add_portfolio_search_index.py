@@ -0,0 +1,37 @@
+"""Add full-text search index for portfolios
+
+Revision ID: bd9b5ffa9ff4
+Revises: 70fb09a2597b
+Create Date: 2026-10-18 09:12:31.204118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bd9b5ffa9ff4'
+down_revision = '70fb09a2597b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS portfolio_search USING fts5(
+            title, bio, first_name, last_name, skills, location,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    op.execute("""
+        INSERT INTO portfolio_search (rowid, title, bio, first_name, last_name, skills, location)
+        SELECT p.id, p.title, coalesce(p.bio, ''), u.first_name, u.last_name,
+               coalesce((SELECT group_concat(s.name, ' ') FROM skill s WHERE s.portfolio_id = p.id), ''),
+               coalesce(p.location, '')
+        FROM portfolio p JOIN "user" u ON u.id = p.user_id
+    """)
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS portfolio_search')
@@ -0,0 +1,35 @@
+"""Add stored upload table
+
+Revision ID: c4a19e7d3b52
+Revises: 5b2d8e61f4c3
+Create Date: 2026-10-18 15:21:37.884012
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a19e7d3b52'
+down_revision = '5b2d8e61f4c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_upload',
+    sa.Column('path', sa.String(length=100), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('stored_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('path')
+    )
+    with op.batch_alter_table('stored_upload', schema=None) as batch_op:
+        batch_op.create_index('ix_stored_upload_unreferenced', ['ref_count', 'stored_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('stored_upload', schema=None) as batch_op:
+        batch_op.drop_index('ix_stored_upload_unreferenced')
+
+    op.drop_table('stored_upload')
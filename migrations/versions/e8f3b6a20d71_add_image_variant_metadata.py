@@ -0,0 +1,30 @@
+"""Add image variant metadata to stored uploads
+
+Revision ID: e8f3b6a20d71
+Revises: c4a19e7d3b52
+Create Date: 2026-10-18 15:58:12.630945
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8f3b6a20d71'
+down_revision = 'c4a19e7d3b52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('stored_upload', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('variant_widths', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('stored_upload', schema=None) as batch_op:
+        batch_op.drop_column('variant_widths')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
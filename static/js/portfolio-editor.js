@@ -69,36 +69,72 @@ function initializeSortable() {
     }
 }
 
-// Update order after drag and drop
-function updateOrder(type, oldIndex, newIndex) {
-    const items = document.querySelectorAll(`.${type.slice(0, -1)}-item`);
-    const itemIds = Array.from(items).map(item => item.dataset.id);
+// Pending edits, sent together to /portfolio/batch once the editor goes quiet
+const EDIT_BATCH_DELAY = 400;
+let pendingEdits = [];
+let editTimer = null;
+
+function queueEdit(operation, message) {
+    pendingEdits.push({ operation: operation, message: message });
+    clearTimeout(editTimer);
+    editTimer = setTimeout(flushEdits, EDIT_BATCH_DELAY);
+}
+
+function flushEdits(keepalive = false) {
+    clearTimeout(editTimer);
+    editTimer = null;
+    if (pendingEdits.length === 0) {
+        return;
+    }
+    
+    const edits = pendingEdits;
+    pendingEdits = [];
     
-    fetch(`/portfolio/update-order`, {
+    fetch('/portfolio/batch', {
         method: 'POST',
+        keepalive: keepalive,
         headers: {
             'Content-Type': 'application/json',
             'X-CSRFToken': getCSRFToken()
         },
         body: JSON.stringify({
-            type: type,
-            item_ids: itemIds
+            operations: edits.map(edit => edit.operation)
         })
     })
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            showNotification('Order updated successfully', 'success');
+            const message = edits.length === 1 ? edits[0].message : `${edits.length} changes saved`;
+            showNotification(message, 'success');
         } else {
-            showNotification('Failed to update order', 'error');
+            // Nothing in the batch was applied; show the saved state again
+            showNotification(data.message || 'Failed to save changes', 'error');
+            setTimeout(() => location.reload(), 1500);
         }
     })
     .catch(error => {
-        console.error('Error updating order:', error);
-        showNotification('Error updating order', 'error');
+        console.error('Error saving changes:', error);
+        showNotification('Error saving changes', 'error');
     });
 }
 
+// Don't lose edits made just before leaving the page
+window.addEventListener('pagehide', () => flushEdits(true));
+
+// Update order after drag and drop (the server only re-ranks the moved item)
+function updateOrder(type, oldIndex, newIndex) {
+    if (oldIndex === newIndex) {
+        return;
+    }
+    
+    queueEdit({
+        op: 'reorder',
+        type: type,
+        old_index: oldIndex,
+        new_index: newIndex
+    }, 'Order updated successfully');
+}
+
 // Initialize form handling
 function initializeForms() {
     // Project form
@@ -310,76 +346,43 @@ function editTestimonial(testimonialId) {
 // Delete functions
 function deleteProject(projectId) {
     if (confirm('Are you sure you want to delete this project?')) {
-        fetch(`/portfolio/delete-project/${projectId}`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': getCSRFToken()
-            }
-        })
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                showNotification('Project deleted successfully', 'success');
-                location.reload();
-            } else {
-                showNotification(data.message || 'Failed to delete project', 'error');
-            }
-        })
-        .catch(error => {
-            console.error('Error deleting project:', error);
-            showNotification('Error deleting project', 'error');
-        });
+        const item = document.querySelector(`.project-item[data-id="${projectId}"]`);
+        if (item) {
+            item.remove();
+        }
+        queueEdit({
+            op: 'delete',
+            type: 'projects',
+            id: projectId
+        }, 'Project deleted successfully');
     }
 }
 
 function deleteSkill(skillId) {
     if (confirm('Are you sure you want to delete this skill?')) {
-        fetch(`/portfolio/delete-skill/${skillId}`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': getCSRFToken()
-            }
-        })
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                showNotification('Skill deleted successfully', 'success');
-                location.reload();
-            } else {
-                showNotification(data.message || 'Failed to delete skill', 'error');
-            }
-        })
-        .catch(error => {
-            console.error('Error deleting skill:', error);
-            showNotification('Error deleting skill', 'error');
-        });
+        const item = document.querySelector(`.skill-item[data-id="${skillId}"]`);
+        if (item) {
+            item.remove();
+        }
+        queueEdit({
+            op: 'delete',
+            type: 'skills',
+            id: skillId
+        }, 'Skill deleted successfully');
     }
 }
 
 function deleteTestimonial(testimonialId) {
     if (confirm('Are you sure you want to delete this testimonial?')) {
-        fetch(`/portfolio/delete-testimonial/${testimonialId}`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': getCSRFToken()
-            }
-        })
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                showNotification('Testimonial deleted successfully', 'success');
-                location.reload();
-            } else {
-                showNotification(data.message || 'Failed to delete testimonial', 'error');
-            }
-        })
-        .catch(error => {
-            console.error('Error deleting testimonial:', error);
-            showNotification('Error deleting testimonial', 'error');
-        });
+        const item = document.querySelector(`.testimonial-item[data-id="${testimonialId}"]`);
+        if (item) {
+            item.remove();
+        }
+        queueEdit({
+            op: 'delete',
+            type: 'testimonials',
+            id: testimonialId
+        }, 'Testimonial deleted successfully');
     }
 }
 
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.app import create_app
+from app.config import config, TestingConfig
+from app.models import db, User, Portfolio
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on a fresh SQLite file under tmp_path; keyword arguments override config"""
+    apps = []
+
+    def factory(**overrides):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+            'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+            'RATELIMIT_ENABLED': False,
+            'MAIL_SUPPRESS_SEND': True,
+            'MAIL_DEFAULT_SENDER': 'noreply@example.com',
+        }
+        settings.update(overrides)
+        config['pytest'] = type('PytestConfig', (TestingConfig,), settings)
+        app = create_app('pytest')
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+        routing = app.extensions.get('read_routing')
+        if routing is not None and routing.engine is not None:
+            routing.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    # No app context is pushed here: requests made with the test client would share it
+    # (and its g) with each other
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def create_user(username, public=True, approved=True, **portfolio_fields):
+    """Add a user with a portfolio and return the portfolio; needs an app context"""
+    user = User(username=username, email=f'{username}@example.com', first_name=username.title(), last_name='Test')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+    portfolio = Portfolio(user_id=user.id, title=portfolio_fields.pop('title', f'{username} portfolio'),
+                          is_public=public, is_approved=approved, **portfolio_fields)
+    db.session.add(portfolio)
+    db.session.commit()
+    return portfolio
+
+
+def login(client, username):
+    return client.post('/auth/login', data={'email': f'{username}@example.com', 'password': 'password'})
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from app.models import db, Analytics
+from app.services.analytics_queue import AnalyticsQueue
+from app.services.analytics_rollup import event_total
+from conftest import create_user
+
+
+@pytest.fixture
+def queued(make_app, monkeypatch):
+    """An async queue with room for two events and no writer thread, so nothing drains it behind the test"""
+    app = make_app(ANALYTICS_ASYNC=True, ANALYTICS_QUEUE_SIZE=2)
+    analytics_queue = AnalyticsQueue(app)
+    monkeypatch.setattr(analytics_queue, '_ensure_worker', lambda: None)
+    with app.app_context():
+        portfolio = create_user('owner')
+        ids = portfolio.id, portfolio.user_id
+    yield app, analytics_queue, ids
+    analytics_queue.drain()
+
+
+def test_full_queue_drops_and_counts_events(queued):
+    app, analytics_queue, (portfolio_id, user_id) = queued
+    results = [analytics_queue.track(portfolio_id, user_id, 'view', visitor_ip='10.0.0.1',
+                                     user_agent='Mozilla/5.0 (iPhone; CPU iPhone OS 17_0) Mobile/15E148') for _ in range(3)]
+    assert results == [True, True, False]
+    stats = analytics_queue.stats()
+    assert (stats['queued'], stats['enqueued'], stats['dropped']) == (2, 2, 1)
+
+    assert analytics_queue.drain() == 2
+    assert analytics_queue.stats()['written'] == 2
+    with app.app_context():
+        rows = Analytics.query.all()
+        assert len(rows) == 2
+        assert {(row.location, row.device) for row in rows} == {(None, 'Mobile Device')}
+        assert event_total('view', portfolio_id) == 2
+
+
+def test_enqueue_timeout_waits_before_dropping(queued):
+    app, analytics_queue, (portfolio_id, user_id) = queued
+    analytics_queue.enqueue_timeout = 0.05
+    assert analytics_queue.track(portfolio_id, user_id, 'view')
+    assert analytics_queue.track(portfolio_id, user_id, 'view')
+    started = time.monotonic()
+    assert not analytics_queue.track(portfolio_id, user_id, 'view')
+    assert time.monotonic() - started >= 0.05
+    assert analytics_queue.stats()['dropped'] == 1
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Analytics, AnalyticsDaily
+from app.services.analytics_rollup import record_events, rebuild_rollup, event_total, daily_counts, last_days
+from conftest import create_user
+
+NOW = datetime.utcnow()
+YESTERDAY = NOW - timedelta(days=1)
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def portfolio(ctx):
+    return create_user('owner')
+
+
+def event(portfolio, event_type='view', timestamp=NOW):
+    return Analytics(user_id=portfolio.user_id, portfolio_id=portfolio.id, event_type=event_type, timestamp=timestamp)
+
+
+def buckets():
+    return {(row.portfolio_id, row.event_type, row.day): row.count for row in AnalyticsDaily.query.all()}
+
+
+def test_events_in_one_flush_share_a_bucket(portfolio):
+    db.session.add_all([event(portfolio), event(portfolio), event(portfolio, 'inquiry'), event(portfolio, timestamp=YESTERDAY)])
+    db.session.commit()
+    assert buckets() == {
+        (portfolio.id, 'view', NOW.date()): 2,
+        (portfolio.id, 'inquiry', NOW.date()): 1,
+        (portfolio.id, 'view', YESTERDAY.date()): 1,
+    }
+
+
+def test_later_flushes_add_onto_existing_buckets(portfolio):
+    for _ in range(3):
+        db.session.add(event(portfolio))
+        db.session.commit()
+    assert buckets() == {(portfolio.id, 'view', NOW.date()): 3}
+    assert event_total('view', portfolio.id) == 3
+
+
+def test_core_inserts_are_recorded_from_dicts(portfolio):
+    # The analytics queue writes with Core and folds the same rows in on its connection
+    rows = [{'user_id': portfolio.user_id, 'portfolio_id': portfolio.id, 'event_type': 'view', 'timestamp': NOW}] * 4
+    connection = db.session.connection()
+    connection.execute(db.insert(Analytics), rows)
+    record_events(connection, rows)
+    db.session.commit()
+    assert event_total('view') == 4
+    assert Analytics.query.count() == 4
+
+
+def test_deleted_events_are_subtracted_and_empty_buckets_dropped(portfolio):
+    kept, dropped = event(portfolio), event(portfolio, timestamp=YESTERDAY)
+    db.session.add_all([kept, dropped])
+    db.session.commit()
+    db.session.delete(dropped)
+    db.session.commit()
+    assert buckets() == {(portfolio.id, 'view', NOW.date()): 1}
+
+
+def test_deleting_a_portfolio_drops_its_buckets(ctx):
+    kept, dropped = create_user('kept'), create_user('dropped')
+    db.session.add_all([event(kept), event(dropped)])
+    db.session.commit()
+    Analytics.query.filter_by(portfolio_id=dropped.id).delete()
+    db.session.delete(dropped)
+    db.session.commit()
+    assert buckets() == {(kept.id, 'view', NOW.date()): 1}
+
+
+def test_totals_and_daily_counts(ctx):
+    first, second = create_user('first'), create_user('second')
+    db.session.add_all([event(first), event(second), event(second, timestamp=YESTERDAY), event(first, 'inquiry')])
+    db.session.commit()
+
+    assert event_total('view') == 3
+    assert event_total('view', first.id) == 1
+    assert event_total('download') == 0
+    today, yesterday = NOW.strftime('%Y-%m-%d'), YESTERDAY.strftime('%Y-%m-%d')
+    assert daily_counts('view') == {yesterday: 1, today: 2}
+    week = last_days('view', 7, portfolio_id=second.id)
+    assert len(week) == 7 and list(week)[0] == today
+    assert week[today] == week[yesterday] == 1
+    assert sum(week.values()) == 2
+
+
+def test_rebuild_rollup_repairs_drift(portfolio):
+    db.session.add_all([event(portfolio), event(portfolio), event(portfolio, timestamp=YESTERDAY)])
+    db.session.commit()
+    expected = buckets()
+    db.session.execute(db.update(AnalyticsDaily).values(count=99))
+    db.session.commit()
+
+    assert rebuild_rollup() == 2
+    assert buckets() == expected
@@ -0,0 +1,115 @@
+import pytest
+
+from app import models
+from app.models import db, Portfolio, PortfolioCard, User, Project, Skill
+from app.services.card_service import CARD_SKILLS, rebuild_cards
+from conftest import create_user
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield app
+
+
+def card(portfolio_id):
+    db.session.expire_all()
+    return db.session.get(PortfolioCard, portfolio_id)
+
+
+def add_skills(portfolio, *names):
+    for index, name in enumerate(names):
+        db.session.add(Skill(portfolio_id=portfolio.id, name=name, level='Expert', category='Backend',
+                             order_index=index))
+    db.session.commit()
+
+
+def test_new_portfolio_gets_a_card(ctx):
+    portfolio = create_user('owner', bio='b' * 500, location='Lisbon')
+    current = card(portfolio.id)
+    assert current.title == 'owner portfolio'
+    assert current.owner_username == 'owner'
+    assert current.bio_excerpt == 'b' * 200
+    assert current.location == 'Lisbon'
+    assert current.skill_count == current.project_count == current.testimonial_count == 0
+
+
+def test_child_rows_update_counts_and_top_skills(ctx):
+    portfolio = create_user('owner')
+    names = [f'skill{i}' for i in range(CARD_SKILLS + 2)]
+    add_skills(portfolio, *names)
+    db.session.add(Project(portfolio_id=portfolio.id, title='Site'))
+    db.session.add(models.Testimonial(portfolio_id=portfolio.id, client_name='Client', testimonial_text='Great'))
+    db.session.commit()
+
+    current = card(portfolio.id)
+    assert current.skill_count == len(names)
+    assert current.top_skills == ','.join(names[:CARD_SKILLS])
+    assert (current.project_count, current.testimonial_count) == (1, 1)
+
+    Skill.query.filter_by(name='skill0').one().order_index = 99
+    db.session.delete(Project.query.one())
+    db.session.commit()
+    current = card(portfolio.id)
+    assert current.top_skills == ','.join(names[1:CARD_SKILLS + 1])
+    assert current.project_count == 0
+
+
+def test_moving_a_child_refreshes_both_cards(ctx):
+    first, second = create_user('first'), create_user('second')
+    add_skills(first, 'Python')
+    Skill.query.one().portfolio_id = second.id
+    db.session.commit()
+    assert card(first.id).skill_count == 0
+    assert card(second.id).skill_count == 1
+
+
+def test_owner_and_visibility_changes_reach_the_card(ctx):
+    portfolio = create_user('owner', public=False)
+    user = db.session.get(User, portfolio.user_id)
+    user.first_name = 'Renamed'
+    portfolio.is_public = True
+    db.session.commit()
+    current = card(portfolio.id)
+    assert current.owner_first_name == 'Renamed'
+    assert current.is_public
+
+
+def test_view_count_only_change_takes_the_cheap_path(ctx):
+    portfolio = create_user('owner', bio='original')
+    # Bypasses the hooks, so a full refresh would be visible as a changed bio
+    db.session.execute(db.update(Portfolio).where(Portfolio.id == portfolio.id).values(bio='changed'))
+    db.session.commit()
+    portfolio.view_count = 42
+    db.session.commit()
+    current = card(portfolio.id)
+    assert current.view_count == 42
+    assert current.bio_excerpt == 'original'
+
+
+def test_deleting_a_portfolio_or_its_user_drops_the_card(ctx):
+    kept, dropped, owner_dropped = create_user('kept'), create_user('dropped'), create_user('gone')
+    db.session.delete(dropped)
+    db.session.delete(db.session.get(User, owner_dropped.user_id))
+    db.session.commit()
+    assert [c.portfolio_id for c in PortfolioCard.query.all()] == [kept.id]
+
+
+def test_rebuild_cards_repairs_drift(ctx):
+    portfolio = create_user('owner')
+    add_skills(portfolio, 'Python')
+    db.session.execute(db.update(PortfolioCard).values(title='stale', skill_count=9))
+    db.session.execute(db.delete(PortfolioCard).where(PortfolioCard.portfolio_id != portfolio.id))
+    db.session.commit()
+
+    assert rebuild_cards() == 1
+    current = card(portfolio.id)
+    assert (current.title, current.skill_count, current.top_skills) == ('owner portfolio', 1, 'Python')
+
+
+def test_api_listing_returns_the_full_bio(app, client):
+    with app.app_context():
+        create_user('owner', bio='b' * 500)
+    for query in ({}, {'page': 1}):
+        [listed] = client.get('/api/portfolios', query_string=query).get_json()['portfolios']
+        assert listed['bio'] == 'b' * 500
@@ -0,0 +1,56 @@
+import pytest
+
+from app.services.view_counter import view_counter
+from conftest import create_user, login
+
+PAGE_URLS = ['/portfolio/{id}', '/api/portfolio/{id}']
+
+
+@pytest.fixture
+def buffered(make_app):
+    # Views stay buffered until the test flushes them
+    app = make_app(VIEW_COUNT_FLUSH_INTERVAL=3600)
+    with app.app_context():
+        portfolio_id = create_user('owner').id
+    yield app, portfolio_id
+    view_counter.flush()
+
+
+@pytest.mark.parametrize('url', PAGE_URLS)
+def test_unchanged_portfolio_revalidates_with_304(buffered, url):
+    app, portfolio_id = buffered
+    client = app.test_client()
+    url = url.format(id=portfolio_id)
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers['ETag']
+    assert 'Last-Modified' not in first.headers
+
+    again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+
+
+@pytest.mark.parametrize('url', PAGE_URLS)
+def test_counted_views_change_the_etag(buffered, url):
+    app, portfolio_id = buffered
+    client = app.test_client()
+    url = url.format(id=portfolio_id)
+    etag = client.get(url).headers['ETag']
+    # The API doesn't count views itself. The flush leaves updated_at alone, so a date
+    # validator would wrongly answer 304 below
+    view_counter.record(portfolio_id)
+    assert view_counter.flush() >= 1
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+
+def test_page_etag_differs_per_viewer(buffered):
+    app, portfolio_id = buffered
+    client = app.test_client()
+    anonymous = client.get(f'/portfolio/{portfolio_id}').headers['ETag']
+    with app.app_context():
+        create_user('visitor')
+    login(client, 'visitor')
+    response = client.get(f'/portfolio/{portfolio_id}', headers={'If-None-Match': anonymous})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != anonymous
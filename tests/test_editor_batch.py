@@ -0,0 +1,122 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Portfolio, Project, Skill
+from app.routes import portfolio as portfolio_routes
+from app.services.editor_batch import apply_operations
+from conftest import create_user, login
+
+
+@pytest.fixture
+def editor(app, client):
+    with app.app_context():
+        portfolio = create_user('editor')
+        db.session.add(Skill(portfolio_id=portfolio.id, name='Python', level='Expert', category='Backend', order_index=0))
+        db.session.add(Project(portfolio_id=portfolio.id, title='Site', description='d', technologies='t',
+                               category='web', order_index=0))
+        db.session.commit()
+    login(client, 'editor')
+    return client
+
+
+def batch(client, *operations):
+    return client.post('/portfolio/batch', json={'operations': list(operations)}).get_json()
+
+
+def skill_names(app):
+    with app.app_context():
+        return sorted(skill.name for skill in Skill.query.all())
+
+
+def test_batch_applies_every_operation(app, editor):
+    with app.app_context():
+        skill_id = Skill.query.one().id
+    result = batch(
+        editor,
+        {'op': 'add', 'type': 'skills', 'fields': {'name': 'Go', 'level': 'Beginner', 'category': 'Backend'}},
+        {'op': 'update', 'type': 'skills', 'id': skill_id, 'fields': {'level': 'Advanced'}},
+        {'op': 'update', 'type': 'basic_info', 'fields': {'bio': 'Hello'}},
+    )
+    assert result['success']
+    assert result['results'][0] is not None
+    with app.app_context():
+        assert db.session.get(Skill, skill_id).level == 'Advanced'
+        assert Portfolio.query.one().bio == 'Hello'
+    assert skill_names(app) == ['Go', 'Python']
+
+
+def test_one_bad_operation_discards_the_whole_batch(app, editor):
+    result = batch(
+        editor,
+        {'op': 'add', 'type': 'skills', 'fields': {'name': 'Go', 'level': 'Beginner', 'category': 'Backend'}},
+        {'op': 'delete', 'type': 'projects', 'id': 999999},
+    )
+    assert not result['success']
+    assert result['message'].startswith('Operation 2:')
+    assert skill_names(app) == ['Python']
+
+
+@pytest.mark.parametrize('item_type, fields', [
+    ('skills', {'name': None}),
+    ('skills', {'name': '   '}),
+    ('projects', {'title': None}),
+    ('skills', {'level': {'nested': 'object'}}),
+    ('projects', {'technologies': ['a', 'b']}),
+    ('projects', {'project_url': 42}),
+    ('basic_info', {'title': ''}),
+    ('basic_info', {'title': None}),
+])
+def test_update_rejects_empty_required_and_non_string_values(app, editor, item_type, fields):
+    with app.app_context():
+        ids = {'skills': Skill.query.one().id, 'projects': Project.query.one().id}
+    operation = {'op': 'update', 'type': item_type, 'fields': fields}
+    if item_type in ids:
+        operation['id'] = ids[item_type]
+    result = batch(editor, operation)
+    assert not result['success']
+    assert result['message'].startswith('Operation 1:')
+    with app.app_context():
+        assert Skill.query.one().name == 'Python'
+        assert Project.query.one().title == 'Site'
+        assert Portfolio.query.one().title == 'editor portfolio'
+
+
+def test_optional_fields_can_still_be_cleared(app, editor):
+    with app.app_context():
+        project_id = Project.query.one().id
+    result = batch(editor, {'op': 'update', 'type': 'projects', 'id': project_id, 'fields': {'project_url': None}})
+    assert result['success']
+
+
+def test_items_of_other_portfolios_are_not_found(app, editor):
+    with app.app_context():
+        other = create_user('other')
+        skill = Skill(portfolio_id=other.id, name='Rust', level='Expert', category='Backend', order_index=0)
+        db.session.add(skill)
+        db.session.commit()
+        skill_id = skill.id
+    result = batch(editor, {'op': 'delete', 'type': 'skills', 'id': skill_id})
+    assert not result['success']
+    assert 'Rust' in skill_names(app)
+
+
+def test_database_errors_roll_back_and_return_json(app, editor, monkeypatch):
+    def failing(portfolio, operations):
+        db.session.add(Skill(portfolio_id=portfolio.id, name='Go', level='Beginner', category='Backend'))
+        db.session.flush()
+        raise IntegrityError('INSERT', {}, Exception('constraint failed'))
+
+    monkeypatch.setattr(portfolio_routes, 'apply_operations', failing)
+    response = editor.post('/portfolio/batch', json={'operations': [{'op': 'noop'}]})
+    assert response.status_code == 200
+    assert response.get_json() == {'success': False, 'message': 'Could not save changes'}
+    assert skill_names(app) == ['Python']
+
+
+def test_operation_list_is_validated(app):
+    with app.app_context():
+        portfolio = create_user('solo')
+        with pytest.raises(ValueError):
+            apply_operations(portfolio, [])
+        with pytest.raises(ValueError):
+            apply_operations(portfolio, ['not an object'])
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import db, Analytics, Inquiry
+from app.services import email_service
+from conftest import create_user
+
+
+@pytest.fixture
+def sent(app, monkeypatch):
+    """Messages handed to the sender pool, rendered but not sent"""
+    messages = []
+    monkeypatch.setattr(email_service.mail_pool, 'submit', messages.append)
+    with app.test_request_context():
+        yield messages
+
+
+def test_inquiry_notification_links_to_the_inbox(sent):
+    portfolio = create_user('owner')
+    inquiry = Inquiry(portfolio_id=portfolio.id, name='Client', email='client@example.com',
+                      subject='Work', message='Are you available?')
+    db.session.add(inquiry)
+    db.session.commit()
+
+    email_service.send_inquiry_notification(inquiry)
+    [message] = sent
+    assert message.recipients == ['owner@example.com']
+    assert 'Are you available?' in message.html
+    assert 'http://localhost/portfolio/inquiries' in message.html
+    assert 'Unsubscribe' not in message.html
+
+
+def test_view_notification_links_to_the_portfolio(sent):
+    portfolio = create_user('owner')
+    view = Analytics(user_id=portfolio.user_id, portfolio_id=portfolio.id, event_type='view',
+                     visitor_ip='127.0.0.1', user_agent='Mozilla/5.0 (Windows NT 10.0)',
+                     timestamp=datetime(2024, 1, 1, 12, 30))
+
+    email_service.send_portfolio_view_notification(portfolio, view)
+    [message] = sent
+    assert '2024-01-01 12:30' in message.html
+    assert 'Windows Desktop' in message.html
+    assert f'http://localhost/portfolio/{portfolio.id}' in message.html
+    assert 'Unsubscribe' not in message.html
@@ -0,0 +1,85 @@
+import pytest
+
+from app.services.geoip import GeoIP, GeoIPDatabase
+
+RANGES_CSV = '''start_ip,end_ip,country,city
+8.8.8.0,8.8.8.255,US,Mountain View
+8.8.9.0,8.8.9.255,US
+134742016,134742271,US,Reston
+10.0.0.0,10.255.255.255,Private,Intranet
+2a00:1450::,2a00:1450:ffff:ffff:ffff:ffff:ffff:ffff,IE,Dublin
+not an address,8.8.4.255,US
+9.9.9.9,9.9.9.0,CH
+1.1.1.0,1.1.1.255
+'''
+
+# (address, location) pairs, including each range's first and last address and their neighbours
+LOOKUPS = [
+    ('8.8.7.255', None),
+    ('8.8.8.0', 'Mountain View, US'),
+    ('8.8.8.8', 'Mountain View, US'),
+    ('8.8.8.255', 'Mountain View, US'),
+    ('8.8.9.0', 'US'),
+    ('8.8.9.255', 'US'),
+    ('8.8.10.0', None),
+    ('8.8.4.4', None),
+    ('8.8.0.0', 'Reston, US'),
+    ('8.8.0.255', 'Reston, US'),
+    ('8.8.1.0', None),
+    ('9.9.9.9', None),
+    ('1.1.1.1', None),
+    ('0.0.0.1', None),
+    ('2a00:1450::', 'Dublin, IE'),
+    ('2a00:1450:4009:81f::200e', 'Dublin, IE'),
+    ('2a00:1450:ffff:ffff:ffff:ffff:ffff:ffff', 'Dublin, IE'),
+    ('2a00:1451::', None),
+    ('2a00:144f:ffff:ffff:ffff:ffff:ffff:ffff', None),
+    ('::ffff:8.8.8.8', 'Mountain View, US'),
+    # Private, loopback and link-local addresses are never looked up, whatever the table says
+    ('10.1.2.3', None),
+    ('192.168.1.1', None),
+    ('127.0.0.1', None),
+    ('::1', None),
+    ('fe80::1', None),
+    ('::ffff:10.1.2.3', None),
+    ('not-an-ip', None),
+    ('', None),
+]
+
+
+@pytest.fixture
+def table(tmp_path):
+    path = tmp_path / 'ranges.csv'
+    path.write_text(RANGES_CSV, encoding='utf-8')
+    return path
+
+
+@pytest.mark.parametrize('address, location', LOOKUPS)
+def test_lookup(table, address, location):
+    assert GeoIPDatabase.from_csv(str(table)).lookup(address) == location
+
+
+def test_malformed_rows_are_skipped(table):
+    database = GeoIPDatabase.from_csv(str(table))
+    assert len(database) == 5
+    assert sorted(database.locations) == ['Dublin, IE', 'Intranet, Private', 'Mountain View, US', 'Reston, US', 'US']
+
+
+def test_compiled_table_answers_the_same(table, tmp_path):
+    compiled = tmp_path / 'ranges.bin'
+    GeoIPDatabase.from_csv(str(table)).save(str(compiled))
+    database = GeoIPDatabase.load(str(compiled))
+    assert [database.lookup(address) for address, _ in LOOKUPS] == [location for _, location in LOOKUPS]
+
+
+def test_lookups_are_cached_and_a_missing_table_resolves_nothing(make_app, table, tmp_path):
+    geoip = GeoIP(make_app(GEOIP_DATABASE=str(table)))
+    assert geoip.lookup('8.8.8.8') == 'Mountain View, US'
+    assert geoip.lookup('8.8.8.8') == 'Mountain View, US'
+    assert geoip.lookup(None) is None
+    stats = geoip.stats()
+    assert (stats['ranges'], stats['cache_hits'], stats['cache_misses']) == (5, 1, 1)
+
+    missing = GeoIP(make_app(GEOIP_DATABASE=str(tmp_path / 'missing.bin')))
+    assert missing.lookup('8.8.8.8') is None
+    assert missing.stats()['ranges'] == 0
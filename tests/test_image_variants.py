@@ -0,0 +1,58 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.models import db, StoredUpload
+from app.services import image_variants as image_variants_module
+from app.services.image_variants import image_variants
+from app.services.upload_store import upload_store, stored_path, variant_path, URL_PREFIX
+from conftest import create_user
+
+
+def png(width, height):
+    data = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 40)).save(data, 'PNG')
+    data.seek(0)
+    data.filename = 'photo.png'
+    return data
+
+
+@pytest.fixture
+def ctx(app):
+    # IMAGE_VARIANTS_ASYNC is off in tests, so copies are made when the upload commits
+    with app.app_context():
+        yield app
+
+
+def test_processed_uploads_get_a_srcset(ctx):
+    url = upload_store.save(png(300, 150))
+    db.session.commit()
+    path = stored_path(url)
+    assert image_variants.info(path) == (300, 150, (64, 128, 256, 300))
+
+    attrs = image_variants.image_attrs(url, 64)
+    srcset = ', '.join(f'{URL_PREFIX}{variant_path(path, w, "webp")} {w}w' for w in (64, 128, 256, 300))
+    assert f'srcset="{srcset}"' in attrs
+    # The plain src is the smallest copy sharp at 2x, in the original format
+    assert attrs.startswith(f'src="{URL_PREFIX}{variant_path(path, 128, "png")}"')
+    assert 'sizes="64px" width="64" height="32"' in attrs
+
+
+def test_without_pillow_images_keep_a_plain_src(app, client, monkeypatch):
+    monkeypatch.setattr(image_variants_module, 'Image', None)
+    monkeypatch.setattr(image_variants_module, 'ImageOps', None)
+    assert not image_variants.stats()['available']
+
+    with app.app_context():
+        url = upload_store.save(png(300, 150))
+        portfolio_id = create_user('owner', profile_image=url).id
+        path = stored_path(url)
+        assert db.session.get(StoredUpload, path).variant_widths is None
+        assert image_variants.pending() == [path]
+        assert image_variants.image_attrs(url, 64) == f'src="{url}"'
+        assert image_variants.image_attrs('https://example.com/a.png', 64) == 'src="https://example.com/a.png"'
+
+    page = client.get(f'/portfolio/{portfolio_id}').get_data(as_text=True)
+    assert f'src="{url}"' in page
+    assert 'srcset=' not in page
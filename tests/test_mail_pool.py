@@ -0,0 +1,89 @@
+import time
+from smtplib import SMTPServerDisconnected
+
+import pytest
+from flask_mail import Message
+
+from app.services.mail_pool import MailPool
+
+
+class FakeConnection:
+    """Sends into outbox until its server drops it after `sends` messages (None = never)"""
+
+    def __init__(self, outbox, sends):
+        self.outbox = outbox
+        self.sends = sends
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+
+    def send(self, msg):
+        if self.closed or self.sends == 0:
+            raise SMTPServerDisconnected('Connection unexpectedly closed')
+        if self.sends is not None:
+            self.sends -= 1
+        self.outbox.append((self, msg.subject))
+
+
+class FakeMail:
+    def __init__(self, *sends):
+        self.outbox = []
+        self.opened = []
+        self._sends = list(sends)
+
+    def connect(self):
+        connection = FakeConnection(self.outbox, self._sends.pop(0) if self._sends else None)
+        self.opened.append(connection)
+        return connection
+
+
+@pytest.fixture
+def pool(make_app):
+    """One sender thread; the test puts a FakeMail in front of it"""
+    app = make_app(MAIL_ASYNC=True, MAIL_POOL_WORKERS=1)
+    return MailPool(app)
+
+
+def send_all(pool, fake, *subjects):
+    pool.app.extensions['mail'] = fake
+    with pool.app.app_context():
+        for subject in subjects:
+            assert pool.submit(Message(subject, sender='noreply@example.com', recipients=['owner@example.com']))
+    deadline = time.monotonic() + 5
+    while pool.stats()['sent'] + pool.stats()['failed'] < len(subjects):
+        assert time.monotonic() < deadline, pool.stats()
+        time.sleep(0.01)
+
+
+def test_messages_share_one_connection(pool):
+    fake = FakeMail()
+    send_all(pool, fake, 'first', 'second', 'third')
+    assert [subject for _, subject in fake.outbox] == ['first', 'second', 'third']
+    assert len(fake.opened) == 1
+    assert pool.stats()['connections'] == 1
+
+
+def test_send_on_a_dropped_connection_is_retried_on_a_fresh_one(pool):
+    # The first connection is dropped by the server after one message
+    fake = FakeMail(1)
+    send_all(pool, fake, 'first', 'second')
+    stale, fresh = fake.opened
+    assert fake.outbox == [(stale, 'first'), (fresh, 'second')]
+    assert stale.closed
+    stats = pool.stats()
+    assert (stats['sent'], stats['failed'], stats['connections']) == (2, 0, 2)
+
+
+def test_failure_on_a_fresh_connection_is_not_retried(pool):
+    # The first connection can send nothing at all
+    fake = FakeMail(0)
+    send_all(pool, fake, 'first', 'second')
+    broken, working = fake.opened
+    assert fake.outbox == [(working, 'second')]
+    assert broken.closed
+    stats = pool.stats()
+    assert (stats['sent'], stats['failed'], stats['connections']) == (1, 1, 2)
@@ -0,0 +1,86 @@
+import math
+from datetime import datetime
+
+import pytest
+
+from app.models import db, Portfolio, PortfolioCard, Skill
+from app.services.ordering import move_item, apply_order
+from conftest import create_user, login
+
+
+@pytest.fixture
+def skills(app):
+    """Four skills ranked 0-3 on one portfolio, plus one on another; returns (portfolio id, skill ids)"""
+    with app.app_context():
+        portfolio = create_user('owner')
+        ids = []
+        for rank, name in enumerate(['Python', 'Go', 'Rust', 'SQL']):
+            skill = Skill(portfolio_id=portfolio.id, name=name, level='Expert', category='Backend',
+                          order_index=rank)
+            db.session.add(skill)
+            db.session.flush()
+            ids.append(skill.id)
+        other = create_user('other')
+        db.session.add(Skill(portfolio_id=other.id, name='Elixir', level='Expert', category='Backend'))
+        db.session.commit()
+        return portfolio.id, ids
+
+
+def ranked(portfolio_id):
+    return [(skill.name, skill.order_index) for skill in
+            Skill.query.filter_by(portfolio_id=portfolio_id).order_by(Skill.order_index, Skill.id)]
+
+
+def test_move_writes_a_rank_between_the_new_neighbours(app, skills):
+    portfolio_id, _ = skills
+    with app.app_context():
+        assert move_item(Skill, portfolio_id, 3, 1)
+        db.session.commit()
+        assert ranked(portfolio_id) == [('Python', 0), ('SQL', 0.5), ('Go', 1), ('Rust', 2)]
+        assert not move_item(Skill, portfolio_id, 0, 4)
+
+
+def test_move_renumbers_once_neighbours_have_no_room(app, skills):
+    portfolio_id, ids = skills
+    with app.app_context():
+        # Adjacent floats: nothing fits between Python and Go any more
+        Skill.query.filter_by(id=ids[1]).update({'order_index': math.nextafter(0.0, 1.0)})
+        db.session.commit()
+        assert move_item(Skill, portfolio_id, 3, 1)
+        db.session.commit()
+        assert ranked(portfolio_id) == [('Python', 0), ('SQL', 1), ('Go', 2), ('Rust', 3)]
+
+
+def test_partial_order_keeps_the_rest_after_it(app, skills):
+    portfolio_id, ids = skills
+    with app.app_context():
+        other_id = Skill.query.filter_by(name='Elixir').one().id
+        assert apply_order(Skill, portfolio_id, [ids[2], 'x', other_id, ids[0], ids[2]]) == 4
+        db.session.commit()
+        assert ranked(portfolio_id) == [('Rust', 0), ('Python', 1), ('Go', 2), ('SQL', 3)]
+        assert db.session.get(Skill, other_id).order_index == 0
+        assert apply_order(Skill, portfolio_id, [other_id, None]) == 0
+
+
+def test_bulk_order_bumps_updated_at_and_the_card(app, skills):
+    portfolio_id, ids = skills
+    with app.app_context():
+        db.session.get(Portfolio, portfolio_id).updated_at = datetime(2020, 1, 1)
+        db.session.commit()
+        assert db.session.get(PortfolioCard, portfolio_id).top_skills.startswith('Python,Go')
+
+        apply_order(Skill, portfolio_id, list(reversed(ids)))
+        db.session.commit()
+        assert db.session.get(Portfolio, portfolio_id).updated_at > datetime(2020, 1, 1)
+        card = db.session.get(PortfolioCard, portfolio_id)
+        assert card.top_skills.startswith('SQL,Rust,Go')
+        assert card.updated_at > datetime(2020, 1, 1)
+
+
+def test_update_order_route_accepts_a_partial_list(app, client, skills):
+    portfolio_id, ids = skills
+    login(client, 'owner')
+    response = client.post('/portfolio/update-order', json={'type': 'skills', 'item_ids': [ids[3]]})
+    assert response.get_json()['success']
+    with app.app_context():
+        assert ranked(portfolio_id) == [('SQL', 0), ('Python', 1), ('Go', 2), ('Rust', 3)]
@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from app.models import db, Project
+from app.services.page_cache import page_cache
+from app.services.view_counter import view_counter
+from conftest import create_user
+
+
+@pytest.fixture
+def cached(make_app):
+    # Views stay buffered until the test flushes them
+    app = make_app(PAGE_CACHE_TTL=60, VIEW_COUNT_FLUSH_INTERVAL=3600)
+    page_cache.clear()
+    with app.app_context():
+        portfolio_id = create_user('owner').id
+    yield app, portfolio_id
+    view_counter.flush()
+    page_cache.clear()
+
+
+def shown_views(response):
+    return int(re.search(r'text-primary-600 mb-2">(\d+)<', response.get_data(as_text=True)).group(1))
+
+
+def test_anonymous_visits_share_a_rendered_page(cached):
+    app, portfolio_id = cached
+    client = app.test_client()
+    hits = page_cache.stats()['hits']
+    client.get(f'/portfolio/{portfolio_id}')
+    client.get(f'/portfolio/{portfolio_id}')
+    assert page_cache.stats()['hits'] == hits + 1
+
+
+def test_flushed_views_are_shown_at_once(cached):
+    app, portfolio_id = cached
+    client = app.test_client()
+    assert shown_views(client.get(f'/portfolio/{portfolio_id}')) == 0
+    assert view_counter.flush() == 1
+    # Neither updated_at nor the cache in this process saw the counter's UPDATE
+    assert shown_views(client.get(f'/portfolio/{portfolio_id}')) == 1
+
+
+def test_edits_evict_the_page(cached):
+    app, portfolio_id = cached
+    client = app.test_client()
+    client.get(f'/portfolio/{portfolio_id}')
+    hits = page_cache.stats()['hits']
+    with app.app_context():
+        db.session.add(Project(portfolio_id=portfolio_id, title='Fresh project'))
+        db.session.commit()
+    assert 'Fresh project' in client.get(f'/portfolio/{portfolio_id}').get_data(as_text=True)
+    assert page_cache.stats()['hits'] == hits
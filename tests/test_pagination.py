@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Portfolio, PortfolioCard
+from app.routes.main import BROWSE_SORT_KEYS
+from app.services.pagination import KeysetPagination, SortKey, encode_cursor, decode_cursor
+from conftest import create_user
+
+# Ties on view_count, so the primary key has to break them
+VIEW_COUNTS = [5, 5, 5, 3, 3, 1, 0]
+
+
+@pytest.fixture
+def listed(app):
+    """Public portfolio ids in the API's order: most viewed first, newest id first among ties"""
+    with app.app_context():
+        portfolios = [create_user(f'user{i}', view_count=views) for i, views in enumerate(VIEW_COUNTS)]
+        create_user('hidden', public=False, view_count=99)
+        return [p.id for p in sorted(portfolios, key=lambda p: (-p.view_count, -p.id))]
+
+
+def get_page(client, **params):
+    response = client.get('/api/portfolios', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def ids(page):
+    return [portfolio['id'] for portfolio in page['portfolios']]
+
+
+def test_next_cursors_walk_every_row_once_in_order(client, listed):
+    page = get_page(client, per_page=3)
+    assert not page['has_prev'] and page['prev_cursor'] is None
+    seen = ids(page)
+    while page['next_cursor']:
+        page = get_page(client, per_page=3, cursor=page['next_cursor'])
+        seen += ids(page)
+    assert seen == listed
+    assert not page['has_next']
+
+
+def test_prev_cursor_returns_the_previous_page(client, listed):
+    first = get_page(client, per_page=3)
+    second = get_page(client, per_page=3, cursor=first['next_cursor'])
+    third = get_page(client, per_page=3, cursor=second['next_cursor'])
+    assert ids(third) == listed[6:]
+
+    back = get_page(client, per_page=3, cursor=third['prev_cursor'])
+    assert ids(back) == ids(second) == listed[3:6]
+    assert back['has_next'] and back['has_prev']
+    back = get_page(client, per_page=3, cursor=back['prev_cursor'])
+    assert ids(back) == listed[:3]
+    assert not back['has_prev']
+
+
+def test_pages_do_not_shift_when_rows_are_added_ahead(app, client, listed):
+    first = get_page(client, per_page=3)
+    with app.app_context():
+        create_user('newcomer', view_count=50)
+    # Offset paging would repeat the last row of the first page here
+    second = get_page(client, per_page=3, cursor=first['next_cursor'])
+    assert ids(second) == listed[3:6]
+
+
+def test_total_is_counted_only_when_asked(client, listed):
+    assert 'total' not in get_page(client, per_page=3)
+    assert get_page(client, per_page=3, include_total='true')['total'] == len(listed)
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', encode_cursor([5]), encode_cursor([5, 1], 'sideways')])
+def test_invalid_cursors_are_rejected(client, listed, cursor):
+    response = client.get('/api/portfolios', query_string={'cursor': cursor})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+def test_datetime_keys_round_trip_through_the_cursor(app):
+    with app.app_context():
+        start = datetime(2024, 1, 1, 12, 0, 0, 123456)
+        for i in range(5):
+            portfolio = create_user(f'user{i}')
+            # The last two share a timestamp, so the cursor has to carry the id as well
+            db.session.execute(db.update(Portfolio).where(Portfolio.id == portfolio.id)
+                               .values(updated_at=start + timedelta(minutes=min(i, 3))))
+        db.session.commit()
+
+        keys = [SortKey(Portfolio.updated_at, descending=True), SortKey(Portfolio.id, descending=True)]
+        values, direction = decode_cursor(encode_cursor([start, 1]), keys)
+        assert values == [start, 1] and direction == 'next'
+
+        query = Portfolio.query
+        expected = [portfolio.id for portfolio in query.order_by(Portfolio.updated_at.desc(), Portfolio.id.desc())]
+        page = KeysetPagination(query, keys, per_page=2, with_total=True)
+        assert page.total == 5
+        seen = [portfolio.id for portfolio in page.items]
+        while page.next_cursor:
+            page = KeysetPagination(query, keys, cursor=page.next_cursor, per_page=2)
+            seen += [portfolio.id for portfolio in page.items]
+        assert seen == expected
+
+
+def test_name_order_pages_past_missing_first_names(app):
+    with app.app_context():
+        ids = [create_user(name).id for name in ('bea', 'al', 'cy', 'dee', 'eve')]
+        db.session.execute(db.update(PortfolioCard).where(PortfolioCard.portfolio_id.in_(ids[:2]))
+                           .values(owner_first_name=None))
+        db.session.commit()
+
+        keys = BROWSE_SORT_KEYS['name']
+        pages = [KeysetPagination(PortfolioCard.query, keys, per_page=2)]
+        while pages[-1].next_cursor:
+            pages.append(KeysetPagination(PortfolioCard.query, keys, cursor=pages[-1].next_cursor, per_page=2))
+        # Missing names sort first, as '', then Cy, Dee, Eve
+        assert [card.portfolio_id for page in pages for card in page.items] == ids
+        back = KeysetPagination(PortfolioCard.query, keys, cursor=pages[-1].prev_cursor, per_page=2)
+        assert [card.portfolio_id for card in back.items] == ids[2:4]
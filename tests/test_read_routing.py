@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from app.models import db, Analytics, Portfolio
+from app.services.analytics_queue import analytics_queue
+from app.services.read_routing import read_only
+from app.services.view_counter import view_counter
+from conftest import create_user
+
+
+@pytest.fixture
+def routed(make_app):
+    """App with the read-only engine and a log of the statements each engine ran"""
+    app = make_app()
+    with app.app_context():
+        portfolio_id = create_user('owner').id
+        engines = {'primary': db.engine, 'read': app.extensions['read_routing'].engine}
+    assert engines['read'] is not None
+
+    @app.route('/test/read-then-write/<int:portfolio_id>')
+    @read_only
+    def read_then_write(portfolio_id):
+        # What a public page does: read, then count the view and track the visit
+        portfolio = Portfolio.query.get_or_404(portfolio_id)
+        view_counter.record(portfolio.id)
+        analytics_queue.track(portfolio_id=portfolio.id, user_id=portfolio.user_id, event_type='view')
+        portfolio.website = 'https://example.com'
+        db.session.commit()
+        return 'ok'
+
+    statements = defaultdict(list)
+    listeners = []
+    for name, engine in engines.items():
+        def log(conn, cursor, statement, parameters, context, executemany, name=name):
+            statements[name].append(' '.join(statement.split()))
+        event.listen(engine, 'before_cursor_execute', log)
+        listeners.append((engine, log))
+    yield app, portfolio_id, statements, engines['read']
+    for engine, log in listeners:
+        event.remove(engine, 'before_cursor_execute', log)
+
+
+def test_read_only_views_select_from_the_read_engine(routed):
+    app, portfolio_id, statements, _ = routed
+    response = app.test_client().get(f'/api/portfolio/{portfolio_id}')
+    assert response.status_code == 200
+    assert any('FROM portfolio' in s for s in statements['read'])
+    assert not [s for s in statements['primary'] if s.startswith('SELECT')]
+
+
+def test_other_views_stay_on_the_primary(routed):
+    app, portfolio_id, statements, _ = routed
+    assert app.test_client().get(f'/portfolio/{portfolio_id}').status_code == 200
+    assert statements['read'] == []
+    assert any('FROM portfolio' in s for s in statements['primary'])
+
+
+def test_writes_in_read_only_views_reach_the_primary(routed):
+    app, portfolio_id, statements, _ = routed
+    assert app.test_client().get(f'/test/read-then-write/{portfolio_id}').get_data(as_text=True) == 'ok'
+    assert all(s.startswith('SELECT') for s in statements['read'])
+    written = [s for s in statements['primary'] if not s.startswith('SELECT')]
+    assert any(s.startswith('UPDATE portfolio SET view_count') for s in written)
+    assert any(s.startswith('INSERT INTO analytics') for s in written)
+    assert any(s.startswith('UPDATE portfolio SET website') for s in written)
+    with app.app_context():
+        portfolio = db.session.get(Portfolio, portfolio_id)
+        assert (portfolio.view_count, portfolio.website) == (1, 'https://example.com')
+        assert Analytics.query.filter_by(portfolio_id=portfolio_id).count() == 1
+
+
+def test_the_read_engine_cannot_write(routed):
+    _, portfolio_id, _, read_engine = routed
+    with pytest.raises(OperationalError, match='readonly'):
+        with read_engine.begin() as connection:
+            connection.execute(text('UPDATE portfolio SET view_count = 5 WHERE id = :id'), {'id': portfolio_id})
+    with read_engine.connect() as connection:
+        assert connection.execute(text('SELECT view_count FROM portfolio')).scalar() == 0
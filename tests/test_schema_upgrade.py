@@ -0,0 +1,38 @@
+from sqlalchemy import inspect, text
+
+from app.models import db, Analytics
+from app.services.schema_upgrade import upgrade_schema
+from conftest import create_user
+
+
+def columns(table):
+    return {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+
+def test_columns_added_to_models_reach_an_existing_database(app):
+    with app.app_context():
+        portfolio = create_user('owner')
+        # The shape create_all() gave analytics before location and device existed
+        db.session.execute(text('DROP INDEX ix_analytics_portfolio_event_time'))
+        db.session.execute(text('ALTER TABLE analytics DROP COLUMN location'))
+        db.session.execute(text('ALTER TABLE analytics DROP COLUMN device'))
+        db.session.commit()
+        assert 'location' not in columns('analytics')
+
+        added = upgrade_schema()
+        assert added == ['analytics.location', 'analytics.device', 'ix_analytics_portfolio_event_time']
+        assert {'location', 'device'} <= columns('analytics')
+        db.session.add(Analytics(user_id=portfolio.user_id, portfolio_id=portfolio.id, event_type='view',
+                                 location='Lisbon, Portugal', device='Mobile'))
+        db.session.commit()
+        assert Analytics.query.one().location == 'Lisbon, Portugal'
+        assert upgrade_schema() == []
+
+
+def test_databases_under_alembic_are_left_alone(app):
+    with app.app_context():
+        db.session.execute(text('CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)'))
+        db.session.execute(text('ALTER TABLE analytics DROP COLUMN device'))
+        db.session.commit()
+        assert upgrade_schema() == []
+        assert 'device' not in columns('analytics')
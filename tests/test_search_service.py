@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import text
+
+from app.models import db, Skill
+from app.services import search_service
+from app.services.search_service import build_match
+from conftest import create_user
+
+# FTS5 syntax a visitor might type, on purpose or not, and whether the Python developer
+# should still be found: the words left over are all required
+OPERATOR_QUERIES = [
+    ('"', False), ('""python', True), ('pyth*', True), ('-python', True), ('python -java', False),
+    ('NEAR(python web)', False), ('python web', True), ('python AND OR NOT', False), ('(python', True),
+    ('title:python', False), ('{title}: python', False), ('^python', True), ('python +', True), ('*', False),
+]
+
+
+@pytest.fixture
+def indexed(app):
+    with app.app_context():
+        developer = create_user('dev', title='Python web developer', bio='Flask and Django')
+        designer = create_user('designer', title='Brand designer', bio='Logos and identity', location='Lisbon')
+        create_user('hidden', title='Python hidden', public=False)
+        db.session.add(Skill(portfolio_id=developer.id, name='Python', level='Expert', category='Backend'))
+        db.session.add(Skill(portfolio_id=designer.id, name='Figma', level='Expert', category='Design'))
+        db.session.commit()
+        return developer.id, designer.id
+
+
+def test_build_match_keeps_only_words():
+    assert build_match('web dev') == '{title bio first_name last_name} : ("web"* "dev"*)'
+    assert build_match('"web" NEAR(dev*) -x', columns=('skills',)) == '{skills} : ("web"* "NEAR"* "dev"* "x"*)'
+    assert build_match('"*-^()') is None
+    assert build_match(None) is None
+
+
+@pytest.mark.parametrize('query, found', OPERATOR_QUERIES)
+def test_operator_characters_are_searched_as_text(client, indexed, query, found):
+    developer_id, _ = indexed
+    api = client.get('/api/search', query_string={'q': query})
+    assert api.status_code == 200
+    main = client.get('/search', query_string={'q': query})
+    assert main.status_code == 200
+    # main.search answers [] on any error, so check it found what the API found
+    assert [p['id'] for p in main.get_json()] == [p['id'] for p in api.get_json()['portfolios']]
+    assert (developer_id in [p['id'] for p in api.get_json()['portfolios']]) == found
+
+
+def test_prefix_search_ranks_public_matches(client, indexed):
+    developer_id, _ = indexed
+    result = client.get('/api/search', query_string={'q': 'pyth dev'}).get_json()
+    assert [p['id'] for p in result['portfolios']] == [developer_id]
+
+
+def test_browse_filters_go_through_the_index(client, indexed):
+    # category isn't a Portfolio column; the form's other fields are what filter
+    page = client.get('/browse', query_string={'skill': 'figma', 'category': 'design'})
+    assert page.status_code == 200
+    html = page.get_data(as_text=True)
+    assert 'Brand designer' in html and 'Python web developer' not in html
+    html = client.get('/browse', query_string={'location': 'lisbon', 'search': '"brand'}).get_data(as_text=True)
+    assert 'Brand designer' in html and 'Python web developer' not in html
+
+
+def test_ilike_fallback_without_the_index(app, client, indexed):
+    developer_id, _ = indexed
+    with app.app_context():
+        db.session.execute(text(f'DROP TABLE {search_service.SEARCH_TABLE}'))
+        db.session.commit()
+        search_service._index_ready.clear()
+    try:
+        for query in ('python', '"python', 'python%'):
+            response = client.get('/api/search', query_string={'q': query})
+            assert response.status_code == 200
+        assert [p['id'] for p in client.get('/api/search', query_string={'q': 'pyth'}).get_json()['portfolios']] \
+            == [developer_id]
+    finally:
+        search_service._index_ready.clear()
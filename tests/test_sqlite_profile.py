@@ -0,0 +1,79 @@
+import threading
+from contextlib import ExitStack
+
+import pytest
+from sqlalchemy import text
+
+from app.models import db, Skill
+from app.services.sqlite_profile import PROFILES
+from conftest import create_user
+
+WRITERS, READERS, ROUNDS = 4, 4, 25
+
+
+@pytest.fixture
+def production(make_app):
+    app = make_app(SQLITE_PROFILE='production')
+    with app.app_context():
+        portfolio_id = create_user('owner').id
+    return app, portfolio_id
+
+
+def pragma(connection, name):
+    return connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+
+def test_pooled_connections_get_the_production_pragmas(production):
+    app, _ = production
+    with app.app_context():
+        engines = app.extensions['sqlite_profile'].engines
+        assert 'primary' in engines
+        for engine in engines.values():
+            # Several at once, so each is a separate connection out of the pool
+            with ExitStack() as stack:
+                connections = [stack.enter_context(engine.connect()) for _ in range(3)]
+                for connection in connections:
+                    assert pragma(connection, 'journal_mode') == 'wal'
+                    assert pragma(connection, 'busy_timeout') == PROFILES['production']['busy_timeout']
+                    assert pragma(connection, 'synchronous') == 1  # NORMAL
+
+
+def test_concurrent_writers_and_readers_never_see_a_locked_database(production):
+    app, portfolio_id = production
+    errors = []
+    start = threading.Barrier(WRITERS + READERS)
+
+    def writer(number):
+        with app.app_context():
+            start.wait()
+            try:
+                for round_ in range(ROUNDS):
+                    db.session.add(Skill(portfolio_id=portfolio_id, name=f'skill {number}-{round_}',
+                                         level='Expert', category='Backend', order_index=round_))
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                errors.append(e)
+
+    def reader():
+        with app.app_context():
+            start.wait()
+            try:
+                for _ in range(ROUNDS):
+                    Skill.query.filter_by(portfolio_id=portfolio_id).count()
+                    db.session.execute(text('SELECT count(*) FROM portfolio')).scalar()
+                    db.session.rollback()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(number,)) for number in range(WRITERS)]
+    threads += [threading.Thread(target=reader) for _ in range(READERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not [e for e in errors if 'database is locked' in str(e)]
+    assert errors == []
+    with app.app_context():
+        assert Skill.query.count() == WRITERS * ROUNDS
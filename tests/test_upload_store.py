@@ -0,0 +1,110 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Portfolio, Project, StoredUpload
+from app.services.upload_store import upload_store, stored_path
+from conftest import create_user
+
+
+def upload(data, filename='image.png'):
+    file = io.BytesIO(data)
+    file.filename = filename
+    return upload_store.save(file)
+
+
+def ref_count(url):
+    return db.session.get(StoredUpload, stored_path(url)).ref_count
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield app
+
+
+def test_identical_content_is_stored_once(ctx):
+    first = upload(b'same bytes')
+    second = upload(b'same bytes')
+    db.session.commit()
+    assert first == second
+    assert StoredUpload.query.count() == 1
+    assert os.path.exists(os.path.join(upload_store.root, stored_path(first)))
+
+
+def test_references_are_counted_as_rows_change(ctx):
+    url = upload(b'shared')
+    portfolio = create_user('owner', profile_image=url)
+    assert ref_count(url) == 1
+
+    db.session.add(Project(portfolio_id=portfolio.id, title='p', image_url=url))
+    db.session.commit()
+    assert ref_count(url) == 2
+
+    Project.query.delete()
+    db.session.commit()
+    # Bulk deletes bypass the ORM; only ORM deletes move the count
+    assert ref_count(url) == 2
+
+
+def test_replacing_an_expired_image_releases_the_old_file(ctx):
+    old = upload(b'old image')
+    portfolio = create_user('owner', profile_image=old)
+    new = upload(b'new image')
+    db.session.commit()
+    # After the commit profile_image is expired; its old value must still be counted
+    portfolio.profile_image = new
+    db.session.commit()
+    assert ref_count(old) == 0
+    assert ref_count(new) == 1
+
+
+def test_replacing_an_image_never_loaded_releases_the_old_file(ctx):
+    old = upload(b'old image')
+    portfolio_id = create_user('owner', profile_image=old).id
+    db.session.remove()
+
+    portfolio = db.session.get(Portfolio, portfolio_id, options=[db.defer(Portfolio.profile_image)])
+    portfolio.profile_image = None
+    db.session.commit()
+    assert ref_count(old) == 0
+
+
+def test_deleting_expired_rows_releases_their_files(ctx):
+    project_image, profile_image = upload(b'project'), upload(b'profile')
+    portfolio = create_user('owner', profile_image=profile_image)
+    db.session.add(Project(portfolio_id=portfolio.id, title='p', image_url=project_image))
+    db.session.commit()
+    # Everything expired by the commit, including the projects the cascade deletes
+    db.session.delete(portfolio)
+    db.session.commit()
+    assert ref_count(profile_image) == 0
+    assert ref_count(project_image) == 0
+
+
+def test_garbage_collection_keeps_referenced_and_recent_files(ctx):
+    kept, dropped = upload(b'kept'), upload(b'dropped')
+    create_user('owner', profile_image=kept)
+    fresh = upload(b'fresh')
+    db.session.commit()
+
+    removed = upload_store.collect_garbage(now=datetime.utcnow() + timedelta(hours=1))
+    assert removed == 0
+
+    removed = upload_store.collect_garbage(now=datetime.utcnow() + timedelta(days=2))
+    assert removed == 2
+    remaining = {upload.path for upload in StoredUpload.query.all()}
+    assert remaining == {stored_path(kept)}
+    assert not os.path.exists(os.path.join(upload_store.root, stored_path(dropped)))
+    assert not os.path.exists(os.path.join(upload_store.root, stored_path(fresh)))
+
+
+def test_rebuild_refcounts_repairs_drift(ctx):
+    url = upload(b'image')
+    create_user('owner', profile_image=url)
+    db.session.execute(db.update(StoredUpload).values(ref_count=7))
+    db.session.commit()
+    assert upload_store.rebuild_refcounts() == 1
+    assert ref_count(url) == 1
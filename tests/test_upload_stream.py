@@ -0,0 +1,92 @@
+import io
+import os
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+from app.models import db, Project
+from app.services.upload_stream import sniff_image
+from conftest import create_user, login
+
+MB = 1024 * 1024
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+FIELDS = {'title': 'Site', 'description': 'd', 'technologies': 't', 'category': 'web'}
+
+
+@pytest.fixture
+def owner(app, client):
+    with app.app_context():
+        create_user('owner')
+    login(client, 'owner')
+    return client
+
+
+def post_project(client, content, filename='image.png'):
+    """Post the add-project form with content as its image; returns the JSON reply and
+    the request body stream, whose position shows how much of the body was read"""
+    data = dict(FIELDS, image=(io.BytesIO(content), filename))
+    environ = EnvironBuilder(method='POST', data=data).get_environ()
+    body = io.BytesIO(environ['wsgi.input'].read())
+    response = client.post('/portfolio/add-project', input_stream=body, content_type=environ['CONTENT_TYPE'],
+                           content_length=len(body.getvalue()))
+    return response.get_json(), body
+
+
+def pending_files(app):
+    tmp_dir = os.path.join(app.config['UPLOAD_FOLDER'], '.tmp')
+    return os.listdir(tmp_dir) if os.path.isdir(tmp_dir) else []
+
+
+@pytest.mark.parametrize('head, extension', [
+    (PNG, 'png'),
+    (b'\xff\xd8\xff\xe0' + b'\x00' * 8, 'jpg'),
+    (b'GIF89a' + b'\x00' * 6, 'gif'),
+    (b'RIFF\x00\x00\x00\x00WEBP', 'webp'),
+    (b'MZ\x90\x00' + b'\x00' * 8, None),
+    (b'<svg xmlns=', None),
+])
+def test_sniff_image(head, extension):
+    assert sniff_image(head) == extension
+
+
+def test_image_is_stored_under_its_sniffed_extension(app, owner):
+    result, _ = post_project(owner, PNG, filename='photo.jpeg')
+    assert result['success']
+    with app.app_context():
+        assert Project.query.one().image_url.endswith('.png')
+    assert pending_files(app) == []
+
+
+def test_blank_file_input_is_accepted(app, owner):
+    result, _ = post_project(owner, b'', filename='')
+    assert result['success']
+    with app.app_context():
+        assert Project.query.one().image_url is None
+
+
+@pytest.mark.parametrize('content', [
+    b'MZ\x90\x00' + b'\x00' * 8 + b'\n' * 1000,
+    # No line breaks: the decoder holds all of it back until the boundary
+    b'MZ' + b'a' * 3 * MB,
+], ids=['lines', 'one-line'])
+def test_non_images_are_rejected_after_the_first_chunk(app, owner, content):
+    result, body = post_project(owner, content, filename='evil.png')
+    assert result == {'success': False, 'message': 'Image error: Only image files are allowed'}
+    assert body.tell() < MB
+    with app.app_context():
+        assert Project.query.count() == 0
+    assert pending_files(app) == []
+
+
+@pytest.mark.parametrize('content', [
+    PNG + b'a\n' * 2 * MB,
+    PNG + b'a' * 4 * MB,
+], ids=['lines', 'one-line'])
+def test_oversized_files_are_rejected_near_the_cap(app, owner, content):
+    result, body = post_project(owner, content)
+    assert result == {'success': False, 'message': 'Image error: File size must be less than 2MB'}
+    # Reading stops about one chunk past the 2MB cap, not at the end of the body
+    assert body.tell() < 3 * MB
+    with app.app_context():
+        assert Project.query.count() == 0
+    assert pending_files(app) == []
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import text
+
+from app.models import db, Portfolio, PortfolioCard
+from app.services import view_counter as view_counter_module
+from app.services.view_counter import view_counter
+from conftest import create_user
+
+
+@pytest.fixture
+def buffered(make_app):
+    # Views stay buffered until the test flushes them
+    app = make_app(VIEW_COUNT_FLUSH_INTERVAL=3600)
+    with app.app_context():
+        ids = create_user('first').id, create_user('second').id
+    yield app, ids
+    view_counter.flush()
+
+
+def view_counts(app, portfolio_id):
+    with app.app_context():
+        return db.session.get(Portfolio, portfolio_id).view_count, db.session.get(PortfolioCard, portfolio_id).view_count
+
+
+def test_views_are_written_in_one_flush(buffered):
+    app, (first, second) = buffered
+    for portfolio_id in (first, first, second):
+        view_counter.record(portfolio_id)
+    assert view_counter.pending(first) == 2
+    assert view_counts(app, first) == (0, 0)
+
+    assert view_counter.flush() == 3
+    assert view_counts(app, first) == (2, 2)
+    assert view_counts(app, second) == (1, 1)
+    assert view_counter.pending(first) == 0
+
+
+def test_failed_flush_requeues_its_counts(buffered, monkeypatch):
+    app, (first, second) = buffered
+    failed = view_counter.stats()['failed_flushes']
+    view_counter.record(first, views=3)
+    view_counter.record(second)
+    # The card UPDATE fails after the portfolio one, in the same transaction
+    monkeypatch.setattr(view_counter_module, 'INCREMENT_CARD', text('UPDATE missing_table SET x = 1'))
+
+    assert view_counter.flush() == 0
+    assert view_counter.stats()['failed_flushes'] == failed + 1
+    assert view_counter.stats()['pending_views'] == 4
+    assert view_counts(app, first) == (0, 0)
+
+    # Views recorded meanwhile join the requeued ones
+    view_counter.record(first)
+    monkeypatch.undo()
+    assert view_counter.flush() == 5
+    assert view_counts(app, first) == (4, 4)
+    assert view_counts(app, second) == (1, 1)
+    assert view_counter.stats()['pending_views'] == 0
@@ -2,20 +2,31 @@
 WSGI entry point for production deployment
 """
 import os
+from sqlalchemy import inspect
 from app.app import create_app
-from app.models import db, User
+from app.models import db, User, Portfolio, PortfolioCard, Analytics, AnalyticsDaily
+from app.services.card_service import rebuild_cards
+from app.services.analytics_rollup import rebuild_rollup
+from app.services.schema_upgrade import upgrade_schema
 
 # Create the Flask application
 app = create_app('production')
 
 # Initialize database on startup
 with app.app_context():
-    try:
-        # Check if tables exist by trying to query
-        User.query.count()
+    if inspect(db.engine).has_table(User.__tablename__):
         print("✅ Database tables exist")
-    except Exception as e:
-        print(f"❌ Database issue: {e}")
+        
+        # Create tables added since the database was built, add the columns and indexes
+        # its older tables lack, and fill the read models
+        db.create_all()
+        for change in upgrade_schema():
+            print(f"✅ Added {change}")
+        if PortfolioCard.query.first() is None and Portfolio.query.first() is not None:
+            print(f"✅ Built {rebuild_cards()} portfolio cards")
+        if AnalyticsDaily.query.first() is None and Analytics.query.first() is not None:
+            print(f"✅ Built {rebuild_rollup()} daily analytics buckets")
+    else:
         print("🔧 Creating database tables...")
         db.create_all()
         